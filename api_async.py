@@ -0,0 +1,292 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import Employee
+from schemas import PinAuth, OrderStart, OrderBatch, OrderComplete, OrderNotProvided
+from services.auth import login_by_pin_async
+from services.orders import (
+    start_order_async,
+    start_orders_async,
+    complete_order_async,
+    not_provided_async,
+    in_progress_async
+)
+from services.reports import (
+    employee_report_async,
+    today_report_async,
+    detailed_report_message_async,
+    today_payload,
+    period_payload
+)
+from services.rollup import employee_day_stmt
+from services.history import order_history_async, DEFAULT_LIMIT
+from services.shifts import close_shift_async, render_shift_message
+from services.export import export_stmts, iter_csv_async, iter_xlsx_async, xlsx_available
+from services.events import bus
+from services.timeseries import parse_params, timeseries_async
+from services.clock import local_today, employee_today_async
+from telegram_utils import enqueue_telegram
+from querywatch import query_budget
+
+
+# Async-версии горячих эндпоинтов (DATA_LAYER=async|both).
+# Пути и ответы совпадают с main.py.
+router = APIRouter()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_current_admin_async(employee_id: int, db: AsyncSession):
+    emp = await db.get(Employee, employee_id)
+
+    if not emp:
+        raise HTTPException(status_code=404, detail="Employee not found")
+
+    if emp.role != "ADMIN":
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return emp
+
+
+# ================= AUTH =================
+
+@router.post("/auth/pin")
+@query_budget(4)
+async def auth(data: PinAuth, db: AsyncSession = Depends(get_async_db)):
+    return await login_by_pin_async(db, data.pin)
+
+
+# ================= EMPLOYEE =================
+
+@router.get("/employee/today-stats")
+@query_budget(1)
+async def employee_today_stats(employee_id: int, db: AsyncSession = Depends(get_async_db)):
+
+    services_count, total = (await db.execute(
+        employee_day_stmt(employee_id, await employee_today_async(db, employee_id))
+    )).one()
+
+    return {
+        "services_count": services_count,
+        "total": total
+    }
+
+
+@router.get("/employee/history")
+@query_budget(2)
+async def employee_history(employee_id: int, db: AsyncSession = Depends(get_async_db)):
+
+    today = await employee_today_async(db, employee_id)
+    page = await order_history_async(
+        db,
+        limit=20,
+        employee_id=employee_id,
+        status="COMPLETED",
+        start_date=today,
+        end_date=today
+    )
+
+    return [
+        {"client": o["client_name"], "service": name}
+        for o in page["orders"]
+        for name in o["services"]
+    ]
+
+
+# ================= ORDERS =================
+
+@router.post("/orders/start")
+@query_budget(5)
+async def create_order(data: OrderStart, db: AsyncSession = Depends(get_async_db)):
+    return await start_order_async(db, data)
+
+
+@router.post("/orders/batch")
+async def create_orders_batch(data: OrderBatch, db: AsyncSession = Depends(get_async_db)):
+    return await start_orders_async(db, data.orders)
+
+
+@router.post("/orders/{order_id}/complete")
+@query_budget(4)
+async def finish_order(order_id: int, data: OrderComplete, db: AsyncSession = Depends(get_async_db)):
+    return await complete_order_async(db, order_id, data.payment_type)
+
+
+@router.post("/orders/{order_id}/not-provided")
+@query_budget(4)
+async def fail_order(order_id: int, data: OrderNotProvided, db: AsyncSession = Depends(get_async_db)):
+    return await not_provided_async(db, order_id, data.reason)
+
+
+@router.get("/orders/in-progress")
+@query_budget(1)
+async def get_in_progress(employee_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await in_progress_async(db, employee_id)
+
+
+# ================= SHIFTS =================
+
+@router.post("/shifts/end")
+@query_budget(4)
+async def end_shift(employee_id: int, db: AsyncSession = Depends(get_async_db)):
+
+    summary = await close_shift_async(db, employee_id)
+
+    if not summary:
+        return {"error": "No active shift"}
+
+    enqueue_telegram(db, render_shift_message(summary))
+    await db.commit()
+
+    bus.publish("shift_ended", employee_id=employee_id)
+
+    return {"status": "ended", "summary": summary}
+
+
+# ================= ADMIN REPORT =================
+
+@router.get("/admin/report/today")
+@query_budget(3)
+async def admin_report_today(employee_id: int, branch_id: int = None, db: AsyncSession = Depends(get_async_db)):
+
+    await get_current_admin_async(employee_id, db)
+
+    today = local_today(branch_id)
+    rows, summary = await today_report_async(db, branch_id)
+
+    return today_payload(today, rows, summary)
+
+
+@router.get("/admin/report/period")
+@query_budget(3)
+async def admin_report_period(
+    employee_id: int,
+    start_date: str,
+    end_date: str,
+    branch_id: int = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+
+    await get_current_admin_async(employee_id, db)
+
+    start = datetime.fromisoformat(start_date).date()
+    end = datetime.fromisoformat(end_date).date()
+
+    rows, summary = await employee_report_async(db, start, end, branch_id)
+
+    return period_payload(start_date, end_date, rows, summary)
+
+
+@router.get("/admin/report/timeseries")
+@query_budget(3)
+async def admin_report_timeseries(
+    employee_id: int,
+    start_date: str,
+    end_date: str,
+    bucket: str = "day",
+    group_by: str = None,
+    branch_id: int = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    await get_current_admin_async(employee_id, db)
+
+    try:
+        start, end = parse_params(start_date, end_date, bucket, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await timeseries_async(db, start, end, bucket, group_by, branch_id)
+
+
+@router.get("/admin/orders/history")
+@query_budget(3)
+async def admin_order_history(
+    employee_id: int,
+    target_employee_id: int = None,
+    branch_id: int = None,
+    status: str = None,
+    payment_type: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    cursor: str = None,
+    limit: int = DEFAULT_LIMIT,
+    db: AsyncSession = Depends(get_async_db)
+):
+
+    await get_current_admin_async(employee_id, db)
+
+    try:
+        return await order_history_async(
+            db,
+            limit=limit,
+            employee_id=target_employee_id,
+            branch_id=branch_id,
+            status=status,
+            payment_type=payment_type,
+            start_date=datetime.fromisoformat(start_date).date() if start_date else None,
+            end_date=datetime.fromisoformat(end_date).date() if end_date else None,
+            cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid filters or cursor")
+
+
+@router.get("/admin/export/orders")
+async def export_orders(
+    employee_id: int,
+    start_date: str,
+    end_date: str,
+    format: str = "csv",
+    target_employee_id: int = None,
+    branch_id: int = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+
+    await get_current_admin_async(employee_id, db)
+
+    try:
+        start = datetime.fromisoformat(start_date).date()
+        end = datetime.fromisoformat(end_date).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid dates")
+
+    stmts = export_stmts(start, end, target_employee_id, branch_id)
+    filename = f"orders_{start}_{end}"
+
+    if format == "xlsx":
+        if not xlsx_available():
+            raise HTTPException(status_code=501, detail="XLSX export requires openpyxl")
+
+        return StreamingResponse(
+            iter_xlsx_async(stmts),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.xlsx"'}
+        )
+
+    if format != "csv":
+        raise HTTPException(status_code=400, detail="Unknown format")
+
+    return StreamingResponse(
+        iter_csv_async(stmts),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'}
+    )
+
+
+@router.post("/admin/report/today/send")
+@query_budget(3)
+async def send_admin_report(employee_id: int, branch_id: int = None, db: AsyncSession = Depends(get_async_db)):
+
+    await get_current_admin_async(employee_id, db)
+
+    message = await detailed_report_message_async(db, branch_id)
+
+    enqueue_telegram(db, message)
+    await db.commit()
+
+    return {"status": "sent"}
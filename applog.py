@@ -0,0 +1,211 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+# ================= LOGGING =================
+
+# Структурные JSON-логи. Обработчики запросов только кладут запись в очередь,
+# запись в stdout — в отдельном потоке QueueListener.
+#
+#   log = logging.getLogger(__name__)
+#   log.info("pin_login", extra={"employee_id": 5})
+#
+# Сообщение — короткое имя события, детали — в extra. Секреты (PIN, токены)
+# в логи не пишем.
+#
+# LOG_LEVEL=INFO
+# LOG_SAMPLE="pin_login=0.1,telegram_sent=0.1" — доля записываемых болтливых
+# событий (WARNING и выше не сэмплируются)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+DEFAULT_SAMPLES = {
+    "pin_login": 0.1,
+    "telegram_sent": 0.1,
+}
+
+REQUEST_ID_HEADER = "x-request-id"
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# Стандартные атрибуты LogRecord — всё остальное считаем полями из extra
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id", "exc"}
+
+_listener = None
+_handler = None
+
+
+def _parse_samples(value):
+    rates = dict(DEFAULT_SAMPLES)
+
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+
+    return rates
+
+
+SAMPLE_RATES = _parse_samples(os.getenv("LOG_SAMPLE", ""))
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+# ================= FILTERS =================
+
+class ContextFilter(logging.Filter):
+    # Выполняется в потоке запроса — до очереди, пока контекст ещё наш
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self.rates.get(record.msg)
+        if rate is None:
+            return True
+
+        return random.random() < rate
+
+
+# ================= FORMAT =================
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+
+        exc = getattr(record, "exc", None)
+        if exc:
+            entry["exc"] = exc
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        # В очередь — только готовые к JSON данные: args подставлены,
+        # traceback в виде текста (объект исключения через поток не тащим)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            record.exc = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.exc_text = None
+
+        return record
+
+
+# ================= SETUP =================
+
+def setup_logging(stream=None):
+    # Идемпотентно: поток QueueListener запускает lifespan приложения
+    # (main.py), скрипты — сами. Импорт модуля ничего не запускает
+    global _listener, _handler
+
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    records = queue.SimpleQueue()
+
+    _handler = _QueueHandler(records)
+    _handler.addFilter(ContextFilter())
+    _handler.addFilter(SamplingFilter(SAMPLE_RATES))
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+    # После stop_logging/setup_logging (тесты, lifespan) — одна регистрация
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+
+    return _listener
+
+
+def stop_logging():
+    # Дописывает остаток очереди; повторный setup_logging не дублирует вывод
+    global _listener, _handler
+
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ================= REQUEST ID =================
+
+class RequestIdMiddleware:
+    # X-Request-ID клиента/прокси или новый; возвращается в ответе
+    # и попадает во все записи лога этого запроса
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        request_id = incoming[:64] or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
@@ -0,0 +1,48 @@
+import json
+import sys
+
+
+# ================= COMPARE RUNS =================
+
+#   python -m bench.compare bench/results/old.json bench/results/new.json
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "rps", "queries_avg"]
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _delta(old, new):
+    if old is None or new is None:
+        return "-"
+    if not old:
+        return f"{new}"
+    return f"{new} ({(new - old) / old * 100:+.0f}%)"
+
+
+def compare(old, new):
+
+    print(f"old: {old['label']} {old.get('commit')} {old['started_at']}")
+    print(f"new: {new['label']} {new.get('commit')} {new['started_at']}\n")
+
+    print(f"{'endpoint':<22}" + "".join(f"{m:>22}" for m in METRICS))
+
+    for label in sorted(set(old["endpoints"]) | set(new["endpoints"])):
+        a = old["endpoints"].get(label, {})
+        b = new["endpoints"].get(label, {})
+
+        print(f"{label:<22}" + "".join(
+            f"{_delta(a.get(m), b.get(m)):>22}" for m in METRICS
+        ))
+
+    print(f"\ntotal rps: {_delta(old['rps'], new['rps'])}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python -m bench.compare OLD.json NEW.json")
+        sys.exit(1)
+
+    compare(_load(sys.argv[1]), _load(sys.argv[2]))
@@ -0,0 +1,244 @@
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+
+# ================= SYNTHETIC DATA =================
+
+# Детерминированный набор данных для нагрузочных прогонов:
+# одинаковые параметры и seed -> одинаковая база (даты — относительно сегодня).
+#
+#   python -m bench.generate --db sqlite:///bench.db --employees 50 --days 730
+
+CHUNK = 5000
+
+PAYMENTS = ["CASH", "CASH", "QR", "QR", "QR", "TRANSFER"]
+
+
+def employee_pin(i: int) -> str:
+    # PIN сотрудников бенча: 100000 + номер, админ — 999999
+    return str(100000 + i)
+
+
+ADMIN_PIN = "999999"
+
+
+def _insert(conn, table, rows):
+    for start in range(0, len(rows), CHUNK):
+        conn.execute(table.insert(), rows[start:start + CHUNK])
+
+
+def generate(
+    bind,
+    employees: int = 50,
+    branches: int = 5,
+    days: int = 730,
+    orders_per_day: int = 15,
+    in_progress: int = 2,
+    seed: int = 42,
+    today: date = None
+):
+    from models import Employee, Service, Shift, Order, OrderService
+    from seed_employees import employees_data
+    from seed_services import services_data
+    from services.auth import pin_key
+    from services.clock import business_date, local_day_range, local_today
+
+    rng = random.Random(seed)
+
+    names = [e["name"] for e in employees_data if e["role"] == "EMPLOYEE"]
+
+    with bind.begin() as conn:
+
+        _insert(conn, Service.__table__, [
+            {"id": i, "name": name, "price": price}
+            for i, (name, price) in enumerate(services_data, 1)
+        ])
+        prices = {i: price for i, (_, price) in enumerate(services_data, 1)}
+        service_ids = list(prices)
+
+        staff = [
+            {
+                "id": i,
+                "name": f"{names[(i - 1) % len(names)]} {i}",
+                "pin": employee_pin(i),
+                "pin_hash": pin_key(employee_pin(i)),
+                "role": "EMPLOYEE",
+                "branch_id": (i - 1) % branches + 1,
+                "is_active": True,
+            }
+            for i in range(1, employees + 1)
+        ]
+        staff.append({
+            "id": employees + 1,
+            "name": "Admin",
+            "pin": ADMIN_PIN,
+            "pin_hash": pin_key(ADMIN_PIN),
+            "role": "ADMIN",
+            "branch_id": 1,
+            "is_active": True,
+        })
+        _insert(conn, Employee.__table__, staff)
+
+        # «Сегодня» и рабочий день — в поясе филиала (services/clock.py)
+        branch_today = {
+            b: today or local_today(b)
+            for b in {e["branch_id"] for e in staff}
+        }
+
+        # Сегодня у всех открыта смена — /orders/start работает сразу
+        now = datetime.utcnow()
+        shift_start = now - timedelta(hours=8)
+        _insert(conn, Shift.__table__, [
+            {
+                "employee_id": e["id"],
+                "started_at": shift_start,
+                "business_date": business_date(shift_start, e["branch_id"]),
+                "is_active": True,
+            }
+            for e in staff
+        ])
+
+        order_id = 0
+        orders = []
+        lines = []
+
+        def flush():
+            _insert(conn, Order.__table__, orders)
+            _insert(conn, OrderService.__table__, lines)
+            orders.clear()
+            lines.clear()
+
+        for day_offset in range(days, -1, -1):
+
+            if day_offset:
+                # Рабочий день 09:00–19:00 по местному времени филиала
+                openings = {
+                    b: local_day_range(day - timedelta(days=day_offset), b)[0] + timedelta(hours=9)
+                    for b, day in branch_today.items()
+                }
+                window = 600
+            else:
+                # Сегодня — последние 6 часов, всё завершено до «сейчас»
+                openings = {b: now - timedelta(hours=6) for b in branch_today}
+                window = 300
+
+            for e in staff[:-1]:
+                opening = openings[e["branch_id"]]
+                count = max(0, int(rng.gauss(orders_per_day, orders_per_day / 4)))
+
+                for _ in range(count):
+                    order_id += 1
+
+                    created_at = opening + timedelta(minutes=rng.randrange(window))
+                    completed_at = created_at + timedelta(minutes=rng.randrange(5, 60))
+                    picked = rng.sample(service_ids, rng.choice((1, 1, 1, 2, 2, 3)))
+                    total = sum(prices[s] for s in picked)
+
+                    if rng.random() < 0.05:
+                        status, payment_type, payment_status = "NOT_PROVIDED", None, "NOT_PAID"
+                    else:
+                        status, payment_type, payment_status = "COMPLETED", rng.choice(PAYMENTS), "PAID"
+
+                    orders.append({
+                        "id": order_id,
+                        "service_id": picked[0],
+                        "employee_id": e["id"],
+                        "branch_id": e["branch_id"],
+                        "client_name": f"Клиент {order_id}",
+                        "client_phone": f"+7700{order_id:07d}",
+                        "status": status,
+                        "payment_type": payment_type,
+                        "payment_status": payment_status,
+                        "not_provided_reason": "нет документов" if status == "NOT_PROVIDED" else None,
+                        "created_at": created_at,
+                        "completed_at": completed_at,
+                        "business_date": business_date(completed_at, e["branch_id"]),
+                        "total": total,
+                    })
+                    lines.extend(
+                        {"order_id": order_id, "service_id": s, "price": prices[s]}
+                        for s in picked
+                    )
+
+            if len(orders) >= CHUNK:
+                flush()
+
+        # Несколько заказов «в работе» на сотрудника для /orders/in-progress
+        for e in staff[:-1]:
+            for _ in range(in_progress):
+                order_id += 1
+                picked = rng.sample(service_ids, 1)
+                orders.append({
+                    "id": order_id,
+                    "service_id": picked[0],
+                    "employee_id": e["id"],
+                    "branch_id": e["branch_id"],
+                    "client_name": f"Клиент {order_id}",
+                    "client_phone": f"+7700{order_id:07d}",
+                    "status": "IN_PROGRESS",
+                    "payment_type": None,
+                    "payment_status": "NOT_PAID",
+                    "not_provided_reason": None,
+                    "created_at": now - timedelta(minutes=rng.randrange(60)),
+                    "completed_at": None,
+                    "business_date": None,
+                    "total": prices[picked[0]],
+                })
+                lines.append({"order_id": order_id, "service_id": picked[0], "price": prices[picked[0]]})
+
+        flush()
+
+    return {"employees": employees, "branches": branches, "days": days, "orders": order_id}
+
+
+def build(url: str, **params):
+    # Новая база: схема через migrations.upgrade, данные, затем rollup
+    os.environ["DATABASE_URL"] = url
+
+    from database import engine, SessionLocal
+    from migrations import upgrade
+    from services.rollup import rebuild
+
+    upgrade(engine)
+
+    stats = generate(engine, **params)
+
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic data for bench runs")
+    parser.add_argument("--db", default="sqlite:///bench.db")
+    parser.add_argument("--employees", type=int, default=50)
+    parser.add_argument("--branches", type=int, default=5)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--orders-per-day", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if args.db.startswith("sqlite:///") and os.path.exists(args.db[len("sqlite:///"):]):
+        sys.exit(f"{args.db} already exists — remove it or pass another --db")
+
+    stats = build(
+        args.db,
+        employees=args.employees,
+        branches=args.branches,
+        days=args.days,
+        orders_per_day=args.orders_per_day,
+        seed=args.seed,
+    )
+    print(f"generated: {stats}")
+
+
+if __name__ == "__main__":
+    main()
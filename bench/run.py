@@ -0,0 +1,398 @@
+import argparse
+import contextvars
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta
+from services.clock import local_today
+
+
+# ================= LOAD RUN =================
+
+# Сценарная нагрузка на приложение в этом же процессе (uvicorn в потоке,
+# клиенты — потоки с httpx). База — готовая, из bench.generate:
+#
+#   python -m bench.run --db sqlite:///bench.db --users 8 --duration 30 --label baseline
+#
+# Результат: таблица p50/p95/p99, rps и запросов к БД на эндпоинт,
+# плюс JSON в bench/results/ для сравнения (python -m bench.compare).
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Вес эндпоинта в сценарии сотрудника
+EMPLOYEE_MIX = [
+    ("auth_pin", 5),
+    ("services", 10),
+    ("orders_start", 20),
+    ("orders_complete", 18),
+    ("orders_not_provided", 2),
+    ("orders_in_progress", 20),
+    ("today_stats", 15),
+    ("history", 5),
+]
+
+# Доля запросов админских отчётов
+ADMIN_MIX = [
+    ("report_today", 6),
+    ("report_period", 2),
+    ("admin_history", 2),
+]
+
+
+# ================= QUERY COUNTER =================
+
+_queries = contextvars.ContextVar("bench_queries", default=None)
+
+
+class QueryCounter:
+    # ASGI-middleware: считает SQL-запросы одного HTTP-запроса.
+    # Метка эндпоинта приходит от клиента бенча в X-Bench-Endpoint
+
+    def __init__(self, app, stats):
+        self.app = app
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        counter = [0]
+        token = _queries.set(counter)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _queries.reset(token)
+            label = dict(scope["headers"]).get(b"x-bench-endpoint", b"").decode()
+            self.stats.setdefault(label, []).append(counter[0])
+
+
+def _count_query(*args):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+# ================= STATS =================
+
+def percentile(values, p):
+    # Nearest-rank по отсортированному списку
+    if not values:
+        return None
+    k = max(0, min(len(values) - 1, int(round(p / 100 * len(values))) - 1))
+    return values[k]
+
+
+def summarize(latencies, errors, queries, elapsed):
+
+    endpoints = {}
+
+    for label in sorted(latencies):
+        values = sorted(latencies[label])
+        q = queries.get(label, [])
+
+        endpoints[label] = {
+            "requests": len(values),
+            "errors": errors.get(label, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2),
+            "queries_avg": round(sum(q) / len(q), 2) if q else None,
+            "queries_max": max(q) if q else None,
+        }
+
+    total = sum(e["requests"] for e in endpoints.values())
+
+    return {
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def print_table(summary):
+
+    print(f"{'endpoint':<22}{'n':>7}{'err':>5}{'rps':>9}"
+          f"{'p50':>9}{'p95':>9}{'p99':>9}{'q avg':>8}{'q max':>7}")
+
+    for label, e in summary["endpoints"].items():
+        print(
+            f"{label:<22}{e['requests']:>7}{e['errors']:>5}{e['rps']:>9}"
+            f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}"
+            f"{e['queries_avg'] if e['queries_avg'] is not None else '-':>8}"
+            f"{e['queries_max'] if e['queries_max'] is not None else '-':>7}"
+        )
+
+    print(f"total: {summary['requests']} requests, "
+          f"{summary['errors']} errors, {summary['rps']} req/s")
+
+
+# ================= SCENARIO =================
+
+class VirtualUser:
+
+    def __init__(self, client, employee, admin_id, rng, record):
+        self.client = client
+        self.employee_id, self.pin = employee
+        self.admin_id = admin_id
+        self.rng = rng
+        self.record = record
+        self.open_orders = []
+        self.service_ids = []
+
+    def call(self, label, method, url, **kwargs):
+        started = time.perf_counter()
+        response = self.client.request(
+            method, url, headers={"X-Bench-Endpoint": label}, **kwargs
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+
+        body = None
+        if response.headers.get("content-type", "").startswith("application/json"):
+            body = response.json()
+
+        failed = response.status_code >= 400 or (
+            isinstance(body, dict) and "error" in body
+        )
+        self.record(label, elapsed, failed)
+
+        return body
+
+    def step(self, label):
+        rng = self.rng
+        employee_id = self.employee_id
+
+        if label == "auth_pin":
+            self.call(label, "POST", "/auth/pin", json={"pin": self.pin})
+
+        elif label == "services":
+            services = self.call(label, "GET", "/services")
+            if services:
+                self.service_ids = [s["id"] for s in services]
+
+        elif label == "orders_start":
+            body = self.call(label, "POST", "/orders/start", json={
+                "service_ids": rng.sample(self.service_ids, rng.choice((1, 1, 2))),
+                "employee_id": employee_id,
+                "branch_id": 1,
+                "client_name": "Bench",
+                "client_phone": "+77000000000",
+            })
+            if body and body.get("order_id"):
+                self.open_orders.append(body["order_id"])
+
+        elif label in ("orders_complete", "orders_not_provided"):
+            if not self.open_orders:
+                return self.step("orders_start")
+
+            order_id = self.open_orders.pop(0)
+
+            if label == "orders_complete":
+                self.call(label, "POST", f"/orders/{order_id}/complete",
+                          json={"payment_type": rng.choice(("CASH", "QR", "TRANSFER"))})
+            else:
+                self.call(label, "POST", f"/orders/{order_id}/not-provided",
+                          json={"reason": "bench"})
+
+        elif label == "orders_in_progress":
+            self.call(label, "GET", "/orders/in-progress", params={"employee_id": employee_id})
+
+        elif label == "today_stats":
+            self.call(label, "GET", "/employee/today-stats", params={"employee_id": employee_id})
+
+        elif label == "history":
+            self.call(label, "GET", "/employee/history", params={"employee_id": employee_id})
+
+        elif label == "report_today":
+            self.call(label, "GET", "/admin/report/today", params={"employee_id": self.admin_id})
+
+        elif label == "report_period":
+            end = local_today()
+            start = end - timedelta(days=30)
+            self.call(label, "GET", "/admin/report/period", params={
+                "employee_id": self.admin_id,
+                "start_date": str(start),
+                "end_date": str(end),
+            })
+
+        elif label == "admin_history":
+            self.call(label, "GET", "/admin/orders/history", params={
+                "employee_id": self.admin_id,
+                "limit": 50,
+            })
+
+    def run(self, deadline, admin_share):
+        labels, weights = zip(*EMPLOYEE_MIX)
+        admin_labels, admin_weights = zip(*ADMIN_MIX)
+
+        # Как фронтенд: сначала каталог услуг
+        self.step("services")
+
+        while time.monotonic() < deadline:
+            if self.rng.random() < admin_share:
+                label = self.rng.choices(admin_labels, admin_weights)[0]
+            else:
+                label = self.rng.choices(labels, weights)[0]
+            self.step(label)
+
+
+# ================= RUNNER =================
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _start_server(app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    while not server.started:
+        time.sleep(0.05)
+
+    return server, thread
+
+
+def run(url, users=8, duration=30.0, seed=42, admin_share=0.05, port=8765, label="run"):
+    # До импорта main: база бенча, без Telegram-воркера
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("TELEGRAM_WORKER", "0")
+    os.environ.setdefault("TELEGRAM_TOKEN", "")
+
+    import httpx
+    from sqlalchemy import event, select
+    from sqlalchemy.engine import make_url
+    import database
+    import main as app_module
+    from models import Employee
+    from bench.generate import employee_pin
+
+    queries = {}
+    app_module.app.add_middleware(QueryCounter, stats=queries)
+
+    event.listen(database.engine, "before_cursor_execute", _count_query)
+    if database.DATA_LAYER != "sync":
+        event.listen(database.get_async_engine().sync_engine, "before_cursor_execute", _count_query)
+
+    with database.engine.connect() as conn:
+        staff = conn.execute(
+            select(Employee.id, Employee.role).where(Employee.is_active == True).order_by(Employee.id)
+        ).all()
+
+    employees = [(i, employee_pin(i)) for i, role in staff if role == "EMPLOYEE"]
+    admin_id = next(i for i, role in staff if role == "ADMIN")
+
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def record(name, ms, failed):
+        with lock:
+            latencies.setdefault(name, []).append(ms)
+            if failed:
+                errors[name] = errors.get(name, 0) + 1
+
+    server, server_thread = _start_server(app_module.app, port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    clients = [httpx.Client(base_url=base_url, timeout=30) for _ in range(users)]
+    vus = [
+        VirtualUser(clients[i], employees[i % len(employees)], admin_id,
+                    random.Random(seed + i), record)
+        for i in range(users)
+    ]
+
+    started = time.monotonic()
+    deadline = started + duration
+
+    threads = [
+        threading.Thread(target=vu.run, args=(deadline, admin_share))
+        for vu in vus
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    elapsed = time.monotonic() - started
+
+    for client in clients:
+        client.close()
+
+    server.should_exit = True
+    server_thread.join()
+
+    summary = summarize(latencies, errors, queries, elapsed)
+
+    return {
+        "label": label,
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "database": make_url(url).render_as_string(hide_password=True),
+        "profile": database.profile_name(url),
+        "data_layer": database.DATA_LAYER,
+        "python": platform.python_version(),
+        "users": users,
+        "duration_s": round(elapsed, 2),
+        "seed": seed,
+        **summary,
+    }
+
+
+def save(result, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{stamp}-{result['label']}.json")
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scripted load against the app")
+    parser.add_argument("--db", default="sqlite:///bench.db")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--admin-share", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    result = run(
+        args.db,
+        users=args.users,
+        duration=args.duration,
+        seed=args.seed,
+        admin_share=args.admin_share,
+        port=args.port,
+        label=args.label,
+    )
+
+    print_table(result)
+
+    if not args.no_save:
+        print(f"saved: {save(result)}")
+
+
+if __name__ == "__main__":
+    main()
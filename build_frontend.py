@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# ================= FRONTEND BUILD =================
+
+# frontend/ -> frontend/dist/:
+#   app.js -> app.<hash>.js (имя по содержимому, кэшируется навсегда),
+#   ссылки в *.html переписаны на новые имена, HTML — под старым именем,
+#   рядом с каждым файлом .gz и .br (brotli — если пакет установлен).
+#
+#   python build_frontend.py
+#
+# main.py отдаёт dist/, если он собран, иначе исходники как есть.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, "frontend")
+DIST_DIR = os.path.join(SOURCE_DIR, "dist")
+
+HASHED = (".js", ".css", ".svg", ".png", ".ico", ".woff2")
+COMPRESSED = (".html", ".js", ".css", ".svg", ".json")
+
+HASH_LENGTH = 12
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{content_hash(data)}{ext}"
+
+
+def rewrite_html(html: str, names: dict) -> str:
+    # src="app.js", src="./admin.js", href='style.css' — только локальные файлы
+    def replace(match):
+        attr, quote, prefix, name = match.groups()
+        return f"{attr}={quote}{prefix or ''}{names.get(name, name)}{quote}"
+
+    return re.sub(r'(src|href)=(["\'])(\./)?([\w.\-]+)\2', replace, html)
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def compress(path):
+    # Сжатую копию оставляем, только если она меньше оригинала
+    with open(path, "rb") as f:
+        data = f.read()
+
+    written = []
+
+    # mtime=0 — одинаковый вход даёт одинаковый .gz
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        _write(path + ".gz", gz)
+        written.append(path + ".gz")
+
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            _write(path + ".br", br)
+            written.append(path + ".br")
+
+    return written
+
+
+def build(source=SOURCE_DIR, dist=DIST_DIR):
+
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+    os.makedirs(dist)
+
+    files = sorted(
+        name for name in os.listdir(source)
+        if os.path.isfile(os.path.join(source, name))
+    )
+
+    names = {}
+    outputs = []
+
+    # Сначала ассеты: их хэши нужны для ссылок в HTML
+    for name in files:
+        if not name.endswith(HASHED):
+            continue
+
+        with open(os.path.join(source, name), "rb") as f:
+            data = f.read()
+
+        names[name] = hashed_name(name, data)
+        _write(os.path.join(dist, names[name]), data)
+        outputs.append(names[name])
+
+    for name in files:
+        if name.endswith(HASHED):
+            continue
+
+        with open(os.path.join(source, name), "rb") as f:
+            data = f.read()
+
+        if name.endswith(".html"):
+            data = rewrite_html(data.decode("utf-8"), names).encode("utf-8")
+
+        names.setdefault(name, name)
+        _write(os.path.join(dist, name), data)
+        outputs.append(name)
+
+    for name in outputs:
+        if name.endswith(COMPRESSED):
+            compress(os.path.join(dist, name))
+
+    manifest = {name: names[name] for name in files}
+    _write(
+        os.path.join(dist, "manifest.json"),
+        json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+    )
+
+    return manifest
+
+
+if __name__ == "__main__":
+    manifest = build(*sys.argv[1:3])
+
+    for source_name, built_name in manifest.items():
+        print(f"{source_name} -> {built_name}")
+
+    if brotli is None:
+        print("brotli not installed: only .gz variants written")
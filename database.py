@@ -1,15 +1,353 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 from dotenv import load_dotenv
 
+# Единственное место загрузки .env: все модули приложения импортируют database
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(
+# sync — обычные def-эндпоинты на threadpool,
+# async — AsyncSession-эндпоинты вместо sync,
+# both — sync как есть + async-копии под /async для сравнения
+DATA_LAYER = os.getenv("DATA_LAYER", "sync")
+
+
+# ================= PROFILES =================
+
+# DB_PROFILE=postgres|sqlite|test, по умолчанию — по схеме DATABASE_URL.
+# Любое значение можно переопределить через DB_POOL_SIZE, DB_MAX_OVERFLOW,
+# DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT_MS, DB_BUSY_TIMEOUT_MS.
+PROFILES = {
+    # Продакшн Postgres
+    "postgres": {
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_timeout_ms": 15000,
+        "connect_timeout": 5,
+    },
+    # Киоск на локальном SQLite-файле
+    "sqlite": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 10,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "busy_timeout_ms": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+    },
+    # Тесты: маленький пул, быстрые таймауты
+    "test": {
+        "pool_size": 2,
+        "max_overflow": 0,
+        "pool_timeout": 5,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_timeout_ms": 5000,
+        "busy_timeout_ms": 1000,
+        "connect_timeout": 2,
+    },
+}
+
+_ENV_OVERRIDES = {
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+    "pool_recycle": "DB_POOL_RECYCLE",
+    "statement_timeout_ms": "DB_STATEMENT_TIMEOUT_MS",
+    "busy_timeout_ms": "DB_BUSY_TIMEOUT_MS",
+}
+
+
+def profile_name(url=None):
+    url = url or DATABASE_URL or ""
+    default = "sqlite" if url.startswith("sqlite") else "postgres"
+    return os.getenv("DB_PROFILE", default)
+
+
+def profile_settings(name):
+    settings = dict(PROFILES[name])
+
+    for key, env in _ENV_OVERRIDES.items():
+        if os.getenv(env):
+            settings[key] = int(os.getenv(env))
+
+    return settings
+
+
+# ================= POOL STATS =================
+
+class PoolStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def record(self, waited, overflowed=False, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            if overflowed:
+                self.overflow_events += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "wait_total_ms": round(self.wait_total * 1000, 3),
+                "wait_avg_ms": round(
+                    self.wait_total * 1000 / self.checkouts, 3
+                ) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+            }
+
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "max_overflow": pool._max_overflow,
+            })
+
+        stats["pool"] = pool.status()
+        return stats
+
+
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    # Замеряем ожидание свободного соединения и выходы за pool_size
+
+    stats = pool_stats
+
+    def _do_get(self):
+        overflow_before = self._overflow
+        started = time.perf_counter()
+
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+
+        self.stats.record(
+            time.perf_counter() - started,
+            overflowed=self._overflow > overflow_before and self._overflow > 0,
+        )
+        return conn
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+# ================= ENGINE =================
+
+def _is_memory_sqlite(url):
+    return ":memory:" in url or url.split("://", 1)[1] in ("", "/")
+
+
+def _engine_options(url, settings, is_async=False):
+    is_sqlite = url.startswith("sqlite")
+    kwargs = {}
+    connect_args = {}
+
+    if is_sqlite and _is_memory_sqlite(url):
+        # Одна общая in-memory база на все потоки
+        kwargs["poolclass"] = StaticPool
+        connect_args["check_same_thread"] = False
+    else:
+        kwargs.update(
+            poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_recycle=settings["pool_recycle"],
+            pool_pre_ping=settings["pool_pre_ping"],
+        )
+        if is_sqlite:
+            connect_args["check_same_thread"] = False
+
+    if url.startswith("postgresql") and is_async:
+        # asyncpg
+        if settings.get("statement_timeout_ms"):
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings["statement_timeout_ms"])
+            }
+        if settings.get("connect_timeout"):
+            connect_args["timeout"] = settings["connect_timeout"]
+    elif url.startswith("postgresql"):
+        options = []
+        if settings.get("statement_timeout_ms"):
+            options.append(f"-c statement_timeout={settings['statement_timeout_ms']}")
+        if options:
+            connect_args["options"] = " ".join(options)
+        if settings.get("connect_timeout"):
+            connect_args["connect_timeout"] = settings["connect_timeout"]
+
+    return kwargs, connect_args
+
+
+def _install_sqlite_pragmas(sync_engine, url, settings):
+
+    @event.listens_for(sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        if settings.get("busy_timeout_ms"):
+            cursor.execute(f"PRAGMA busy_timeout = {settings['busy_timeout_ms']}")
+        if settings.get("journal_mode") and not _is_memory_sqlite(url):
+            cursor.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+        if settings.get("synchronous"):
+            cursor.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+        cursor.close()
+
+
+def build_engine(url=None, profile=None):
+    url = url or DATABASE_URL
+    settings = profile_settings(profile or profile_name(url))
+
+    kwargs, connect_args = _engine_options(url, settings)
+    new_engine = create_engine(url, connect_args=connect_args, **kwargs)
+
+    if url.startswith("sqlite"):
+        _install_sqlite_pragmas(new_engine, url, settings)
+
+    return new_engine
+
+
+def async_url(url):
+    # Тот же DATABASE_URL, но с async-драйвером
+    scheme, rest = url.split("://", 1)
+
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme in ("sqlite", "sqlite+pysqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+
+    return url
+
+
+def build_async_engine(url=None, profile=None):
+    url = url or DATABASE_URL
+    settings = profile_settings(profile or profile_name(url))
+
+    url = async_url(url)
+    kwargs, connect_args = _engine_options(url, settings, is_async=True)
+    new_engine = create_async_engine(url, connect_args=connect_args, **kwargs)
+
+    if url.startswith("sqlite"):
+        _install_sqlite_pragmas(new_engine.sync_engine, url, settings)
+
+    return new_engine
+
+
+# Engine создаётся при первом обращении (первая сессия, lifespan, миграции) —
+# импорт модуля не грузит драйвер и не трогает БД
+_engine = None
+_engine_lock = threading.Lock()
+_engine_hooks = []
+
+
+def on_engine(hook):
+    # hook(engine) — при создании engine (или сразу, если уже создан):
+    # метрики, query watch и т.п. без создания engine на импорте
+    _engine_hooks.append(hook)
+    if _engine is not None:
+        hook(_engine)
+    return hook
+
+
+def get_engine():
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                new_engine = build_engine()
+                for hook in _engine_hooks:
+                    hook(new_engine)
+                SessionLocal.configure(bind=new_engine)
+                _engine = new_engine
+
+    return _engine
+
+
+class _LazySessionmaker(sessionmaker):
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(
     autocommit=False,
-    autoflush=False,
-    bind=engine
-)
\ No newline at end of file
+    autoflush=False
+)
+
+
+def __getattr__(name):
+    # from database import engine — как раньше, но лениво
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ================= ASYNC =================
+
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    # Создаём только когда async-слой реально используется
+    global _async_engine
+
+    if _async_engine is None:
+        _async_engine = build_async_engine()
+
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    global _async_session_factory
+
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(
+            get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False,
+        )
+
+    return _async_session_factory()
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_session_factory
+
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
@@ -0,0 +1,76 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+# Локальный фейковый Telegram Bot API для тестов outbox-воркера:
+#   python fake_telegram.py 8081
+#   TELEGRAM_API_URL=http://127.0.0.1:8081 uvicorn main:app
+
+
+class FakeTelegram:
+
+    def __init__(self, host="127.0.0.1", port=0, fail_first=0):
+        self.messages = []
+        # Первые N запросов отвечают 500 — для проверки повторов
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = parse_qs(self.rfile.read(length).decode("utf-8"))
+
+                with fake._lock:
+                    if fake.fail_first > 0:
+                        fake.fail_first -= 1
+                        self._reply(500, {"ok": False, "description": "fake failure"})
+                        return
+
+                    fake.messages.append({
+                        "path": self.path,
+                        "chat_id": body.get("chat_id", [""])[0],
+                        "text": body.get("text", [""])[0],
+                    })
+
+                self._reply(200, {"ok": True, "result": {}})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    fake = FakeTelegram(port=port)
+    print("Fake Telegram listening on", fake.url)
+    fake.server.serve_forever()
@@ -1,6 +1,10 @@
 const API = "";
 const AUTH_KEY = "auth_user";
 
+// Отчёт за сегодня: догружается событиями /events, без опроса
+let todayReport = null;
+let periodShown = false;
+
 /* ================= TOAST ================= */
 
 function showToast(message, type = "success") {
@@ -72,7 +76,15 @@ async function loadReport() {
 
     if (!res.ok) return;
 
-    const data = await res.json();
+    todayReport = await res.json();
+    periodShown = false;
+
+    renderToday();
+}
+
+function renderToday() {
+
+    const data = todayReport;
 
     document.getElementById("reportDate").textContent =
         `Дата: ${data.date}`;
@@ -242,6 +254,7 @@ async function loadPeriodReport() {
 
     const data = await res.json();
 
+    periodShown = true;
     renderReport(data);
 }
 function renderReport(data) {
@@ -297,10 +310,57 @@ document.getElementById("logoutBtn").onclick = () => {
     location.href = "index.html";
 };
 
+/* ================= EVENTS ================= */
+
+const PAYMENT_FIELDS = { CASH: "cash", QR: "qr", TRANSFER: "transfer" };
+
+function applyCompleted(o) {
+
+    const emp = todayReport.employees.find(e => e.employee_id === o.employee_id);
+    const field = PAYMENT_FIELDS[o.payment_type];
+
+    // Новый сотрудник или неизвестный тип оплаты — проще перечитать
+    if (!emp || !field) {
+        loadReport();
+        return;
+    }
+
+    emp.services_count += o.services_count;
+    emp.total += o.amount;
+    emp[field] += o.amount;
+
+    todayReport.total_all += o.amount;
+    todayReport[`${field}_all`] += o.amount;
+
+    renderToday();
+}
+
+function connectEvents(auth) {
+
+    const events = new EventSource(`${API}/events?employee_id=${auth.employee_id}`);
+
+    // Подключение и переподключение — полная сверка с сервером
+    events.onopen = () => {
+        if (!periodShown) loadReport();
+    };
+
+    events.addEventListener("order_completed", e => {
+        // Пока открыт отчёт за период, сегодняшние дельты не применяем
+        if (periodShown || !todayReport) return;
+        applyCompleted(JSON.parse(e.data));
+    });
+
+    events.addEventListener("report_reset", () => {
+        if (!periodShown) loadReport();
+    });
+}
+
 /* ================= INIT ================= */
 
 (async () => {
-    await checkAdmin();
+    const auth = await checkAdmin();
+    if (!auth) return;
+
     await loadReport();
-    setInterval(loadReport, 60000);
+    connectEvents(auth);
 })();
\ No newline at end of file
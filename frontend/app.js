@@ -24,6 +24,11 @@ const selectedServicesContainer = document.getElementById("selectedServices");
 
 let selectedServices = [];
 
+// Состояние экрана: обновляется событиями /events, а не опросом
+let inProgressOrders = [];
+let todayServicesCount = 0;
+let events = null;
+
 /* ================= TOAST ================= */
 
 function showToast(message, type = "success") {
@@ -87,9 +92,7 @@ function showApp() {
     employeeName.textContent = `👤 ${auth.name}`;
 
     loadServices();
-    loadInProgress();
-    loadTodayStats(); // 🔥 добавили сюда
-    loadHistory();
+    connectEvents(); // при подключении загрузит заказы, статистику и историю
 }
 
 /* ================= SERVICES ================= */
@@ -166,37 +169,77 @@ startBtn.onclick = async () => {
 
     startBtn.disabled = true;
 
-    const res = await fetch(`${API}/orders/start`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-            service_ids: selectedServices,
-            branch_id: 1,
-            employee_id: auth.employee_id,
-            client_name: name,
-            client_phone: phone
-        })
+    // Через офлайн-очередь: order_id придёт событием order_started после /sync
+    const op = await enqueueOperation(auth.employee_id, {
+        type: "start",
+        client_id: newId(),
+        service_ids: selectedServices,
+        client_name: name,
+        client_phone: phone,
+        services: selectedServices.map(serviceName)
     });
 
-    const data = await res.json();
-
-    if (data.order_id) {
-        showToast("Услуги начаты");
+    inProgressOrders.push(pendingOrder(op));
+    renderInProgress();
 
-        clientName.value = "";
-        clientPhone.value = "";
-        selectedServices = [];
-        renderSelectedServices();
+    showToast(navigator.onLine ? "Услуги начаты" : "Нет сети: услуги сохранены");
 
-        loadInProgress();
-        loadTodayStats(); // 🔥 обновляем статистику
-    } else {
-        showToast(data.error || "Ошибка", "error");
-    }
+    clientName.value = "";
+    clientPhone.value = "";
+    selectedServices = [];
+    renderSelectedServices();
 
     startBtn.disabled = false;
 };
 
+function serviceName(id) {
+    const option = serviceSelect.querySelector(`option[value="${id}"]`);
+    return option ? option.textContent.split(" — ")[0] : "Услуга";
+}
+
+function pendingOrder(op) {
+    return {
+        order_id: null,
+        client_id: op.client_id,
+        client_name: op.client_name,
+        services: op.services,
+        started_at: op.at
+    };
+}
+
+/* ================= PENDING OPERATIONS ================= */
+
+// Заказ из очереди — по client_id, с сервера без него — по order_id
+function orderKey(o) {
+    return o.client_id || String(o.order_id);
+}
+
+function finishedKeys(pending) {
+    const keys = new Set();
+
+    pending.forEach(op => {
+        if (op.type === "start") return;
+        if (op.order_client_id) keys.add(op.order_client_id);
+        if (op.order_id) keys.add(String(op.order_id));
+    });
+
+    return keys;
+}
+
+function isFinished(o, keys) {
+    return keys.has(String(o.order_id)) || (o.client_id && keys.has(o.client_id));
+}
+
+onQueueSynced = results => {
+    const errors = results.filter(r => r.error && !r.duplicate);
+    if (!errors.length) return;
+
+    showToast(errors[0].error, "error");
+
+    // Сервер отказал — экран сверяем с ним
+    loadInProgress();
+};
+
 /* ================= IN PROGRESS ================= */
 
 async function loadInProgress() {
@@ -204,11 +247,36 @@ async function loadInProgress() {
     const auth = JSON.parse(localStorage.getItem(AUTH_KEY));
     if (!auth) return;
 
-    inProgressList.innerHTML = "";
-
     const res = await fetch(`${API}/orders/in-progress?employee_id=${auth.employee_id}`);
     const orders = await res.json();
 
+    // Поверх ответа — то, что ещё лежит в очереди и до сервера не дошло
+    const pending = await pendingOperations(auth.employee_id);
+    const finished = finishedKeys(pending);
+    const known = new Set(orders.map(o => o.client_id).filter(Boolean));
+
+    // Минуты дальше считаем локально от времени старта
+    inProgressOrders = orders
+        .map(o => ({
+            ...o,
+            started_at: Date.now() - o.minutes_in_progress * 60000
+        }))
+        .concat(
+            pending
+                .filter(op => op.type === "start" && !known.has(op.client_id))
+                .map(pendingOrder)
+        )
+        .filter(o => !isFinished(o, finished));
+
+    renderInProgress();
+}
+
+function renderInProgress() {
+
+    inProgressList.innerHTML = "";
+
+    const orders = inProgressOrders;
+
     if (!orders.length) {
         inProgressList.innerHTML =
             `<p class="text-gray-500 text-sm">Нет активных услуг</p>`;
@@ -218,6 +286,7 @@ async function loadInProgress() {
     orders.forEach(o => {
 
         const servicesText = o.services ? o.services.join(", ") : "";
+        const minutes = Math.floor((Date.now() - o.started_at) / 60000);
 
         const card = document.createElement("div");
         card.className =
@@ -230,28 +299,28 @@ async function loadInProgress() {
                     <p class="text-sm text-gray-500">${o.client_name}</p>
                 </div>
                 <div class="text-sm">
-                    ⏱ ${o.minutes_in_progress} мин
+                    ⏱ ${minutes} мин
                 </div>
             </div>
 
             <div class="flex gap-2">
                 <button class="flex-1 bg-green-600 text-white py-2 rounded-xl"
-                    onclick="completeOrder(${o.order_id}, 'CASH')">
+                    onclick="completeOrder('${orderKey(o)}', 'CASH')">
                     💵 Нал
                 </button>
 
                 <button class="flex-1 bg-blue-600 text-white py-2 rounded-xl"
-                    onclick="completeOrder(${o.order_id}, 'QR')">
+                    onclick="completeOrder('${orderKey(o)}', 'QR')">
                     📱 QR
                 </button>
 
                 <button class="flex-1 bg-purple-600 text-white py-2 rounded-xl"
-                  onclick="completeOrder(${o.order_id}, 'TRANSFER')">
+                  onclick="completeOrder('${orderKey(o)}', 'TRANSFER')">
                  💳 Перевод
                 </button>
 
                 <button class="flex-1 bg-red-600 text-white py-2 rounded-xl"
-                    onclick="failOrder(${o.order_id})">
+                    onclick="failOrder('${orderKey(o)}')">
                     ❌ Не оказана
                 </button>
             </div>
@@ -263,37 +332,45 @@ async function loadInProgress() {
 
 /* ================= COMPLETE ================= */
 
-async function completeOrder(orderId, type) {
+async function completeOrder(key, type) {
 
     if (!confirm("Подтвердить завершение?")) return;
 
-    await fetch(`${API}/orders/${orderId}/complete`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ payment_type: type })
+    const auth = JSON.parse(localStorage.getItem(AUTH_KEY));
+    const o = inProgressOrders.find(x => orderKey(x) === key);
+    if (!auth || !o) return;
+
+    await enqueueOperation(auth.employee_id, {
+        type: "complete",
+        order_id: o.order_id,
+        order_client_id: o.client_id,
+        payment_type: type
     });
 
+    dropInProgress(o);
     showToast("Услуга завершена");
-    loadInProgress();
-    loadTodayStats(); // 🔥 обновляем
 }
 
 /* ================= FAIL ================= */
 
-async function failOrder(orderId) {
+async function failOrder(key) {
 
     const reason = prompt("Причина:");
     if (!reason) return;
 
-    await fetch(`${API}/orders/${orderId}/not-provided`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ reason })
+    const auth = JSON.parse(localStorage.getItem(AUTH_KEY));
+    const o = inProgressOrders.find(x => orderKey(x) === key);
+    if (!auth || !o) return;
+
+    await enqueueOperation(auth.employee_id, {
+        type: "not_provided",
+        order_id: o.order_id,
+        order_client_id: o.client_id,
+        reason
     });
 
+    dropInProgress(o);
     showToast("Отмечено как не оказано", "error");
-    loadInProgress();
-    loadTodayStats(); // 🔥 обновляем
 }
 
 /* ================= TODAY STATS ================= */
@@ -309,12 +386,18 @@ async function loadTodayStats() {
 
     const data = await res.json();
 
+    todayServicesCount = data.services_count;
+    renderTodayStats();
+}
+
+function renderTodayStats() {
+
     document.getElementById("todayStats").innerHTML = `
     <div class="text-lg font-semibold">
         📊 Сегодня
     </div>
     <div class="text-2xl font-bold">
-        ${data.services_count} услуг
+        ${todayServicesCount} услуг
     </div>
 `;
 }
@@ -333,6 +416,8 @@ logoutBtn.onclick = async () => {
         method: "POST"
     });
 
+    if (events) events.close();
+
     localStorage.removeItem(AUTH_KEY);
     location.reload();
 };
@@ -356,18 +441,99 @@ async function loadHistory() {
     }
 
     data.forEach(item => {
+        container.appendChild(historyItem(item));
+    });
+}
 
-        const div = document.createElement("div");
+function historyItem(item) {
 
-        div.className = "border-b pb-1";
+    const div = document.createElement("div");
 
-        div.innerHTML = `
-            <div class="font-medium">${item.service}</div>
-            <div class="text-xs text-gray-500">${item.client}</div>
-        `;
+    div.className = "border-b pb-1";
+
+    div.innerHTML = `
+        <div class="font-medium">${item.service}</div>
+        <div class="text-xs text-gray-500">${item.client}</div>
+    `;
+
+    return div;
+}
+
+function prependHistory(event) {
+
+    const container = document.getElementById("historyList");
+
+    // Заглушка «Нет истории»
+    if (!container.querySelector(".border-b")) container.innerHTML = "";
+
+    [...event.services].reverse().forEach(service => {
+        container.prepend(historyItem({ service, client: event.client_name }));
+    });
+}
+
+/* ================= EVENTS ================= */
+
+function connectEvents() {
+
+    const auth = JSON.parse(localStorage.getItem(AUTH_KEY));
+    if (!auth || events) return;
+
+    events = new EventSource(`${API}/events?employee_id=${auth.employee_id}`);
+
+    // Первое подключение и каждое переподключение — полная сверка,
+    // события за время обрыва не потеряются
+    events.onopen = () => {
+        syncQueue();
+        loadInProgress();
+        loadTodayStats();
+        loadHistory();
+    };
+
+    events.addEventListener("order_started", async e => {
+        const o = JSON.parse(e.data);
+
+        // Свой заказ из очереди: запоминаем выданный сервером id
+        const local = o.client_id && inProgressOrders.find(x => x.client_id === o.client_id);
+        if (local) {
+            local.order_id = o.order_id;
+            return;
+        }
+        if (inProgressOrders.some(x => x.order_id === o.order_id)) return;
+
+        // Уже завершён на киоске, завершение ещё в очереди
+        if (isFinished(o, finishedKeys(await pendingOperations(o.employee_id)))) return;
+
+        inProgressOrders.push({ ...o, started_at: Date.now() });
+        renderInProgress();
+    });
+
+    events.addEventListener("order_completed", e => {
+        const o = JSON.parse(e.data);
+        removeInProgress(o.order_id);
 
-        container.appendChild(div);
+        todayServicesCount += o.services_count;
+        renderTodayStats();
+        prependHistory(o);
     });
+
+    events.addEventListener("order_not_provided", e => {
+        removeInProgress(JSON.parse(e.data).order_id);
+    });
+
+    events.addEventListener("report_reset", () => {
+        loadTodayStats();
+        loadHistory();
+    });
+}
+
+function removeInProgress(orderId) {
+    inProgressOrders = inProgressOrders.filter(o => o.order_id !== orderId);
+    renderInProgress();
+}
+
+function dropInProgress(order) {
+    inProgressOrders = inProgressOrders.filter(o => o !== order);
+    renderInProgress();
 }
 
 /* ================= INIT ================= */
@@ -378,8 +544,10 @@ if (localStorage.getItem(AUTH_KEY)) {
     showApp();
 }
 
+// Хвост очереди с прошлого запуска страницы
+syncQueue();
+
+// Только перерисовка минут, без запросов к серверу
 setInterval(() => {
-    setInterval(loadHistory, 60000);
-    loadInProgress();
-    loadTodayStats();
+    if (inProgressOrders.length) renderInProgress();
 }, 60000);
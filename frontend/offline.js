@@ -0,0 +1,153 @@
+/* ================= OFFLINE QUEUE ================= */
+
+// Старт, завершение и «не оказана» сначала пишутся в IndexedDB, потом
+// уходят пачкой в POST /sync. Обрыв сети и перезагрузка страницы их не
+// теряют, повтор пачки не создаёт дублей: op_id — ключ идемпотентности
+// на сервере, client_id — id заказа, пока сервер не выдал свой.
+
+const QUEUE_DB = "kiosk_queue";
+const QUEUE_STORE = "operations";
+
+const SYNC_BATCH = 100;
+const SYNC_RETRY_MS = 15000;
+
+let queueDb = null;
+let syncing = null;
+let syncTimer = null;
+
+// app.js подставляет обработчик ответов сервера
+let onQueueSynced = () => {};
+
+function openQueue() {
+    if (!queueDb) {
+        queueDb = new Promise((resolve, reject) => {
+            const req = indexedDB.open(QUEUE_DB, 1);
+
+            // seq — порядок операций, в нём же их применяет сервер
+            req.onupgradeneeded = () => {
+                req.result.createObjectStore(QUEUE_STORE, {
+                    keyPath: "seq",
+                    autoIncrement: true
+                });
+            };
+            req.onsuccess = () => resolve(req.result);
+            req.onerror = () => {
+                queueDb = null;
+                reject(req.error);
+            };
+        });
+    }
+    return queueDb;
+}
+
+async function queueRequest(mode, fn) {
+    const db = await openQueue();
+
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(QUEUE_STORE, mode);
+        const req = fn(tx.objectStore(QUEUE_STORE));
+
+        tx.oncomplete = () => resolve(req ? req.result : undefined);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+function newId() {
+    // randomUUID есть только в secure context (https / localhost)
+    if (crypto.randomUUID) return crypto.randomUUID();
+
+    const b = crypto.getRandomValues(new Uint8Array(16));
+    b[6] = (b[6] & 0x0f) | 0x40;
+    b[8] = (b[8] & 0x3f) | 0x80;
+
+    const h = [...b].map(x => x.toString(16).padStart(2, "0")).join("");
+    return `${h.slice(0, 8)}-${h.slice(8, 12)}-${h.slice(12, 16)}-${h.slice(16, 20)}-${h.slice(20)}`;
+}
+
+async function enqueueOperation(employeeId, op) {
+    const item = { ...op, employee_id: employeeId, op_id: newId(), at: Date.now() };
+
+    await queueRequest("readwrite", store => store.add(item));
+    scheduleSync();
+
+    return item;
+}
+
+async function pendingOperations(employeeId) {
+    const ops = await queueRequest("readonly", store => store.getAll());
+    return ops.filter(op => op.employee_id === employeeId);
+}
+
+function removeOperations(ops) {
+    return queueRequest("readwrite", store => {
+        ops.forEach(op => store.delete(op.seq));
+    });
+}
+
+/* ================= SYNC ================= */
+
+function scheduleSync(delay = 300) {
+    // Несколько кликов подряд уходят одной пачкой
+    clearTimeout(syncTimer);
+    syncTimer = setTimeout(syncQueue, delay);
+}
+
+function syncQueue() {
+    if (!syncing) {
+        syncing = flushQueue().finally(() => {
+            syncing = null;
+        });
+    }
+    return syncing;
+}
+
+async function flushQueue() {
+
+    while (true) {
+        const ops = await queueRequest("readonly", store => store.getAll());
+        if (!ops.length) return;
+
+        // Пачка — операции одного сотрудника, по порядку
+        const employeeId = ops[0].employee_id;
+        const batch = ops
+            .filter(op => op.employee_id === employeeId)
+            .slice(0, SYNC_BATCH);
+
+        let res;
+
+        try {
+            res = await fetch(`${API}/sync`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({
+                    employee_id: employeeId,
+                    operations: batch.map(({ seq, employee_id, services, ...op }) => op)
+                })
+            });
+        } catch (e) {
+            // Нет сети — очередь ждёт
+            scheduleSync(SYNC_RETRY_MS);
+            return;
+        }
+
+        if (res.status >= 500) {
+            scheduleSync(SYNC_RETRY_MS);
+            return;
+        }
+
+        if (!res.ok) {
+            // 4xx не пройдёт и при повторе — не держим из-за пачки всю очередь
+            console.error("sync rejected", res.status, batch);
+            await removeOperations(batch);
+            onQueueSynced(batch.map(op => ({ op_id: op.op_id, error: "Ошибка синхронизации" })));
+            continue;
+        }
+
+        const data = await res.json();
+
+        await removeOperations(batch);
+        onQueueSynced(data.results);
+    }
+}
+
+window.addEventListener("online", () => syncQueue());
@@ -1,28 +1,124 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
-from database import SessionLocal, engine
-from models import Base, Employee, Order, Service, Shift
+from contextlib import asynccontextmanager
+from database import (
+    SessionLocal,
+    get_engine,
+    on_engine,
+    pool_stats,
+    async_pool_stats,
+    profile_name,
+    DATA_LAYER,
+    dispose_async_engine
+)
+from models import Employee, Order, Service, Shift
 from schemas import (
     PinAuth,
     OrderStart,
+    OrderBatch,
     OrderComplete,
     OrderNotProvided,
+    SyncBatch,
     ServiceCreate,
     EmployeeCreate
 )
-from services.auth import login_by_pin
-from services.orders import start_order, complete_order, not_provided
-from telegram_utils import send_telegram
-from dotenv import load_dotenv
+from services.auth import authenticate, ensure_shift, login_by_pin, pin_key, invalidate_pin_cache
+from services.orders import (
+    start_order,
+    start_orders,
+    complete_order,
+    not_provided,
+    in_progress_stmt,
+    format_in_progress
+)
+from services.reports import (
+    employee_report,
+    today_report,
+    detailed_report_message,
+    today_payload,
+    period_payload
+)
+from services.timeseries import parse_params, timeseries
+from services.rollup import employee_day_stmt
+from services.clock import local_today, employee_today
+from services.catalog import get_catalog, invalidate_catalog
+from services.archive import reset_branch_days
+from services.history import order_history, DEFAULT_LIMIT
+from services.export import export_stmts, iter_csv, iter_xlsx, xlsx_available
+from services.events import bus, sse_stream
+from services.shifts import close_shift, render_shift_message
+from services.sync import apply_operations
+from telegram_utils import enqueue_telegram, start_outbox_worker
+from metrics import MetricsMiddleware, instrument_engine, instrument_pool, render as render_metrics
+import querywatch
+from applog import setup_logging, stop_logging, RequestIdMiddleware
+from static_files import PrecompressedStaticFiles
+from querywatch import query_budget
+from services.startup import WARMUP, warm_up, ping
+from services.shards import (
+    get_router,
+    employee_branch,
+    employee_session,
+    get_employee_db,
+    invalidate_branches,
+    sync_reference
+)
+from fastapi.responses import JSONResponse
+import asyncio
+import logging
 import os
 
-load_dotenv()
+log = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Импорт main ничего не открывает — логи, engine, прогрев и воркер только здесь
+    # JSON-логи через очередь (см. applog.py)
+    setup_logging()
+
+    engine = get_engine()
+    router = get_router()
+
+    if router.sharded and DATA_LAYER != "sync":
+        raise RuntimeError("BRANCH_SHARDS is supported only with DATA_LAYER=sync")
+
+    if DATA_LAYER != "sync":
+        from database import get_async_engine
+        async_engine = get_async_engine()
+        instrument_engine(async_engine.sync_engine)
+        instrument_pool("async", async_pool_stats, async_engine.pool)
+        if querywatch.ENABLED:
+            querywatch.instrument_engine(async_engine.sync_engine)
 
-app = FastAPI()
+    # Прогрев в фоне: недоступная БД не мешает старту, /ready ждёт его
+    app.state.warmed_up = not WARMUP
+    warmup = None
+
+    if WARMUP:
+        async def _warm():
+            await run_in_threadpool(warm_up, engine)
+            app.state.warmed_up = True
+
+        warmup = asyncio.create_task(_warm())
+
+    # Фоновая отправка Telegram из outbox — у каждого шарда свой outbox
+    workers = [start_outbox_worker(router.engine(shard)) for shard in router.shards()]
+    yield
+    if warmup:
+        warmup.cancel()
+    for worker in workers:
+        if worker:
+            worker.stop()
+    await dispose_async_engine()
+    stop_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # ================= CORS =================
 
@@ -34,9 +130,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ================= DB INIT =================
+# ================= METRICS =================
+
+# Латентность и SQL по маршрутам, in-flight, пул, Telegram — см. /metrics
+@on_engine
+def _instrument(engine):
+    instrument_engine(engine)
+    instrument_pool("sync", pool_stats, engine.pool)
+    if querywatch.ENABLED:
+        querywatch.instrument_engine(engine)
+
+
+app.add_middleware(MetricsMiddleware)
+
+# ================= QUERY WATCH =================
 
-Base.metadata.create_all(bind=engine)
+# Dev/тесты: N+1 и бюджеты запросов по маршрутам (QUERY_WATCH=1)
+if querywatch.ENABLED:
+    querywatch.install(app)
+
+# ================= REQUEST ID =================
+
+# Последним — самым внешним: request_id виден и метрикам, и query watch
+app.add_middleware(RequestIdMiddleware)
+
+# ================= DATA LAYER =================
+
+# Async-роуты регистрируются раньше sync и при DATA_LAYER=async перекрывают их
+if DATA_LAYER in ("async", "both"):
+    from api_async import router as async_router
+
+    app.include_router(
+        async_router,
+        prefix="/async" if DATA_LAYER == "both" else ""
+    )
+
+# ================= DB =================
+
+# Схема создаётся миграциями при деплое: python migrations.py
 
 
 def get_db():
@@ -47,20 +178,24 @@ def get_db():
         db.close()
 
 
-# ================= TIME (UTC+5) =================
+# ================= BRANCHES =================
+
+# Справочник (employees, services) — в основной базе, заказы и смены —
+# в базе филиала (services/shards.py). Без BRANCH_SHARDS всё в одной базе
 
-def get_local_day_range():
-    offset = 5
-    local_now = datetime.utcnow() + timedelta(hours=offset)
-    today_local = local_now.date()
+def _reference_changed():
+    invalidate_branches()
+    sync_reference()
 
-    start_local = datetime.combine(today_local, datetime.min.time())
-    end_local = datetime.combine(today_local, datetime.max.time())
 
-    start_utc = start_local - timedelta(hours=offset)
-    end_utc = end_local - timedelta(hours=offset)
+def _branch_session_factory(branch_id):
+    # История/выгрузка читают одну базу: при шардах нужен филиал
+    router = get_router()
 
-    return start_utc, end_utc
+    if router.sharded and branch_id is None:
+        raise HTTPException(status_code=400, detail="branch_id is required")
+
+    return router.session_factory(router.shard_for(branch_id))
 
 
 # ================= ADMIN CHECK =================
@@ -84,11 +219,34 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready():
+    # Liveness — "/", readiness — прогрев закончен и БД отвечает
+    if not getattr(app.state, "warmed_up", False):
+        return JSONResponse({"status": "starting"}, status_code=503)
+
+    if not await run_in_threadpool(ping, get_engine()):
+        return JSONResponse({"status": "db unavailable"}, status_code=503)
+
+    return {"status": "ready"}
+
+
 # ================= AUTH =================
 
 @app.post("/auth/pin")
+@query_budget(4)
 def auth(data: PinAuth, db: Session = Depends(get_db)):
-    return login_by_pin(db, data.pin)
+
+    if not get_router().sharded:
+        return login_by_pin(db, data.pin)
+
+    # PIN — по справочнику, смена — в базе филиала
+    employee = authenticate(db, data.pin)
+
+    with employee_session(employee["employee_id"]) as shift_db:
+        ensure_shift(shift_db, employee["employee_id"], employee["branch_id"])
+
+    return dict(employee)
 
 
 # ================= EMPLOYEES =================
@@ -99,11 +257,14 @@ def create_employee(data: EmployeeCreate, db: Session = Depends(get_db)):
         name=data.name,
         branch_id=data.branch_id,
         pin=data.pin,
+        pin_hash=pin_key(data.pin),
         role=data.role
     )
     db.add(emp)
     db.commit()
     db.refresh(emp)
+    invalidate_pin_cache()
+    _reference_changed()
     return {"id": emp.id}
 
 
@@ -120,8 +281,6 @@ def get_employees(db: Session = Depends(get_db)):
         for e in employees
     ]
 
-from fastapi import HTTPException
-
 @app.delete("/employees/{employee_id}")
 def delete_employee(employee_id: int, db: Session = Depends(get_db)):
     emp = db.query(Employee).filter(Employee.id == employee_id).first()
@@ -131,31 +290,19 @@ def delete_employee(employee_id: int, db: Session = Depends(get_db)):
 
     db.delete(emp)
     db.commit()
+    invalidate_pin_cache()
+    _reference_changed()
 
     return {"status": "deleted"}
 
 
 @app.get("/employee/today-stats")
-def employee_today_stats(employee_id: int, db: Session = Depends(get_db)):
-
-    start_utc, end_utc = get_local_day_range()
-
-    orders = db.query(Order).filter(
-        Order.employee_id == employee_id,
-        Order.status == "COMPLETED",
-        Order.payment_status == "PAID",
-        Order.completed_at >= start_utc,
-        Order.completed_at <= end_utc
-    ).all()
+@query_budget(1)
+def employee_today_stats(employee_id: int, db: Session = Depends(get_employee_db)):
 
-    services_count = 0
-    total = 0
-
-    for o in orders:
-        for os in o.services:
-            if os.service:
-                services_count += 1
-                total += os.service.price
+    services_count, total = db.execute(
+        employee_day_stmt(employee_id, employee_today(employee_id))
+    ).one()
 
     return {
         "services_count": services_count,
@@ -163,28 +310,25 @@ def employee_today_stats(employee_id: int, db: Session = Depends(get_db)):
     }
 
 @app.get("/employee/history")
-def employee_history(employee_id: int, db: Session = Depends(get_db)):
-
-    start_utc, end_utc = get_local_day_range()
-
-    orders = db.query(Order).filter(
-        Order.employee_id == employee_id,
-        Order.status == "COMPLETED",
-        Order.completed_at >= start_utc,
-        Order.completed_at <= end_utc
-    ).order_by(Order.completed_at.desc()).limit(20).all()
-
-    result = []
-
-    for o in orders:
-        for os in o.services:
-            if os.service:
-                result.append({
-                    "client": o.client_name,
-                    "service": os.service.name
-                })
+@query_budget(2)
+def employee_history(employee_id: int, db: Session = Depends(get_employee_db)):
+
+    # Последние 20 заказов за сегодня: первая страница общей истории
+    today = employee_today(employee_id)
+    page = order_history(
+        db,
+        limit=20,
+        employee_id=employee_id,
+        status="COMPLETED",
+        start_date=today,
+        end_date=today
+    )
 
-    return result
+    return [
+        {"client": o["client_name"], "service": name}
+        for o in page["orders"]
+        for name in o["services"]
+    ]
 
 # ================= SERVICES =================
 
@@ -194,42 +338,28 @@ def create_service(data: ServiceCreate, db: Session = Depends(get_db)):
     db.add(s)
     db.commit()
     db.refresh(s)
+    invalidate_catalog()
+    sync_reference()
     return {"id": s.id}
 
 @app.get("/services")
-def get_services(db: Session = Depends(get_db)):
+@query_budget(1)
+def get_services(request: Request, db: Session = Depends(get_db)):
 
-    services = db.query(Service).all()
+    # Готовый JSON из кэша каталога; клиент с тем же ETag получает 304
+    catalog = get_catalog(db)
+    headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
 
-    pinned_names = [
-        "Открытие ЭЦП (физическое лицо)",
-        "Открытие ЭЦП (юридическое лицо)",
-        "Открытие ЭЦП Онлайн(физическое лицо)",
-        "Открытие ЭЦП Онлайн(юридическое лицо)",
-        "БМГ",
-        "Прописка",
-        "Egov moblie"
-
-    ]
+    if_none_match = request.headers.get("if-none-match", "")
 
-    pinned = []
-    others = []
+    if catalog.etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
 
-    for s in services:
-        if s.name in pinned_names:
-            pinned.append(s)
-        else:
-            others.append(s)
-
-    # Сортируем остальные по убыванию id
-    others.sort(key=lambda x: x.id, reverse=True)
-
-    final_list = pinned + others
-
-    return [
-        {"id": s.id, "name": s.name, "price": s.price}
-        for s in final_list
-    ]
+    return Response(
+        content=catalog.body,
+        media_type="application/json",
+        headers=headers
+    )
 
 @app.delete("/services/{service_id}")
 def delete_service(service_id: int, db: Session = Depends(get_db)):
@@ -241,404 +371,281 @@ def delete_service(service_id: int, db: Session = Depends(get_db)):
 
     db.delete(service)
     db.commit()
+    invalidate_catalog()
+    sync_reference()
 
     return {"status": "service deleted"}
 
 # ================= ORDERS =================
 
 @app.post("/orders/start")
-def create_order(data: OrderStart, db: Session = Depends(get_db)):
-    return start_order(db, data)
+@query_budget(5)
+def create_order(data: OrderStart):
+    with employee_session(data.employee_id) as db:
+        return start_order(db, data)
 
 
-@app.post("/orders/{order_id}/complete")
-def finish_order(order_id: int, data: OrderComplete, db: Session = Depends(get_db)):
-    return complete_order(db, order_id, data.payment_type)
+@app.post("/orders/batch")
+def create_orders_batch(data: OrderBatch):
+    # Результаты в том же порядке: {"order_id"} или {"error"} на каждый заказ.
+    # При шардах — одна пачка на базу филиала
+    router = get_router()
 
+    if not router.sharded:
+        with employee_session() as db:
+            return start_orders(db, data.orders)
 
-@app.post("/orders/{order_id}/not-provided")
-def fail_order(order_id: int, data: OrderNotProvided, db: Session = Depends(get_db)):
-    return not_provided(db, order_id, data.reason)
-@app.get("/orders/in-progress")
-def get_in_progress(employee_id: int, db: Session = Depends(get_db)):
+    groups = {}
+    for i, item in enumerate(data.orders):
+        shard = router.shard_for(employee_branch(item.employee_id))
+        groups.setdefault(shard, []).append(i)
 
-    now = datetime.utcnow()
+    results = [None] * len(data.orders)
 
-    orders = db.query(Order).filter(
-        Order.status == "IN_PROGRESS",
-        Order.employee_id == employee_id
-    ).all()
+    for shard, indexes in groups.items():
+        db = router.session_factory(shard)()
+        try:
+            for i, result in zip(indexes, start_orders(db, [data.orders[i] for i in indexes])):
+                results[i] = result
+        finally:
+            db.close()
 
-    result = []
+    return results
 
-    for o in orders:
 
-        minutes = 0
-        if o.created_at:
-            minutes = int((now - o.created_at).total_seconds() / 60)
+def _order_session(employee_id):
+    # id заказа уникален только внутри базы филиала
+    if get_router().sharded and employee_id is None:
+        raise HTTPException(status_code=400, detail="employee_id is required")
+    return employee_session(employee_id)
 
-        services_names = []
 
-        for os in o.services:
-            if os.service:
-                services_names.append(os.service.name)
+@app.post("/orders/{order_id}/complete")
+@query_budget(4)
+def finish_order(order_id: int, data: OrderComplete, employee_id: int = None):
+    with _order_session(employee_id) as db:
+        return complete_order(db, order_id, data.payment_type)
 
-        result.append({
-            "order_id": o.id,
-            "services": services_names,
-            "client_name": o.client_name,
-            "minutes_in_progress": minutes
-        })
 
-    return result
-# ================= SHIFT CLOSE =================
-@app.post("/shifts/end")
-def end_shift(employee_id: int, db: Session = Depends(get_db)):
+@app.post("/orders/{order_id}/not-provided")
+@query_budget(4)
+def fail_order(order_id: int, data: OrderNotProvided, employee_id: int = None):
+    with _order_session(employee_id) as db:
+        return not_provided(db, order_id, data.reason)
+@app.post("/sync")
+def sync_operations(data: SyncBatch):
+    # Офлайн-очередь киоска: результаты по op_id в том же порядке
+    with employee_session(data.employee_id) as db:
+        return {"results": apply_operations(db, data.employee_id, data.operations)}
 
-    shift = db.query(Shift).filter(
-        Shift.employee_id == employee_id,
-        Shift.is_active == True
-    ).first()
 
-    if not shift:
-        return {"error": "No active shift"}
+@app.get("/orders/in-progress")
+@query_budget(1)
+def get_in_progress(employee_id: int, db: Session = Depends(get_employee_db)):
 
-    shift.is_active = False
-    shift.ended_at = datetime.utcnow()
-    db.commit()
+    rows = db.execute(in_progress_stmt(employee_id)).all()
 
-    orders = db.query(Order).filter(
-        Order.employee_id == employee_id,
-        Order.status == "COMPLETED",
-        Order.payment_status == "PAID",
-        Order.completed_at >= shift.started_at,
-        Order.completed_at <= shift.ended_at
-    ).all()
+    return format_in_progress(rows, datetime.utcnow())
+# ================= EVENTS (SSE) =================
 
-    total = 0
-    cash = 0
-    qr = 0
-    transfer = 0
-    services_count = 0
+def _employee_role(employee_id: int):
+    db = SessionLocal()
+    try:
+        emp = db.query(Employee.role).filter(Employee.id == employee_id).first()
+        return emp.role if emp else None
+    finally:
+        db.close()
 
-    message = "📊 Смена закрыта\n\n"
-    message += f"👤 Сотрудник: {shift.employee.name}\n\n"
-    message += "━━━━━━━━━━━━━━\n\n"
 
-    for i, o in enumerate(orders, 1):
+@app.get("/events")
+async def events(request: Request, employee_id: int):
 
-        if not o.services:
-            continue
+    role = await run_in_threadpool(_employee_role, employee_id)
 
-        order_total = 0
+    if role is None:
+        raise HTTPException(status_code=404, detail="Employee not found")
 
-        for os in o.services:
-            if not os.service:
-                continue
+    # Сотрудник получает свои события, админ — все
+    sub = bus.subscribe(employee_id=employee_id, admin=role == "ADMIN")
 
-            price = os.service.price
-            order_total += price
-            services_count += 1
+    return StreamingResponse(
+        sse_stream(request, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        total += order_total
 
-        if o.payment_type == "CASH":
-            cash += order_total
-        elif o.payment_type == "QR":
-            qr += order_total
-        elif o.payment_type == "TRANSFER":
-            transfer += order_total
+# ================= SHIFT CLOSE =================
+@app.post("/shifts/end")
+@query_budget(4)
+def end_shift(employee_id: int, db: Session = Depends(get_employee_db)):
 
-        services_names = ", ".join(
-            os.service.name for os in o.services if os.service
-        )
+    summary = close_shift(db, employee_id)
 
-        message += (
-            f"{i}. {services_names}\n"
-            f"Клиент: {o.client_name}\n"
-            f"Оплата: {o.payment_type}\n\n"
-        )
+    if not summary:
+        return {"error": "No active shift"}
+
+    # Закрытие смены и сообщение — одна транзакция, отправит воркер
+    enqueue_telegram(db, render_shift_message(summary))
+    db.commit()
+
+    bus.publish("shift_ended", employee_id=employee_id)
 
-    message += "━━━━━━━━━━━━━━\n"
-    message += f"Услуг: {services_count}\n"
-    message += f"💰 Сумма: {total} ₸\n"
-    message += f"Нал: {cash} ₸\n"
-    message += f"QR: {qr} ₸\n"
-    message += f"Перевод: {transfer} ₸"
+    return {"status": "ended", "summary": summary}
 
-    send_telegram(message)
 
-    return {"status": "ended"}
 # ================= ADMIN REPORT =================
+
 @app.get("/admin/report/today")
-def admin_report_today(employee_id: int, db: Session = Depends(get_db)):
+@query_budget(3)
+def admin_report_today(employee_id: int, branch_id: int = None, db: Session = Depends(get_db)):
 
     get_current_admin(employee_id, db)
 
-    start_utc, end_utc = get_local_day_range()
-    employees = db.query(Employee).filter(Employee.is_active == True).all()
-
-    result = []
-    total_all = 0
-    cash_all = 0
-    qr_all = 0
-    transfer_all = 0
-
-    for emp in employees:
-
-        orders = db.query(Order).filter(
-            Order.employee_id == emp.id,
-            Order.status == "COMPLETED",
-            Order.payment_status == "PAID",
-            Order.completed_at >= start_utc,
-            Order.completed_at <= end_utc
-        ).all()
-
-        total = 0
-        cash = 0
-        qr = 0
-        transfer = 0
-        services_count = 0
-
-        for o in orders:
-            if not o.services:
-                continue
-
-            order_total = sum(
-                os.service.price
-                for os in o.services
-                if os.service
-            )
-
-            services_count += len(o.services)
-            total += order_total
-
-            if o.payment_type == "CASH":
-                cash += order_total
-            elif o.payment_type == "QR":
-                qr += order_total
-            elif o.payment_type == "TRANSFER":
-                transfer += order_total
-
-        total_all += total
-        cash_all += cash
-        qr_all += qr
-        transfer_all += transfer
-
-        result.append({
-            "employee_id": emp.id,
-            "employee": emp.name,
-            "services_count": services_count,
-            "total": total,
-            "cash": cash,
-            "qr": qr,
-            "transfer": transfer
-        })
+    today = local_today(branch_id)
+    rows, summary = today_report(db, branch_id)
 
-    return {
-        "date": str((datetime.utcnow() + timedelta(hours=5)).date()),
-        "employees": result,
-        "total_all": total_all,
-        "cash_all": cash_all,
-        "qr_all": qr_all,
-        "transfer_all": transfer_all
-    }
+    return today_payload(today, rows, summary)
 
-from datetime import datetime
 
 @app.get("/admin/report/period")
+@query_budget(3)
 def admin_report_period(
     employee_id: int,
     start_date: str,
     end_date: str,
+    branch_id: int = None,
     db: Session = Depends(get_db)
 ):
 
     get_current_admin(employee_id, db)
 
-    from datetime import timedelta
+    start = datetime.fromisoformat(start_date).date()
+    end = datetime.fromisoformat(end_date).date()
 
-    start = datetime.fromisoformat(start_date)
-    end = datetime.fromisoformat(end_date)
+    rows, summary = employee_report(db, start, end, branch_id)
 
-    start_utc = start - timedelta(hours=5)
-    end_utc = end + timedelta(days=1) - timedelta(seconds=1) - timedelta(hours=5)
-    employees = db.query(Employee).filter(Employee.is_active == True).all()
+    return period_payload(start_date, end_date, rows, summary)
 
-    result = []
-    total_all = 0
-    cash_all = 0
-    qr_all = 0
-    transfer_all = 0
-
-    for emp in employees:
-
-        orders = db.query(Order).filter(
-            Order.employee_id == emp.id,
-            Order.status == "COMPLETED",
-            Order.payment_status == "PAID",
-            Order.completed_at >= start_utc,
-            Order.completed_at <= end_utc
-        ).all()
-
-        total = 0
-        cash = 0
-        qr = 0
-        transfer = 0
-        services_count = 0
-
-        for o in orders:
-
-            if not o.services:
-                continue
-
-            order_total = sum(
-                os.service.price
-                for os in o.services
-                if os.service
-            )
-
-            services_count += len(o.services)
-            total += order_total
-
-            if o.payment_type == "CASH":
-                cash += order_total
-            elif o.payment_type == "QR":
-                qr += order_total
-            elif o.payment_type == "TRANSFER":
-                transfer += order_total
-
-        total_all += total
-        cash_all += cash
-        qr_all += qr
-        transfer_all += transfer
-
-        result.append({
-            "employee": emp.name,
-            "services": services_count,
-            "total": total,
-            "cash": cash,
-            "qr": qr,
-            "transfer": transfer
-        })
 
-    return {
-        "start": start_date,
-        "end": end_date,
-        "employees": result,
-        "total_all": total_all,
-        "cash_all": cash_all,
-        "qr_all": qr_all,
-        "transfer_all": transfer_all
-    }
-@app.post("/admin/report/today/send")
-def send_admin_report(employee_id: int, db: Session = Depends(get_db)):
+@app.get("/admin/report/timeseries")
+@query_budget(3)
+def admin_report_timeseries(
+    employee_id: int,
+    start_date: str,
+    end_date: str,
+    bucket: str = "day",
+    group_by: str = None,
+    branch_id: int = None,
+    db: Session = Depends(get_db)
+):
 
     get_current_admin(employee_id, db)
 
-    start_utc, end_utc = get_local_day_range()
-    employees = db.query(Employee).filter(Employee.is_active == True).all()
-
-    message = "📊 Подробный отчёт за сегодня\n\n"
-
-    total_all = 0
-    cash_all = 0
-    qr_all = 0
-    transfer_all = 0
-
-    for emp in employees:
+    try:
+        start, end = parse_params(start_date, end_date, bucket, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        orders = db.query(Order).filter(
-            Order.employee_id == emp.id,
-            Order.status == "COMPLETED",
-            Order.payment_status == "PAID",
-            Order.completed_at >= start_utc,
-            Order.completed_at <= end_utc
-        ).all()
+    return timeseries(db, start, end, bucket, group_by, branch_id)
 
-        if not orders:
-            continue
 
-        message += f"👤 {emp.name}\n\n"
+@app.get("/admin/orders/history")
+@query_budget(3)
+def admin_order_history(
+    employee_id: int,
+    target_employee_id: int = None,
+    branch_id: int = None,
+    status: str = None,
+    payment_type: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    cursor: str = None,
+    limit: int = DEFAULT_LIMIT,
+    db: Session = Depends(get_db)
+):
 
-        emp_total = 0
-        emp_cash = 0
-        emp_qr = 0
-        emp_transfer = 0
-        emp_services_count = 0
+    get_current_admin(employee_id, db)
 
-        for o in orders:
+    branch_db = _branch_session_factory(branch_id)()
 
-            if not o.services:
-                continue
+    try:
+        return order_history(
+            branch_db,
+            limit=limit,
+            employee_id=target_employee_id,
+            branch_id=branch_id,
+            status=status,
+            payment_type=payment_type,
+            start_date=datetime.fromisoformat(start_date).date() if start_date else None,
+            end_date=datetime.fromisoformat(end_date).date() if end_date else None,
+            cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid filters or cursor")
+    finally:
+        branch_db.close()
 
-            start_time = o.created_at + timedelta(hours=5)
-            end_time = o.completed_at + timedelta(hours=5)
-            duration = int((o.completed_at - o.created_at).total_seconds() / 60)
 
-            for os in o.services:
-                if not os.service:
-                    continue
+# ================= EXPORT =================
 
-                price = os.service.price
-                name = os.service.name
+@app.get("/admin/export/orders")
+def export_orders(
+    employee_id: int,
+    start_date: str,
+    end_date: str,
+    format: str = "csv",
+    target_employee_id: int = None,
+    branch_id: int = None,
+    db: Session = Depends(get_db)
+):
 
-                emp_total += price
-                total_all += price
-                emp_services_count += 1
+    get_current_admin(employee_id, db)
 
-                if o.payment_type == "CASH":
-                    emp_cash += price
-                    cash_all += price
+    try:
+        start = datetime.fromisoformat(start_date).date()
+        end = datetime.fromisoformat(end_date).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid dates")
+
+    stmts = export_stmts(start, end, target_employee_id, branch_id)
+    session_factory = _branch_session_factory(branch_id)
+    filename = f"orders_{start}_{end}"
+
+    if format == "xlsx":
+        if not xlsx_available():
+            raise HTTPException(status_code=501, detail="XLSX export requires openpyxl")
+
+        return StreamingResponse(
+            iter_xlsx(stmts, session_factory),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.xlsx"'}
+        )
 
-                elif o.payment_type == "QR":
-                    emp_qr += price
-                    qr_all += price
+    if format != "csv":
+        raise HTTPException(status_code=400, detail="Unknown format")
 
-                elif o.payment_type == "TRANSFER":
-                    emp_transfer += price
-                    transfer_all += price
+    # Строки читаются из БД по мере отправки — память не зависит от периода
+    return StreamingResponse(
+        iter_csv(stmts, session_factory),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'}
+    )
 
-                message += (
-                    f"• {name}\n"
-                    f"Клиент: {o.client_name}\n"
-                    f"{start_time.strftime('%H:%M')} → {end_time.strftime('%H:%M')} ({duration} мин)\n"
-                    f"Оплата: {o.payment_type}\n\n"
-                )
 
-        message += (
-            f"Итого по {emp.name}:\n"
-            f"Услуг: {emp_services_count}\n"
-            f"Сумма: {emp_total} ₸\n"
-            f"Нал: {emp_cash} ₸\n"
-            f"QR: {emp_qr} ₸\n"
-            f"Перевод: {emp_transfer} ₸\n"
-        )
+@app.post("/admin/report/today/send")
+@query_budget(3)
+def send_admin_report(employee_id: int, branch_id: int = None, db: Session = Depends(get_db)):
 
-        message += "\n━━━━━━━━━━━━━━\n\n"
+    get_current_admin(employee_id, db)
 
-    message += (
-        f"💰 Общий итог:\n"
-        f"Сумма: {total_all} ₸\n"
-        f"Нал: {cash_all} ₸\n"
-        f"QR: {qr_all} ₸\n"
-        f"Перевод: {transfer_all} ₸"
-    )
+    message = detailed_report_message(db, branch_id)
 
-    send_telegram(message)
+    enqueue_telegram(db, message)
+    db.commit()
 
     return {"status": "sent"}
 
-from models import Service
-from database import SessionLocal
-from fastapi import Depends
-from sqlalchemy.orm import Session
-
-from models import Service
-from database import SessionLocal
-from fastapi import Depends
-from sqlalchemy.orm import Session
-
 
 @app.post("/admin/seed-services")
 def seed_services(db: Session = Depends(get_db)):
@@ -701,6 +708,8 @@ def seed_services(db: Session = Depends(get_db)):
         db.add(Service(**service))
 
     db.commit()
+    invalidate_catalog()
+    sync_reference()
 
     return {"status": "services added"}
 
@@ -710,19 +719,14 @@ def reset_today(employee_id: int, db: Session = Depends(get_db)):
 
     get_current_admin(employee_id, db)
 
-    start_utc, end_utc = get_local_day_range()
+    # Сброс дня — в базе каждого филиала
+    def reset(shard_db):
+        reset_branch_days(shard_db)
+        shard_db.commit()
 
-    orders = db.query(Order).filter(
-        Order.status == "COMPLETED",
-        Order.payment_status == "PAID",
-        Order.completed_at >= start_utc,
-        Order.completed_at <= end_utc
-    ).all()
+    get_router().fan_out(reset)
 
-    for o in orders:
-        o.status = "ARCHIVED"
-
-    db.commit()
+    bus.publish("report_reset")
 
     return {"status": "today reset"}
 
@@ -737,24 +741,56 @@ def deactivate_employee(id: int, db: Session = Depends(get_db)):
 
     employee.is_active = False
     db.commit()
+    invalidate_pin_cache()
+    _reference_changed()
 
     return {"status": "deactivated"}
 
-# ================= FRONTEND =================
+# ================= METRICS =================
 
-import os
-from fastapi.staticfiles import StaticFiles
+@app.get("/metrics")
+def metrics():
+    return Response(
+        render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# ================= DB POOL =================
+
+@app.get("/admin/db/pool")
+def db_pool_stats(employee_id: int, db: Session = Depends(get_db)):
+
+    get_current_admin(employee_id, db)
+
+    result = {
+        "profile": profile_name(),
+        "data_layer": DATA_LAYER,
+        **pool_stats.snapshot(get_engine().pool)
+    }
+
+    if DATA_LAYER != "sync":
+        from database import get_async_engine
+        result["async"] = async_pool_stats.snapshot(get_async_engine().pool)
+
+    return result
+
+# ================= FRONTEND =================
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_DIR = os.path.join(BASE_DIR, "frontend")
+FRONTEND_DIST = os.getenv("FRONTEND_DIST", os.path.join(FRONTEND_DIR, "dist"))
 
-print("BASE_DIR:", BASE_DIR)
-print("FRONTEND_DIR:", FRONTEND_DIR)
+# Собранный фронтенд (python build_frontend.py): хэшированные имена + .br/.gz.
+# Без сборки — исходники как есть, с revalidate по ETag
+STATIC_DIR = FRONTEND_DIST if os.path.isdir(FRONTEND_DIST) else FRONTEND_DIR
 
-app.mount("/", StaticFiles(directory=FRONTEND_DIR, html=True), name="frontend")
+log.debug("frontend_dir", extra={"path": STATIC_DIR})
 
-import uvicorn
+app.mount("/", PrecompressedStaticFiles(directory=STATIC_DIR, html=True), name="frontend")
 
 if __name__ == "__main__":
+    import uvicorn
+
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,277 @@
+import bisect
+import contextvars
+import threading
+import time
+from sqlalchemy import event
+
+
+# ================= REGISTRY =================
+
+# Метрики в памяти процесса, отдаются в текстовом формате Prometheus
+# на /metrics. Без внешних зависимостей: счётчик/гистограмма — словарь
+# под одним lock, запись — O(log buckets).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_lock = threading.Lock()
+_metrics = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_, labels=()):
+        self.name = name
+        self.help = help_
+        self.label_names = labels
+        self.values = {}
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name, help_, labels=(), collect=None):
+        super().__init__(name, help_, labels)
+        self.collect = collect
+
+    def set(self, value, *labels):
+        with _lock:
+            self.values[labels] = value
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def samples(self):
+        if self.collect:
+            # Значение на момент запроса /metrics (например, пул соединений)
+            for labels, value in self.collect():
+                yield self.name, _labels(self.label_names, labels), value
+            return
+        yield from super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_
+        self.label_names = labels
+        self.buckets = buckets
+        self.values = {}
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+
+        with _lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [[0] * len(self.buckets), 0, 0.0]
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def samples(self):
+        names = self.label_names + ("le",)
+
+        for labels, (counts, count, total) in self.values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield self.name + "_bucket", _labels(names, labels + (bound,)), cumulative
+            yield self.name + "_bucket", _labels(names, labels + ("+Inf",)), count
+            yield self.name + "_count", _labels(self.label_names, labels), count
+            yield self.name + "_sum", _labels(self.label_names, labels), total
+
+
+def render():
+    lines = []
+
+    with _lock:
+        for metric in _metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in list(metric.samples()):
+                lines.append(f"{name}{labels} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ================= METRICS =================
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests", ("method", "route", "status")
+)
+http_latency = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests being processed"
+)
+
+db_statements = Counter(
+    "db_statements_total", "SQL statements executed", ("route",)
+)
+db_time = Counter(
+    "db_time_seconds_total", "Time spent in SQL statements", ("route",)
+)
+db_statement_latency = Histogram(
+    "db_statement_duration_seconds", "SQL statement latency", buckets=DB_BUCKETS
+)
+db_statements_per_request = Histogram(
+    "http_request_db_statements", "SQL statements per HTTP request",
+    ("route",), buckets=COUNT_BUCKETS
+)
+
+telegram_sends = Counter(
+    "telegram_send_total", "Telegram sendMessage calls", ("result",)
+)
+telegram_latency = Histogram(
+    "telegram_send_duration_seconds", "Telegram sendMessage latency"
+)
+
+
+# ================= REQUEST CONTEXT =================
+
+# [statements, db seconds] текущего HTTP-запроса; threadpool копирует контекст,
+# поэтому sync-эндпоинты пишут в тот же список
+_request_db = contextvars.ContextVar("request_db", default=None)
+
+
+def _route_label(scope):
+    # Шаблон пути (/orders/{order_id}/complete), а не сам путь —
+    # иначе каждая строка id станет отдельным рядом метрик
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is not None:
+        return path or "/"
+    return "static" if scope.get("endpoint") else "unmatched"
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        http_in_flight.inc()
+        started = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            _request_db.reset(token)
+
+            route = _route_label(scope)
+            method = scope["method"]
+
+            http_requests.inc(method, route, status[0])
+            http_latency.observe(elapsed, method, route)
+            db_statements_per_request.observe(db[0], route)
+
+            if db[0]:
+                db_statements.inc(route, amount=db[0])
+                db_time.inc(route, amount=db[1])
+
+
+# ================= ENGINE EVENTS =================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    elapsed = time.perf_counter() - started
+
+    db_statement_latency.observe(elapsed)
+
+    db = _request_db.get()
+    if db is not None:
+        db[0] += 1
+        db[1] += elapsed
+
+
+def _handle_error(context):
+    # Упавший запрос не доходит до after_cursor_execute
+    started = context.connection.info.get("metrics_started") if context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(sync_engine):
+    # Для AsyncEngine передавать .sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+_pools = {}
+
+POOL_STATS = ("checked_out", "overflow", "checkouts", "timeouts", "wait_total_ms")
+
+
+def instrument_pool(name, stats, pool):
+    # database.PoolStats + состояние пула на момент сбора
+    _pools[name] = (stats, pool)
+
+
+def _collect_pools():
+    for name, (stats, pool) in list(_pools.items()):
+        snapshot = stats.snapshot(pool)
+        for key in POOL_STATS:
+            if key in snapshot:
+                yield (name, key), snapshot[key]
+
+
+db_pool = Gauge(
+    "db_pool", "Connection pool state", ("pool", "stat"), collect=_collect_pools
+)
+
+
+# ================= TELEGRAM =================
+
+def observe_telegram(seconds, ok):
+    telegram_latency.observe(seconds)
+    telegram_sends.inc("ok" if ok else "error")
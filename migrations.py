@@ -0,0 +1,575 @@
+import hashlib
+import sys
+from datetime import datetime
+from sqlalchemy import (
+    Column, Integer, String, Text, Boolean, Date, DateTime, ForeignKey, Index,
+    MetaData, Table, inspect, select, func, bindparam
+)
+from database import engine
+
+
+# ================= VERSION TABLE =================
+
+_meta = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+
+# ================= HELPERS =================
+
+# Миграции не импортируют models.py: каждая описывает таблицы такими, какими
+# они были на её шаге, — иначе старая миграция на чистой базе создала бы
+# сегодняшнюю схему, а следующие за ней шаги разошлись бы с ней
+
+def _table(name, *columns):
+    # Таблица для одной миграции: только нужные ей колонки
+    return Table(name, MetaData(), *columns)
+
+
+def _has_column(conn, table, column):
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def _add_column(conn, table, column):
+    # Работает и на SQLite, и на Postgres: новые колонки только nullable/с default
+    if _has_column(conn, table.name, column.name):
+        return
+
+    ddl_type = column.type.compile(dialect=conn.dialect)
+    conn.exec_driver_sql(
+        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}"
+    )
+
+
+def _create_indexes(conn, *indexes):
+    for index in indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _backfill_business_date(conn, table, rows_stmt, batch_size=1000):
+    # rows_stmt: (id, момент UTC, филиал) строк без business_date.
+    # Пояс у филиала свой — дату считаем в Python, пачками
+    from services.clock import business_date
+
+    update = (
+        table.update()
+        .where(table.c.id == bindparam("row_id"))
+        .values(business_date=bindparam("day"))
+    )
+
+    while True:
+        rows = conn.execute(rows_stmt.limit(batch_size)).all()
+        if not rows:
+            break
+
+        conn.execute(update, [
+            {"row_id": row_id, "day": business_date(moment, branch_id)}
+            for row_id, moment, branch_id in rows
+        ])
+
+
+# ================= MIGRATIONS =================
+
+@migration(1, "baseline")
+def _baseline(conn):
+    # Таблицы, которые раньше создавал create_all в main.py
+    meta = MetaData()
+
+    Table(
+        "employees",
+        meta,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("name", String, nullable=False),
+        Column("pin", String, unique=True, nullable=False),
+        Column("role", String, nullable=False),
+        Column("branch_id", Integer, nullable=False),
+        Column("is_active", Boolean),
+    )
+    Table(
+        "services",
+        meta,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("name", String, nullable=False),
+        Column("price", Integer, nullable=False),
+    )
+    Table(
+        "shifts",
+        meta,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("employee_id", Integer, ForeignKey("employees.id"), nullable=False),
+        Column("started_at", DateTime),
+        Column("ended_at", DateTime, nullable=True),
+        Column("is_active", Boolean),
+    )
+    Table(
+        "orders",
+        meta,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("service_id", Integer, ForeignKey("services.id"), nullable=False),
+        Column("employee_id", Integer, ForeignKey("employees.id"), nullable=False),
+        Column("branch_id", Integer, nullable=False),
+        Column("client_name", String, nullable=False),
+        Column("client_phone", String, nullable=False),
+        Column("status", String, nullable=False),
+        Column("payment_type", String, nullable=True),
+        Column("payment_status", String, nullable=False),
+        Column("not_provided_reason", String, nullable=True),
+        Column("created_at", DateTime),
+        Column("completed_at", DateTime, nullable=True),
+    )
+    Table(
+        "order_services",
+        meta,
+        Column("id", Integer, primary_key=True),
+        Column("order_id", Integer, ForeignKey("orders.id"), nullable=False),
+        Column("service_id", Integer, ForeignKey("services.id"), nullable=False),
+    )
+
+    meta.create_all(conn, checkfirst=True)
+
+
+def _pin_key(pin) -> str:
+    # Как services.auth.pin_key на момент миграции: str + strip, sha256
+    return hashlib.sha256(str(pin).strip().encode("utf-8")).hexdigest()
+
+
+@migration(2, "employee pin hash")
+def _employee_pin_hash(conn):
+    table = _table(
+        "employees",
+        Column("id", Integer, primary_key=True),
+        Column("pin", String),
+        Column("pin_hash", String(64), nullable=True),
+    )
+    _add_column(conn, table, table.c.pin_hash)
+
+    rows = conn.execute(
+        select(table.c.id, table.c.pin).where(table.c.pin_hash.is_(None))
+    ).all()
+
+    for employee_id, pin in rows:
+        conn.execute(
+            table.update()
+            .where(table.c.id == employee_id)
+            .values(pin_hash=_pin_key(pin if pin is not None else ""))
+        )
+
+    _create_indexes(conn, Index("ix_employees_pin_hash", table.c.pin_hash, unique=True))
+
+
+@migration(3, "hot path indexes")
+def _hot_path_indexes(conn):
+    orders = _table(
+        "orders",
+        Column("employee_id", Integer),
+        Column("status", String),
+        Column("payment_status", String),
+        Column("completed_at", DateTime),
+    )
+    shifts = _table(
+        "shifts",
+        Column("employee_id", Integer),
+        Column("is_active", Boolean),
+    )
+    lines = _table("order_services", Column("order_id", Integer))
+
+    _create_indexes(
+        conn,
+        Index(
+            "ix_orders_employee_status_completed",
+            orders.c.employee_id, orders.c.status, orders.c.payment_status, orders.c.completed_at,
+        ),
+        Index(
+            "ix_orders_status_completed",
+            orders.c.status, orders.c.payment_status, orders.c.completed_at,
+        ),
+        Index(
+            "ix_orders_in_progress",
+            orders.c.employee_id,
+            sqlite_where=orders.c.status == "IN_PROGRESS",
+            postgresql_where=orders.c.status == "IN_PROGRESS",
+        ),
+        Index(
+            "ix_shifts_active_employee",
+            shifts.c.employee_id,
+            sqlite_where=shifts.c.is_active == True,
+            postgresql_where=shifts.c.is_active == True,
+        ),
+        Index("ix_order_services_order_id", lines.c.order_id),
+    )
+
+
+@migration(4, "order price snapshot")
+def _order_price_snapshot(conn):
+    lines = _table(
+        "order_services",
+        Column("order_id", Integer),
+        Column("service_id", Integer),
+        Column("price", Integer, nullable=True),
+    )
+    orders = _table(
+        "orders",
+        Column("id", Integer, primary_key=True),
+        Column("total", Integer, nullable=True),
+    )
+    services = _table(
+        "services",
+        Column("id", Integer, primary_key=True),
+        Column("price", Integer),
+    )
+
+    _add_column(conn, lines, lines.c.price)
+    _add_column(conn, orders, orders.c.total)
+
+    # Старые строки: берём текущую цену услуги (если услуга ещё существует)
+    conn.execute(
+        lines.update()
+        .where(lines.c.price.is_(None))
+        .values(
+            price=select(services.c.price)
+            .where(services.c.id == lines.c.service_id)
+            .scalar_subquery()
+        )
+    )
+    conn.execute(
+        orders.update()
+        .where(orders.c.total.is_(None))
+        .values(
+            total=select(func.coalesce(func.sum(lines.c.price), 0))
+            .where(lines.c.order_id == orders.c.id)
+            .scalar_subquery()
+        )
+    )
+
+
+@migration(5, "daily employee totals")
+def _daily_employee_totals(conn):
+    from services.clock import business_date
+
+    meta = MetaData()
+    Table("employees", meta, Column("id", Integer, primary_key=True))
+    totals = Table(
+        "daily_employee_totals",
+        meta,
+        Column("business_date", Date, primary_key=True),
+        Column("employee_id", Integer, ForeignKey("employees.id"), primary_key=True),
+        Column("branch_id", Integer, primary_key=True),
+        Column("payment_type", String, primary_key=True),
+        Column("orders_count", Integer, nullable=False),
+        Column("services_count", Integer, nullable=False),
+        Column("amount", Integer, nullable=False),
+    )
+    totals.create(conn, checkfirst=True)
+
+    orders = _table(
+        "orders",
+        Column("id", Integer, primary_key=True),
+        Column("employee_id", Integer),
+        Column("branch_id", Integer),
+        Column("status", String),
+        Column("payment_type", String),
+        Column("payment_status", String),
+        Column("completed_at", DateTime),
+        Column("total", Integer),
+    )
+    lines = _table(
+        "order_services",
+        Column("id", Integer, primary_key=True),
+        Column("order_id", Integer),
+    )
+
+    # Итоги по уже завершённым заказам (архива на этом шаге ещё нет).
+    # Неоказанные — отдельный ключ NOT_PROVIDED с суммой 0
+    rows = conn.execute(
+        select(
+            orders.c.completed_at,
+            orders.c.employee_id,
+            orders.c.branch_id,
+            orders.c.status,
+            orders.c.payment_type,
+            orders.c.total,
+            func.count(lines.c.id),
+        )
+        .outerjoin(lines, lines.c.order_id == orders.c.id)
+        .where(
+            orders.c.completed_at != None,
+            (orders.c.status == "NOT_PROVIDED")
+            | ((orders.c.status == "COMPLETED") & (orders.c.payment_status == "PAID")),
+        )
+        .group_by(orders.c.id)
+    )
+
+    sums = {}
+
+    for completed_at, employee_id, branch_id, status, payment_type, total, count in rows:
+        if status == "NOT_PROVIDED":
+            payment_type, total = "NOT_PROVIDED", 0
+
+        key = (business_date(completed_at, branch_id), employee_id, branch_id, payment_type)
+        t = sums.setdefault(key, [0, 0, 0])
+        t[0] += 1
+        t[1] += count
+        t[2] += total or 0
+
+    conn.execute(totals.delete())
+
+    if sums:
+        conn.execute(totals.insert(), [
+            {
+                "business_date": day,
+                "employee_id": employee_id,
+                "branch_id": branch_id,
+                "payment_type": payment_type,
+                "orders_count": orders_count,
+                "services_count": services_count,
+                "amount": amount,
+            }
+            for (day, employee_id, branch_id, payment_type), (orders_count, services_count, amount)
+            in sums.items()
+        ])
+
+
+@migration(6, "telegram outbox")
+def _telegram_outbox(conn):
+    outbox = _table(
+        "telegram_outbox",
+        Column("id", Integer, primary_key=True),
+        Column("chat_id", String, nullable=False),
+        Column("text", Text, nullable=False),
+        Column("status", String, nullable=False),
+        Column("attempts", Integer, nullable=False),
+        Column("next_attempt_at", DateTime),
+        Column("last_error", String, nullable=True),
+        Column("created_at", DateTime),
+        Column("sent_at", DateTime, nullable=True),
+    )
+    Index(
+        "ix_telegram_outbox_pending",
+        outbox.c.id,
+        sqlite_where=outbox.c.status == "PENDING",
+        postgresql_where=outbox.c.status == "PENDING",
+    )
+
+    outbox.create(conn, checkfirst=True)
+
+
+@migration(7, "order history indexes")
+def _order_history_indexes(conn):
+    orders = _table(
+        "orders",
+        Column("id", Integer, primary_key=True),
+        Column("employee_id", Integer),
+        Column("completed_at", DateTime),
+    )
+
+    _create_indexes(
+        conn,
+        Index(
+            "ix_orders_completed_id",
+            orders.c.completed_at, orders.c.id,
+            sqlite_where=orders.c.completed_at != None,
+            postgresql_where=orders.c.completed_at != None,
+        ),
+        Index(
+            "ix_orders_employee_completed_id",
+            orders.c.employee_id, orders.c.completed_at, orders.c.id,
+            sqlite_where=orders.c.completed_at != None,
+            postgresql_where=orders.c.completed_at != None,
+        ),
+    )
+
+
+@migration(8, "order archive")
+def _order_archive(conn):
+    # Колонки orders на этом шаге + archived_at
+    archive = _table(
+        "orders_archive",
+        Column("id", Integer, primary_key=True),
+        Column("service_id", Integer, nullable=False),
+        Column("employee_id", Integer, nullable=False),
+        Column("branch_id", Integer, nullable=False),
+        Column("client_name", String, nullable=False),
+        Column("client_phone", String, nullable=False),
+        Column("status", String, nullable=False),
+        Column("payment_type", String, nullable=True),
+        Column("payment_status", String, nullable=False),
+        Column("not_provided_reason", String, nullable=True),
+        Column("created_at", DateTime, nullable=True),
+        Column("completed_at", DateTime, nullable=True),
+        Column("total", Integer, nullable=True),
+        Column("archived_at", DateTime),
+    )
+    Index("ix_orders_archive_completed_id", archive.c.completed_at, archive.c.id)
+    Index(
+        "ix_orders_archive_employee_completed_id",
+        archive.c.employee_id, archive.c.completed_at, archive.c.id,
+    )
+
+    lines_archive = _table(
+        "order_services_archive",
+        Column("id", Integer, primary_key=True),
+        Column("order_id", Integer, nullable=False, index=True),
+        Column("service_id", Integer, nullable=False),
+        Column("price", Integer, nullable=True),
+    )
+
+    archive.create(conn, checkfirst=True)
+    lines_archive.create(conn, checkfirst=True)
+
+
+@migration(9, "offline sync")
+def _offline_sync(conn):
+    orders = _table("orders", Column("client_id", String(36), nullable=True))
+    archive = _table("orders_archive", Column("client_id", String(36), nullable=True))
+
+    _add_column(conn, orders, orders.c.client_id)
+    _add_column(conn, archive, archive.c.client_id)
+    _create_indexes(conn, Index("ix_orders_client_id", orders.c.client_id, unique=True))
+
+    _table(
+        "sync_operations",
+        Column("op_id", String(64), primary_key=True),
+        Column("employee_id", Integer, nullable=False),
+        Column("type", String, nullable=False),
+        Column("result", Text, nullable=False),
+        Column("created_at", DateTime, index=True),
+    ).create(conn, checkfirst=True)
+
+
+@migration(10, "business dates")
+def _business_dates(conn):
+
+    def dated(name, *columns):
+        return _table(
+            name,
+            Column("id", Integer, primary_key=True),
+            Column("business_date", Date, nullable=True),
+            *columns
+        )
+
+    orders = dated(
+        "orders",
+        Column("employee_id", Integer),
+        Column("branch_id", Integer),
+        Column("status", String),
+        Column("payment_status", String),
+        Column("completed_at", DateTime),
+    )
+    archive = dated(
+        "orders_archive",
+        Column("branch_id", Integer),
+        Column("completed_at", DateTime),
+    )
+    shifts = dated(
+        "shifts",
+        Column("employee_id", Integer),
+        Column("started_at", DateTime),
+    )
+    employees = _table(
+        "employees",
+        Column("id", Integer, primary_key=True),
+        Column("branch_id", Integer),
+    )
+
+    for table in (orders, archive, shifts):
+        _add_column(conn, table, table.c.business_date)
+
+    for table in (orders, archive):
+        _backfill_business_date(conn, table, (
+            select(table.c.id, table.c.completed_at, table.c.branch_id)
+            .where(table.c.business_date.is_(None), table.c.completed_at != None)
+        ))
+
+    _backfill_business_date(conn, shifts, (
+        select(shifts.c.id, shifts.c.started_at, employees.c.branch_id)
+        .join(employees, employees.c.id == shifts.c.employee_id)
+        .where(shifts.c.business_date.is_(None), shifts.c.started_at != None)
+    ))
+
+    _create_indexes(
+        conn,
+        Index(
+            "ix_orders_employee_status_business_date",
+            orders.c.employee_id, orders.c.status, orders.c.payment_status, orders.c.business_date,
+        ),
+        Index(
+            "ix_orders_status_business_date",
+            orders.c.status, orders.c.payment_status, orders.c.business_date,
+        ),
+        Index("ix_orders_archive_business_date", archive.c.business_date),
+        Index("ix_shifts_employee_business_date", shifts.c.employee_id, shifts.c.business_date),
+    )
+
+
+# ================= RUNNER =================
+
+def applied_versions(conn):
+    _meta.create_all(conn, checkfirst=True)
+    return {row[0] for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def upgrade(bind=None):
+    bind = bind or engine
+
+    with bind.begin() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+
+    for version, name, fn in sorted(MIGRATIONS):
+        if version in done:
+            continue
+
+        # Каждая миграция — отдельная транзакция вместе с записью версии
+        with bind.begin() as conn:
+            fn(conn)
+            conn.execute(
+                schema_migrations.insert().values(
+                    version=version,
+                    name=name,
+                    applied_at=datetime.utcnow()
+                )
+            )
+
+        applied.append((version, name))
+        print(f"applied {version:04d} {name}")
+
+    return applied
+
+
+def status(bind=None):
+    bind = bind or engine
+
+    with bind.begin() as conn:
+        done = applied_versions(conn)
+
+    for version, name, _ in sorted(MIGRATIONS):
+        mark = "x" if version in done else " "
+        print(f"[{mark}] {version:04d} {name}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+
+    if command == "upgrade":
+        upgrade()
+    elif command == "status":
+        status()
+    else:
+        print("usage: python migrations.py [upgrade|status]")
+        sys.exit(1)
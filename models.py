@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship, declarative_base
 import datetime
 
@@ -12,6 +12,7 @@ class Employee(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     pin = Column(String, unique=True, nullable=False)
+    pin_hash = Column(String(64), unique=True, index=True, nullable=True)
     role = Column(String, default="EMPLOYEE", nullable=False)
     branch_id = Column(Integer, nullable=False)
     is_active = Column(Boolean, default=True)
@@ -42,8 +43,22 @@ class Shift(Base):
     ended_at = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
 
+    # Рабочий день открытия смены в поясе филиала (services/clock.py)
+    business_date = Column(Date, nullable=True)
+
     employee = relationship("Employee", back_populates="shifts")
 
+    __table_args__ = (
+        # Активная смена сотрудника (логин, старт заказа, закрытие смены)
+        Index(
+            "ix_shifts_active_employee",
+            "employee_id",
+            sqlite_where=is_active == True,
+            postgresql_where=is_active == True,
+        ),
+        Index("ix_shifts_employee_business_date", "employee_id", "business_date"),
+    )
+
 
 # ===== Order =====
 class Order(Base):
@@ -68,16 +83,178 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
 
+    # Рабочий день завершения в поясе филиала: отчёты ищут по нему, а не
+    # по диапазону completed_at
+    business_date = Column(Date, nullable=True)
+
+    # Сумма по строкам заказа на момент старта
+    total = Column(Integer, nullable=True, default=0)
+
+    # id, выданный киоском при старте офлайн (POST /sync), — защита от дублей
+    client_id = Column(String(36), nullable=True)
+
     service = relationship("Service", back_populates="orders")
     employee = relationship("Employee", back_populates="orders")
     services = relationship("OrderService", backref="order", cascade="all, delete")
 
+    __table_args__ = (
+        # Статистика/история сотрудника за день
+        Index(
+            "ix_orders_employee_status_completed",
+            "employee_id", "status", "payment_status", "completed_at",
+        ),
+        # Отчёты по всем сотрудникам
+        Index(
+            "ix_orders_status_completed",
+            "status", "payment_status", "completed_at",
+        ),
+        # Отчёты, экспорт и сброс дня по рабочей дате
+        Index(
+            "ix_orders_employee_status_business_date",
+            "employee_id", "status", "payment_status", "business_date",
+        ),
+        Index(
+            "ix_orders_status_business_date",
+            "status", "payment_status", "business_date",
+        ),
+        # /orders/in-progress
+        Index(
+            "ix_orders_in_progress",
+            "employee_id",
+            sqlite_where=status == "IN_PROGRESS",
+            postgresql_where=status == "IN_PROGRESS",
+        ),
+        # История заказов (keyset по completed_at, id)
+        Index(
+            "ix_orders_completed_id",
+            "completed_at", "id",
+            sqlite_where=completed_at != None,
+            postgresql_where=completed_at != None,
+        ),
+        Index(
+            "ix_orders_employee_completed_id",
+            "employee_id", "completed_at", "id",
+            sqlite_where=completed_at != None,
+            postgresql_where=completed_at != None,
+        ),
+        Index("ix_orders_client_id", "client_id", unique=True),
+    )
+
 
 class OrderService(Base):
     __tablename__ = "order_services"
 
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
 
-    service = relationship("Service")
\ No newline at end of file
+    # Цена услуги на момент старта заказа (не меняется при смене прайса)
+    price = Column(Integer, nullable=True)
+
+    service = relationship("Service")
+
+
+# ===== Archive =====
+# Холодные заказы: рабочий день старше ARCHIVE_AFTER_DAYS.
+# Колонки и id те же, что в orders/order_services (см. services/archive.py)
+class OrderArchive(Base):
+    __tablename__ = "orders_archive"
+
+    id = Column(Integer, primary_key=True)
+
+    service_id = Column(Integer, nullable=False)
+    employee_id = Column(Integer, nullable=False)
+    branch_id = Column(Integer, nullable=False)
+
+    client_name = Column(String, nullable=False)
+    client_phone = Column(String, nullable=False)
+
+    status = Column(String, nullable=False)
+    payment_type = Column(String, nullable=True)
+    payment_status = Column(String, nullable=False)
+
+    not_provided_reason = Column(String, nullable=True)
+
+    created_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    business_date = Column(Date, nullable=True)
+
+    total = Column(Integer, nullable=True)
+    client_id = Column(String(36), nullable=True)
+
+    archived_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_orders_archive_completed_id", "completed_at", "id"),
+        Index("ix_orders_archive_business_date", "business_date"),
+        Index(
+            "ix_orders_archive_employee_completed_id",
+            "employee_id", "completed_at", "id",
+        ),
+    )
+
+
+class OrderServiceArchive(Base):
+    __tablename__ = "order_services_archive"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, nullable=False, index=True)
+    service_id = Column(Integer, nullable=False)
+    price = Column(Integer, nullable=True)
+
+
+# ===== Daily totals (rollup) =====
+class DailyEmployeeTotal(Base):
+    __tablename__ = "daily_employee_totals"
+
+    # Локальный рабочий день + сотрудник + филиал + тип оплаты
+    # (NOT_PROVIDED — отдельный ключ для неоказанных, сумма 0)
+    business_date = Column(Date, primary_key=True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), primary_key=True)
+    branch_id = Column(Integer, primary_key=True)
+    payment_type = Column(String, primary_key=True)
+
+    orders_count = Column(Integer, default=0, nullable=False)
+    services_count = Column(Integer, default=0, nullable=False)
+    amount = Column(Integer, default=0, nullable=False)
+
+
+# ===== Telegram outbox =====
+class TelegramOutbox(Base):
+    __tablename__ = "telegram_outbox"
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+
+    status = Column(String, default="PENDING", nullable=False)  # PENDING / SENT / FAILED
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Очередь воркера: только неотправленные, по порядку
+        Index(
+            "ix_telegram_outbox_pending",
+            "id",
+            sqlite_where=status == "PENDING",
+            postgresql_where=status == "PENDING",
+        ),
+    )
+
+
+# ===== Offline sync =====
+class SyncOperation(Base):
+    __tablename__ = "sync_operations"
+
+    # id операции из очереди киоска; повтор с тем же id получает сохранённый ответ
+    op_id = Column(String(64), primary_key=True)
+    employee_id = Column(Integer, nullable=False)
+    type = Column(String, nullable=False)  # start / complete / not_provided
+
+    result = Column(Text, nullable=False)  # JSON-ответ на операцию
+
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
@@ -0,0 +1,249 @@
+import contextvars
+import logging
+import os
+import re
+import sysconfig
+import threading
+import traceback
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+# ================= QUERY WATCH =================
+
+# Режим разработки/тестов (QUERY_WATCH=1): для каждого запроса собираем
+# SQL-запросы, ищем N+1 — один и тот же «шаблон» запроса много раз подряд
+# (ленивые relationship в цикле) — и проверяем бюджет маршрута.
+#
+#   @app.get("/orders/in-progress")
+#   @query_budget(2)
+#   def get_in_progress(...): ...
+#
+# QUERY_WATCH_STRICT=1 — превышение бюджета или N+1 становится ошибкой
+# (500 в ответе, исключение в TestClient), чтобы тест падал.
+
+ENABLED = os.getenv("QUERY_WATCH", "0") == "1"
+STRICT = os.getenv("QUERY_WATCH_STRICT", "0") == "1"
+
+# Сколько одинаковых запросов за HTTP-запрос считаем N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_WATCH_THRESHOLD", "3"))
+
+log = logging.getLogger("querywatch")
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_THIS = os.path.abspath(__file__)
+_LIBRARY = tuple(
+    os.path.abspath(sysconfig.get_paths()[key]) for key in ("stdlib", "purelib", "platlib")
+)
+
+_current = contextvars.ContextVar("querywatch", default=None)
+
+_listeners = []
+_listeners_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries: int):
+    # Бюджет маршрута: читается middleware из scope["route"].endpoint
+    def mark(fn):
+        fn.query_budget = max_queries
+        return fn
+    return mark
+
+
+# ================= SHAPES =================
+
+_PARAM = re.compile(r"%\(\w+\)s|\$\d+|:\w+")
+_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_NUMBER = re.compile(r"\b\d+\b")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    # Один шаблон для «тех же запросов с другими параметрами»
+    shape = _PARAM.sub("?", statement)
+    shape = _LIST.sub("?...", shape)
+    shape = _NUMBER.sub("N", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def _call_site():
+    # Ближайший кадр из кода приложения (не SQLAlchemy/стандартной библиотеки)
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = os.path.abspath(frame.filename)
+        if filename == _THIS or filename.startswith(_LIBRARY) or "site-packages" in filename:
+            continue
+        if filename.startswith(_HERE):
+            filename = os.path.relpath(filename, _HERE)
+        return f"{filename}:{frame.lineno} in {frame.name}"
+    return None
+
+
+# ================= TRACKER =================
+
+class RequestQueries:
+
+    def __init__(self, method=None, path=None):
+        self.method = method
+        self.path = path
+        self.route = None
+        self.budget = None
+        self.statements = 0
+        self.shapes = {}
+
+    def record(self, statement):
+        self.statements += 1
+
+        shape = statement_shape(statement)
+        entry = self.shapes.get(shape)
+
+        if entry is None:
+            self.shapes[shape] = [1, _call_site()]
+        else:
+            entry[0] += 1
+
+    def n_plus_one(self):
+        return [
+            {"statement": shape[:300], "count": count, "site": site}
+            for shape, (count, site) in self.shapes.items()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ]
+
+    def over_budget(self):
+        return self.budget is not None and self.statements > self.budget
+
+    def report(self):
+        return {
+            "method": self.method,
+            "route": self.route or self.path,
+            "statements": self.statements,
+            "budget": self.budget,
+            "over_budget": self.over_budget(),
+            "n_plus_one": self.n_plus_one(),
+        }
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.record(statement)
+
+
+def instrument_engine(sync_engine):
+    if event.contains(sync_engine, "after_cursor_execute", _after_cursor_execute):
+        return
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ================= MIDDLEWARE =================
+
+def _problems(report):
+    problems = []
+
+    if report["over_budget"]:
+        problems.append(
+            f"{report['statements']} queries, budget {report['budget']}"
+        )
+
+    for item in report["n_plus_one"]:
+        problems.append(
+            f"N+1: {item['count']}x at {item['site']}: {item['statement'][:120]}"
+        )
+
+    return problems
+
+
+class QueryWatchMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        tracker = RequestQueries(scope["method"], scope["path"])
+        token = _current.set(tracker)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(tracker.statements).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+
+        route = scope.get("route")
+        tracker.route = getattr(route, "path", None)
+        tracker.budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+        report = tracker.report()
+
+        with _listeners_lock:
+            for listener in _listeners:
+                listener.append(report)
+
+        problems = _problems(report)
+
+        if problems:
+            message = f"{report['method']} {report['route']}: " + "; ".join(problems)
+            log.warning(message)
+
+            if STRICT:
+                raise QueryBudgetExceeded(message)
+
+
+def install(app, *engines):
+    # Вызывается из main.py только при QUERY_WATCH=1 — в проде ноль накладных
+    for engine in engines:
+        instrument_engine(engine)
+    app.add_middleware(QueryWatchMiddleware)
+
+
+# ================= TESTS =================
+
+@contextmanager
+def capture_queries():
+    # Отчёты всех HTTP-запросов внутри блока (TestClient — другой поток,
+    # поэтому общий список, а не contextvar)
+    reports = []
+
+    with _listeners_lock:
+        _listeners.append(reports)
+
+    try:
+        yield reports
+    finally:
+        with _listeners_lock:
+            _listeners.remove(reports)
+
+
+def assert_query_budget(reports, max_queries=None):
+    # Падает, если какой-то запрос вышел за свой (или переданный) бюджет
+    # или содержит N+1
+    failures = []
+
+    for report in reports:
+        budget = max_queries if max_queries is not None else report["budget"]
+
+        if budget is not None and report["statements"] > budget:
+            failures.append(
+                f"{report['method']} {report['route']}: "
+                f"{report['statements']} queries > budget {budget}"
+            )
+
+        for item in report["n_plus_one"]:
+            failures.append(
+                f"{report['method']} {report['route']}: N+1 {item['count']}x "
+                f"at {item['site']}"
+            )
+
+    if failures:
+        raise QueryBudgetExceeded("\n".join(failures))
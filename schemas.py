@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 class ServiceCreate(BaseModel):
     name: str
@@ -10,9 +10,16 @@ class OrderStart(BaseModel):
     service_id: Optional[int] = None
     service_ids: Optional[List[int]] = None
     employee_id: int
-    branch_id: int
+    # Не используется: заказ пишется в филиал сотрудника
+    branch_id: Optional[int] = None
     client_name: str
     client_phone: str
+    # Только для POST /sync: id заказа, выданный киоском офлайн
+    client_id: Optional[str] = None
+
+
+class OrderBatch(BaseModel):
+    orders: List[OrderStart]
 
 
 class OrderComplete(BaseModel):
@@ -31,4 +38,30 @@ class EmployeeCreate(BaseModel):
     name: str
     branch_id: int
     pin: str
-    role: str = "EMPLOYEE"
\ No newline at end of file
+    role: str = "EMPLOYEE"
+
+
+class SyncOperationIn(BaseModel):
+    # Операция из офлайн-очереди киоска (frontend/offline.js).
+    # Длины — как у колонок sync_operations.op_id и orders.client_id
+    op_id: str = Field(max_length=64)
+    type: Literal["start", "complete", "not_provided"]
+    # Время действия на киоске, мс с эпохи (UTC)
+    at: Optional[int] = None
+
+    # start
+    client_id: Optional[str] = Field(None, max_length=36)
+    service_ids: Optional[List[int]] = None
+    client_name: Optional[str] = None
+    client_phone: Optional[str] = None
+
+    # complete / not_provided: id с сервера или client_id заказа из очереди
+    order_id: Optional[int] = None
+    order_client_id: Optional[str] = Field(None, max_length=36)
+    payment_type: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class SyncBatch(BaseModel):
+    employee_id: int
+    operations: List[SyncOperationIn]
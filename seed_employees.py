@@ -1,5 +1,6 @@
 from database import SessionLocal
 from models import Employee
+from services.auth import pin_key
 
 employees_data = [
     {"name": "Багдат", "branch_id": 1, "pin": "7777", "role": "EMPLOYEE"},
@@ -20,6 +21,7 @@ def seed():
                 name=emp["name"],
                 branch_id=emp["branch_id"],
                 pin=emp["pin"],
+                pin_hash=pin_key(emp["pin"]),
                 role=emp["role"],
                 is_active=True
             ))
@@ -0,0 +1,165 @@
+import os
+import sys
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, update, func, literal
+from sqlalchemy.orm import Session
+from models import Employee, Order, OrderService, OrderArchive, OrderServiceArchive
+from services.clock import BRANCH_ZONES, local_today, today_by_branch
+from services.reports import _paid_between
+from services.rollup import clear_paid
+
+
+# ================= CONFIG =================
+
+# Заказы старше N дней уезжают из горячих orders/order_services в *_archive.
+# Отчёты за период, который начинается раньше границы, читают обе таблицы.
+# Значение можно уменьшать; если увеличить — уже перенесённые дни окажутся
+# «по эту сторону» границы и пропадут из отчётов, начинающихся после неё
+ARCHIVE_AFTER_DAYS = max(1, int(os.getenv("ARCHIVE_AFTER_DAYS", "90")))
+
+BATCH_SIZE = 1000
+
+HOT = (Order.__table__, OrderService.__table__)
+COLD = (OrderArchive.__table__, OrderServiceArchive.__table__)
+
+_ORDER_COLUMNS = [c.name for c in Order.__table__.c]
+_LINE_COLUMNS = [c.name for c in OrderService.__table__.c]
+
+
+def archive_boundary() -> date:
+    # Первый рабочий день, который точно ещё в горячей таблице
+    return local_today() - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+
+def reaches_archive(start_date: date = None) -> bool:
+    return start_date is None or start_date < archive_boundary()
+
+
+def sources(start_date: date = None, include_archive: bool = True):
+    # Пары (заказы, строки) для периода: архив (старые) раньше горячих
+    if include_archive and reaches_archive(start_date):
+        return [COLD, HOT]
+    return [HOT]
+
+
+# ================= RESET =================
+
+def archive_day(db: Session, day: date, branch_ids=None):
+    # Сброс дня: один UPDATE вместо загрузки заказов в ORM
+    stmt = (
+        update(Order)
+        .where(*_paid_between(day, day))
+        .values(status="ARCHIVED")
+        .execution_options(synchronize_session=False)
+    )
+
+    if branch_ids is not None:
+        stmt = stmt.where(Order.branch_id.in_(branch_ids))
+
+    return db.execute(stmt).rowcount
+
+
+def reset_branch_days(db: Session):
+    # Сброс «сегодня» в базе филиала(ов): у каждого филиала — свой пояс.
+    # Без BRANCH_TIMEZONES день один для всех
+    if BRANCH_ZONES:
+        branch_ids = db.execute(select(Employee.branch_id).distinct()).scalars().all()
+        days = today_by_branch(branch_ids)
+    else:
+        days = {local_today(): None}
+
+    archived = 0
+    for day, day_branches in days.items():
+        archived += archive_day(db, day, day_branches)
+        clear_paid(db, day, day_branches)
+
+    return archived
+
+
+# ================= MOVE =================
+
+def _archivable_ids_stmt(before: date, batch_size: int):
+    # Только по возрасту: сброшенные (ARCHIVED) свежие заказы остаются в
+    # горячей таблице, иначе отчёты, начинающиеся после границы, их не видят.
+    # Самый последний заказ не переносим: SQLite выдаёт id как max(rowid) + 1
+    # и повторил бы id, уже лежащий в архиве
+    newest = select(func.max(Order.id)).scalar_subquery()
+
+    return (
+        select(Order.id)
+        .where(
+            Order.status != "IN_PROGRESS",
+            Order.business_date < before,
+            Order.id < newest
+        )
+        .order_by(Order.id)
+        .limit(batch_size)
+    )
+
+
+def _move(db: Session, order_ids, now: datetime):
+    orders, lines = HOT
+    orders_archive, lines_archive = COLD
+
+    db.execute(
+        orders_archive.insert().from_select(
+            _ORDER_COLUMNS + ["archived_at"],
+            select(*(orders.c[n] for n in _ORDER_COLUMNS), literal(now))
+            .where(orders.c.id.in_(order_ids))
+        )
+    )
+    db.execute(
+        lines_archive.insert().from_select(
+            _LINE_COLUMNS,
+            select(*(lines.c[n] for n in _LINE_COLUMNS))
+            .where(lines.c.order_id.in_(order_ids))
+        )
+    )
+
+    db.execute(lines.delete().where(lines.c.order_id.in_(order_ids)))
+    db.execute(orders.delete().where(orders.c.id.in_(order_ids)))
+
+
+def archive_orders(db: Session, before: date = None, batch_size: int = BATCH_SIZE):
+    # Пачками по batch_size, каждая — своя транзакция: копия + удаление
+    before = before or archive_boundary()
+
+    if before > archive_boundary():
+        # Отчёты ищут в архиве только дни до archive_boundary()
+        raise ValueError("Cannot archive orders newer than ARCHIVE_AFTER_DAYS")
+
+    moved = 0
+
+    while True:
+        order_ids = db.execute(
+            _archivable_ids_stmt(before, batch_size)
+        ).scalars().all()
+
+        if not order_ids:
+            break
+
+        _move(db, order_ids, datetime.utcnow())
+        db.commit()
+
+        moved += len(order_ids)
+
+    return moved
+
+
+if __name__ == "__main__":
+    # python -m services.archive [YYYY-MM-DD]  (по умолчанию — сегодня минус ARCHIVE_AFTER_DAYS)
+    from database import SessionLocal
+    from services.sync import purge_operations
+
+    args = sys.argv[1:]
+    before = date.fromisoformat(args[0]) if args else None
+
+    db = SessionLocal()
+    try:
+        moved = archive_orders(db, before)
+        purged = purge_operations(db)
+    finally:
+        db.close()
+
+    print(f"orders archived: {moved}")
+    print(f"sync operations purged: {purged}")
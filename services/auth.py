@@ -1,67 +1,218 @@
 from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models import Employee, Shift
 from datetime import datetime
+from services.clock import business_date
+import hashlib
+import logging
+import os
+import threading
+import time
 
+log = logging.getLogger(__name__)
 
-def login_by_pin(db: Session, pin: str):
 
-    try:
-        pin = str(pin).strip()
-    except:
-        raise HTTPException(status_code=400, detail="Ошибка PIN")
+# ================= PIN CACHE =================
+
+# Другие воркеры не видят наш invalidate — запись живёт не дольше TTL,
+# а при попадании сверяем с базой is_active и PIN одним коротким запросом
+PIN_CACHE_TTL = float(os.getenv("PIN_CACHE_TTL", "60"))
+
+# pin_hash -> (время загрузки, {"employee_id", "name", "role", "branch_id"})
+# только для активных сотрудников
+_pin_cache = {}
+_pin_cache_lock = threading.Lock()
+
+
+def pin_key(pin) -> str:
+    # Нормализуем PIN так же, как раньше сравнивали (str + strip) и хэшируем
+    return hashlib.sha256(str(pin).strip().encode("utf-8")).hexdigest()
+
+
+def invalidate_pin_cache():
+    with _pin_cache_lock:
+        _pin_cache.clear()
 
-    print("Введён PIN:", pin)
+
+def _cache_get(key: str):
+    with _pin_cache_lock:
+        entry = _pin_cache.get(key)
+
+    if entry and time.monotonic() - entry[0] < PIN_CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def _cache_drop(key: str):
+    with _pin_cache_lock:
+        _pin_cache.pop(key, None)
+
+
+def _still_valid_stmt(key: str, employee_id: int):
+    return select(Employee.id).where(
+        Employee.id == employee_id,
+        Employee.pin_hash == key,
+        Employee.is_active == True
+    )
+
+
+def _cache_put(key: str, employee: Employee):
+    found = {
+        "employee_id": employee.id,
+        "name": employee.name,
+        "role": employee.role,
+        "branch_id": employee.branch_id
+    }
+
+    with _pin_cache_lock:
+        _pin_cache[key] = (time.monotonic(), found)
+
+    return found
+
+
+def _find_employee(db: Session, key: str):
+
+    cached = _cache_get(key)
 
     try:
-        employees = db.query(Employee).all()
-    except Exception as e:
-        print("DB ERROR:", e)
+        if cached:
+            if db.execute(_still_valid_stmt(key, cached["employee_id"])).first():
+                return cached
+            _cache_drop(key)
+
+        # pin_hash старых записей заполняет миграция 2
+        employee = db.query(Employee).filter(Employee.pin_hash == key).first()
+    except Exception:
+        log.exception("pin_lookup_failed")
         raise HTTPException(status_code=500, detail="Ошибка базы")
 
-    employee = None
+    if not employee or not employee.is_active:
+        return None
+
+    return _cache_put(key, employee)
 
-    for e in employees:
-        try:
-            db_pin = str(e.pin).strip() if e.pin is not None else ""
-        except:
-            db_pin = ""
 
-        print("DB:", e.id, e.name, db_pin, e.is_active)
+# ================= LOGIN =================
 
-        if db_pin == pin and e.is_active:
-            employee = e
-            break
+def authenticate(db: Session, pin: str):
+
+    try:
+        pin = str(pin).strip()
+    except:
+        raise HTTPException(status_code=400, detail="Ошибка PIN")
+
+    employee = _find_employee(db, pin_key(pin))
 
     if not employee:
+        log.info("pin_rejected")
         raise HTTPException(status_code=401, detail="Неверный PIN")
 
+    log.info("pin_login", extra={"employee_id": employee["employee_id"]})
+
+    return employee
+
+
+def ensure_shift(db: Session, employee_id: int, branch_id: int = None):
+    # db — база филиала сотрудника (см. services/shards.py)
+
     # 🔥 Проверка смены (тоже защищаем)
     try:
         active_shift = db.query(Shift).filter(
-            Shift.employee_id == employee.id,
+            Shift.employee_id == employee_id,
             Shift.is_active == True
         ).first()
-    except Exception as e:
-        print("SHIFT ERROR:", e)
+    except Exception:
+        log.exception("shift_lookup_failed", extra={"employee_id": employee_id})
         raise HTTPException(status_code=500, detail="Ошибка смены")
 
     if not active_shift:
         try:
+            started_at = datetime.utcnow()
             new_shift = Shift(
-                employee_id=employee.id,
-                started_at=datetime.utcnow(),
+                employee_id=employee_id,
+                started_at=started_at,
+                business_date=business_date(started_at, branch_id),
                 is_active=True
             )
             db.add(new_shift)
             db.commit()
             db.refresh(new_shift)
-        except Exception as e:
-            print("CREATE SHIFT ERROR:", e)
+        except Exception:
+            log.exception("shift_create_failed", extra={"employee_id": employee_id})
             raise HTTPException(status_code=500, detail="Ошибка создания смены")
 
-    return {
-        "employee_id": employee.id,
-        "name": employee.name,
-        "role": employee.role
-    }
\ No newline at end of file
+
+def login_by_pin(db: Session, pin: str, shift_db: Session = None):
+    employee = authenticate(db, pin)
+    ensure_shift(shift_db or db, employee["employee_id"], employee["branch_id"])
+    return dict(employee)
+
+
+# ================= ASYNC =================
+
+async def _find_employee_async(db: AsyncSession, key: str):
+
+    cached = _cache_get(key)
+
+    try:
+        if cached:
+            if (await db.execute(_still_valid_stmt(key, cached["employee_id"]))).first():
+                return cached
+            _cache_drop(key)
+
+        employee = (await db.execute(
+            select(Employee).where(Employee.pin_hash == key)
+        )).scalars().first()
+    except Exception:
+        log.exception("pin_lookup_failed")
+        raise HTTPException(status_code=500, detail="Ошибка базы")
+
+    if not employee or not employee.is_active:
+        return None
+
+    return _cache_put(key, employee)
+
+
+async def login_by_pin_async(db: AsyncSession, pin: str):
+
+    try:
+        pin = str(pin).strip()
+    except:
+        raise HTTPException(status_code=400, detail="Ошибка PIN")
+
+    employee = await _find_employee_async(db, pin_key(pin))
+
+    if not employee:
+        log.info("pin_rejected")
+        raise HTTPException(status_code=401, detail="Неверный PIN")
+
+    log.info("pin_login", extra={"employee_id": employee["employee_id"]})
+
+    try:
+        active_shift = (await db.execute(
+            select(Shift.id).where(
+                Shift.employee_id == employee["employee_id"],
+                Shift.is_active == True
+            )
+        )).first()
+    except Exception:
+        log.exception("shift_lookup_failed", extra={"employee_id": employee["employee_id"]})
+        raise HTTPException(status_code=500, detail="Ошибка смены")
+
+    if not active_shift:
+        try:
+            started_at = datetime.utcnow()
+            db.add(Shift(
+                employee_id=employee["employee_id"],
+                started_at=started_at,
+                business_date=business_date(started_at, employee["branch_id"]),
+                is_active=True
+            ))
+            await db.commit()
+        except Exception:
+            log.exception("shift_create_failed", extra={"employee_id": employee["employee_id"]})
+            raise HTTPException(status_code=500, detail="Ошибка создания смены")
+
+    return dict(employee)
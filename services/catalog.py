@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import Service
+
+
+PINNED_NAMES = [
+    "Открытие ЭЦП (физическое лицо)",
+    "Открытие ЭЦП (юридическое лицо)",
+    "Открытие ЭЦП Онлайн(физическое лицо)",
+    "Открытие ЭЦП Онлайн(юридическое лицо)",
+    "БМГ",
+    "Прописка",
+    "Egov moblie"
+
+]
+
+# Другие воркеры не видят наш invalidate — перечитываем каталог не реже TTL
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "60"))
+
+
+class Catalog:
+
+    def __init__(self, version, services):
+        self.version = version
+        self.services = services
+        self.prices = {s["id"]: s["price"] for s in services}
+        self.names = {s["id"]: s["name"] for s in services}
+        self.body = json.dumps(services, ensure_ascii=False).encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.loaded_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_catalog = None
+_version = 0
+
+
+def _services_stmt():
+    return select(Service.id, Service.name, Service.price).order_by(Service.id)
+
+
+def _build(rows, version):
+
+    pinned = []
+    others = []
+
+    for service_id, name, price in rows:
+        item = {"id": service_id, "name": name, "price": price}
+        if name in PINNED_NAMES:
+            pinned.append(item)
+        else:
+            others.append(item)
+
+    # Сортируем остальные по убыванию id
+    others.sort(key=lambda x: x["id"], reverse=True)
+
+    return Catalog(version, pinned + others)
+
+
+def _current():
+    catalog = _catalog
+    if catalog and time.monotonic() - catalog.loaded_at < CATALOG_TTL:
+        return catalog
+    return None
+
+
+def _store(rows, version):
+    global _catalog
+
+    catalog = _build(rows, version)
+
+    with _lock:
+        # Пока читали, каталог могли инвалидировать — тогда не кэшируем
+        if version == _version:
+            _catalog = catalog
+
+    return catalog
+
+
+def get_catalog(db: Session) -> Catalog:
+    catalog = _current()
+    if catalog:
+        return catalog
+
+    version = _version
+    return _store(db.execute(_services_stmt()).all(), version)
+
+
+async def get_catalog_async(db: AsyncSession) -> Catalog:
+    catalog = _current()
+    if catalog:
+        return catalog
+
+    version = _version
+    return _store((await db.execute(_services_stmt())).all(), version)
+
+
+def invalidate_catalog():
+    global _catalog, _version
+
+    with _lock:
+        _version += 1
+        _catalog = None
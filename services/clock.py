@@ -0,0 +1,133 @@
+import os
+from datetime import datetime, timedelta, timezone, date, time
+from zoneinfo import ZoneInfo
+from sqlalchemy import and_, or_
+
+
+# ================= TIME ZONES =================
+
+# Рабочий день считается в часовом поясе филиала:
+#
+#   TIMEZONE="Asia/Almaty"                              — для всех филиалов
+#   BRANCH_TIMEZONES="2=Asia/Almaty;3,4=Asia/Aqtobe"    — отдельные филиалы
+#
+# Без TIMEZONE — фиксированный UTC+5, как раньше. Границы дня считаются
+# через zoneinfo, поэтому пояса с переходом на летнее время тоже работают
+# (такой день длится 23 или 25 часов).
+
+LOCAL_OFFSET = timezone(timedelta(hours=5))
+
+
+def parse_zone(name: str):
+    name = (name or "").strip()
+    return ZoneInfo(name) if name else LOCAL_OFFSET
+
+
+def parse_branch_zones(value: str) -> dict:
+    # "2=Asia/Almaty;3,4=Asia/Aqtobe" -> {2: ZoneInfo, 3: ZoneInfo, 4: ZoneInfo}
+    zones = {}
+
+    for entry in filter(None, (part.strip() for part in value.split(";"))):
+        ids, sep, name = entry.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Invalid BRANCH_TIMEZONES entry: {entry!r}")
+
+        zone = parse_zone(name)
+        for branch_id in ids.split(","):
+            zones[int(branch_id)] = zone
+
+    return zones
+
+
+DEFAULT_ZONE = parse_zone(os.getenv("TIMEZONE"))
+BRANCH_ZONES = parse_branch_zones(os.getenv("BRANCH_TIMEZONES", ""))
+
+
+def branch_zone(branch_id: int = None):
+    return BRANCH_ZONES.get(branch_id, DEFAULT_ZONE)
+
+
+# ================= LOCAL TIME =================
+
+# В базе время хранится naive UTC
+
+def to_local(moment_utc: datetime, branch_id: int = None) -> datetime:
+    return (
+        moment_utc.replace(tzinfo=timezone.utc)
+        .astimezone(branch_zone(branch_id))
+        .replace(tzinfo=None)
+    )
+
+
+def local_now(branch_id: int = None) -> datetime:
+    return to_local(datetime.utcnow(), branch_id)
+
+
+def local_today(branch_id: int = None) -> date:
+    return local_now(branch_id).date()
+
+
+def employee_today(employee_id: int) -> date:
+    # Без BRANCH_TIMEZONES пояс один — филиал сотрудника не нужен
+    if not BRANCH_ZONES:
+        return local_today()
+
+    from services.shards import employee_branch
+    return local_today(employee_branch(employee_id))
+
+
+async def employee_today_async(db, employee_id: int) -> date:
+    if not BRANCH_ZONES:
+        return local_today()
+
+    from services.shards import employee_branch_async
+    return local_today(await employee_branch_async(db, employee_id))
+
+
+def today_by_branch(branch_ids) -> dict:
+    # {сегодня: [филиалы]}: у филиалов в разных поясах «сегодня» может различаться
+    days = {}
+    for branch_id in branch_ids:
+        days.setdefault(local_today(branch_id), []).append(branch_id)
+    return days
+
+
+def today_clause(day_column, branch_column, branch_id: int = None):
+    # Условие «рабочий день — сегодня»: для отчёта по всем филиалам
+    # у филиалов из BRANCH_TIMEZONES своё «сегодня», у остальных — по TIMEZONE
+    if branch_id is not None or not BRANCH_ZONES:
+        return day_column == local_today(branch_id)
+
+    zoned = list(BRANCH_ZONES)
+    return or_(
+        *(and_(day_column == day, branch_column.in_(ids))
+          for day, ids in today_by_branch(zoned).items()),
+        and_(day_column == local_today(), branch_column.notin_(zoned)),
+    )
+
+
+def business_date(moment_utc: datetime, branch_id: int = None) -> date:
+    # Рабочий день, к которому относится момент в UTC
+    return to_local(moment_utc, branch_id).date()
+
+
+def _midnight_utc(day: date, zone) -> datetime:
+    return (
+        datetime.combine(day, time.min, tzinfo=zone)
+        .astimezone(timezone.utc)
+        .replace(tzinfo=None)
+    )
+
+
+def local_day_range(day: date, branch_id: int = None):
+    # [начало; конец] рабочего дня в UTC включительно
+    zone = branch_zone(branch_id)
+
+    start_utc = _midnight_utc(day, zone)
+    end_utc = _midnight_utc(day + timedelta(days=1), zone) - timedelta(microseconds=1)
+
+    return start_utc, end_utc
+
+
+def get_local_day_range(branch_id: int = None):
+    return local_day_range(local_today(branch_id), branch_id)
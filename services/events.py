@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+
+
+# ================= EVENT BUS =================
+
+# Шина событий внутри процесса: заказы и смены -> SSE-подписчики (/events).
+# При переподключении клиент сам перечитывает состояние, поэтому потеря
+# событий (переполнение, рестарт) не критична.
+
+QUEUE_SIZE = 256
+
+
+class Subscription:
+
+    def __init__(self, employee_id=None, admin=False):
+        self.employee_id = employee_id
+        self.admin = admin
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, event):
+        # События без employee_id (сброс дня) получают все
+        return self.admin or event.get("employee_id") in (None, self.employee_id)
+
+    def _put(self, event):
+        # Выполняется в цикле событий подписчика
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Медленный клиент: закрываем поток, он переподключится и перечитает
+            self.overflowed = True
+
+
+class EventBus:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, employee_id=None, admin=False):
+        sub = Subscription(employee_id, admin)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event_type, **payload):
+        # Можно вызывать и из sync-обработчиков (threadpool), и из async
+        event = {"type": event_type, **payload}
+
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, event)
+            except RuntimeError:
+                # Цикл подписчика уже закрыт
+                self.unsubscribe(sub)
+
+
+bus = EventBus()
+
+
+# ================= SSE =================
+
+HEARTBEAT_SECONDS = 15
+
+
+def format_sse(event):
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def sse_stream(request, sub):
+
+    try:
+        yield "retry: 3000\n\n"
+
+        while not sub.overflowed:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+
+            yield format_sse(event)
+    finally:
+        bus.unsubscribe(sub)
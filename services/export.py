@@ -0,0 +1,214 @@
+import csv
+import io
+import tempfile
+from datetime import date
+from sqlalchemy import select, func
+from database import SessionLocal, AsyncSessionLocal
+from models import Employee, Service
+from services.archive import sources
+from services.clock import to_local
+from services.reports import _paid_between
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX — опционально
+    Workbook = None
+
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+HEADER = [
+    "order_id",
+    "business_date",
+    "created_at",
+    "completed_at",
+    "employee",
+    "branch_id",
+    "client_name",
+    "client_phone",
+    "payment_type",
+    "service",
+    "price",
+]
+
+
+# ================= QUERY =================
+
+def export_lines_stmt(
+    orders,
+    lines,
+    start_date: date,
+    end_date: date,
+    employee_id: int = None,
+    branch_id: int = None
+):
+    # Те же заказы, что в /admin/report/period, но построчно по услугам
+    stmt = (
+        select(
+            orders.c.id,
+            orders.c.business_date,
+            orders.c.created_at,
+            orders.c.completed_at,
+            Employee.name,
+            orders.c.branch_id,
+            orders.c.client_name,
+            orders.c.client_phone,
+            orders.c.payment_type,
+            Service.name,
+            func.coalesce(lines.c.price, 0),
+        )
+        .join(Employee, Employee.id == orders.c.employee_id)
+        .outerjoin(lines, lines.c.order_id == orders.c.id)
+        .outerjoin(Service, Service.id == lines.c.service_id)
+        .where(*_paid_between(start_date, end_date, orders))
+        .order_by(orders.c.completed_at, orders.c.id, lines.c.id)
+    )
+
+    if employee_id is not None:
+        stmt = stmt.where(orders.c.employee_id == employee_id)
+    if branch_id is not None:
+        stmt = stmt.where(orders.c.branch_id == branch_id)
+
+    return stmt
+
+
+def export_stmts(start_date: date, end_date: date, employee_id: int = None, branch_id: int = None):
+    # Архив целиком старше горячих заказов — читаем по очереди, порядок сохраняется
+    return [
+        export_lines_stmt(orders, lines, start_date, end_date, employee_id, branch_id)
+        for orders, lines in sources(start_date)
+    ]
+
+
+def _local(dt, branch_id):
+    if dt is None:
+        return ""
+    return to_local(dt, branch_id).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _row(line):
+    (
+        order_id, business_date, created_at, completed_at, employee, branch_id,
+        client_name, client_phone, payment_type, service, price
+    ) = line
+
+    return [
+        order_id,
+        str(business_date or ""),
+        _local(created_at, branch_id),
+        _local(completed_at, branch_id),
+        employee,
+        branch_id,
+        client_name,
+        client_phone,
+        payment_type or "",
+        service or "",
+        price,
+    ]
+
+
+def _iter_rows(stmts, session_factory=SessionLocal):
+    # Своя сессия: генератор работает после того, как запрос отдал ответ.
+    # yield_per — серверный курсор (Postgres), в памяти только одна пачка.
+    # session_factory — база филиала, если филиалы разнесены по шардам
+    db = session_factory()
+    try:
+        for stmt in stmts:
+            result = db.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+            for line in result:
+                yield _row(line)
+    finally:
+        db.close()
+
+
+async def _iter_rows_async(stmts):
+    async with AsyncSessionLocal() as db:
+        for stmt in stmts:
+            result = await db.stream(stmt.execution_options(yield_per=BATCH_SIZE))
+            async for line in result:
+                yield _row(line)
+
+
+# ================= CSV =================
+
+def iter_csv(stmts, session_factory=SessionLocal):
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM — чтобы Excel открыл кириллицу без мастера импорта
+    buffer.write("\ufeff")
+    writer.writerow(HEADER)
+
+    for row in _iter_rows(stmts, session_factory):
+        writer.writerow(row)
+
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+async def iter_csv_async(stmts):
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write("\ufeff")
+    writer.writerow(HEADER)
+
+    async for row in _iter_rows_async(stmts):
+        writer.writerow(row)
+
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+# ================= XLSX =================
+
+def xlsx_available():
+    return Workbook is not None
+
+
+def iter_xlsx(stmts, session_factory=SessionLocal):
+    # XLSX — zip, его нельзя отдавать по частям до конца записи.
+    # write_only держит в памяти одну строку, файл копится во временном файле
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("orders")
+    ws.append(HEADER)
+
+    for row in _iter_rows(stmts, session_factory):
+        ws.append(row)
+
+    yield from _saved_chunks(wb)
+
+
+async def iter_xlsx_async(stmts):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("orders")
+    ws.append(HEADER)
+
+    async for row in _iter_rows_async(stmts):
+        ws.append(row)
+
+    for chunk in _saved_chunks(wb):
+        yield chunk
+
+
+def _saved_chunks(wb):
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+
+        while True:
+            chunk = tmp.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
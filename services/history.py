@@ -0,0 +1,189 @@
+import base64
+from datetime import date, datetime
+from sqlalchemy import select, and_, or_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import Employee, Service
+from services.archive import sources
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+# ================= CURSOR =================
+
+# Курсор — последняя строка страницы (completed_at, id), а не OFFSET:
+# каждая страница — один проход по индексу, сколько бы заказов ни было
+
+def encode_cursor(completed_at: datetime, order_id: int) -> str:
+    raw = f"{completed_at.isoformat()}|{order_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        completed_at, order_id = raw.split("|")
+        return datetime.fromisoformat(completed_at), int(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+# ================= QUERY =================
+
+def _source_stmt(
+    orders,
+    limit,
+    employee_id=None,
+    branch_id=None,
+    status=None,
+    payment_type=None,
+    start_date=None,
+    end_date=None,
+    cursor=None
+):
+    stmt = (
+        select(
+            orders.c.id,
+            orders.c.completed_at,
+            orders.c.created_at,
+            orders.c.employee_id,
+            Employee.name.label("employee"),
+            orders.c.branch_id,
+            orders.c.client_name,
+            orders.c.status,
+            orders.c.payment_type,
+            orders.c.total,
+        )
+        .join(Employee, Employee.id == orders.c.employee_id)
+        .where(orders.c.completed_at != None)
+        .order_by(orders.c.completed_at.desc(), orders.c.id.desc())
+        .limit(limit + 1)
+    )
+
+    if employee_id is not None:
+        stmt = stmt.where(orders.c.employee_id == employee_id)
+    if branch_id is not None:
+        stmt = stmt.where(orders.c.branch_id == branch_id)
+    if status:
+        stmt = stmt.where(orders.c.status == status.upper())
+    if payment_type:
+        stmt = stmt.where(orders.c.payment_type == payment_type.upper())
+    if start_date:
+        stmt = stmt.where(orders.c.business_date >= start_date)
+    if end_date:
+        stmt = stmt.where(orders.c.business_date <= end_date)
+
+    if cursor:
+        completed_at, order_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            orders.c.completed_at < completed_at,
+            and_(orders.c.completed_at == completed_at, orders.c.id < order_id)
+        ))
+
+    return stmt
+
+
+def history_stmt(limit: int = DEFAULT_LIMIT, start_date: date = None, **filters):
+    # Завершённые заказы от новых к старым; limit + 1 — есть ли следующая страница
+    stmts = [
+        _source_stmt(orders, limit, start_date=start_date, **filters)
+        for orders, _ in sources(start_date)
+    ]
+
+    if len(stmts) == 1:
+        return stmts[0]
+
+    # Архив: каждая таблица отдаёт limit + 1 по своему индексу, потом общий порядок
+    page = union_all(*(select(stmt.subquery()) for stmt in stmts)).subquery()
+
+    return (
+        select(page)
+        .order_by(page.c.completed_at.desc(), page.c.id.desc())
+        .limit(limit + 1)
+    )
+
+
+def services_stmt(order_ids, start_date: date = None):
+    # Названия услуг всей страницы одним запросом
+    stmts = [
+        select(lines.c.order_id, Service.name, lines.c.id.label("line_id"))
+        .join(Service, Service.id == lines.c.service_id)
+        .where(lines.c.order_id.in_(order_ids))
+        for _, lines in sources(start_date)
+    ]
+
+    page = union_all(*stmts).subquery() if len(stmts) > 1 else stmts[0].subquery()
+
+    return (
+        select(page.c.order_id, page.c.name)
+        .order_by(page.c.order_id, page.c.line_id)
+    )
+
+
+def build_page(rows, service_rows, limit: int):
+
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    names = {}
+    for order_id, name in service_rows:
+        names.setdefault(order_id, []).append(name)
+
+    orders = [
+        {
+            "order_id": order_id,
+            "completed_at": completed_at.isoformat(),
+            "created_at": created_at.isoformat() if created_at else None,
+            "employee_id": employee_id,
+            "employee": employee,
+            "branch_id": branch_id,
+            "client_name": client_name,
+            "status": status,
+            "payment_type": payment_type,
+            "total": total or 0,
+            "services": names.get(order_id, [])
+        }
+        for (
+            order_id, completed_at, created_at, employee_id, employee,
+            branch_id, client_name, status, payment_type, total
+        ) in rows
+    ]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+
+    return {"orders": orders, "next_cursor": next_cursor}
+
+
+def _clamp(limit: int):
+    return max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+
+def order_history(db: Session, limit: int = DEFAULT_LIMIT, start_date: date = None, **filters):
+
+    limit = _clamp(limit)
+    rows = db.execute(history_stmt(limit, start_date, **filters)).all()
+
+    order_ids = [r[0] for r in rows[:limit]]
+    service_rows = []
+    if order_ids:
+        service_rows = db.execute(services_stmt(order_ids, start_date)).all()
+
+    return build_page(rows, service_rows, limit)
+
+
+async def order_history_async(db: AsyncSession, limit: int = DEFAULT_LIMIT, start_date: date = None, **filters):
+
+    limit = _clamp(limit)
+    rows = (await db.execute(history_stmt(limit, start_date, **filters))).all()
+
+    order_ids = [r[0] for r in rows[:limit]]
+    service_rows = []
+    if order_ids:
+        service_rows = (await db.execute(services_stmt(order_ids, start_date))).all()
+
+    return build_page(rows, service_rows, limit)
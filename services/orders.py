@@ -1,79 +1,373 @@
+from sqlalchemy import select, insert, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models import Order, Service, Employee, Shift, OrderService
 import datetime
+from services.catalog import get_catalog, get_catalog_async
+from services.events import bus
+from services.clock import business_date
+from services.rollup import (
+    record_completed,
+    record_not_provided,
+    record_completed_async,
+    record_not_provided_async,
+)
 
+# допустимые типы оплаты
+ALLOWED_PAYMENTS = ["CASH", "QR", "TRANSFER"]
 
-def start_order(db: Session, data):
 
+# ================= START =================
+
+def _service_ids(data):
     # 🔥 Определяем список услуг
     if hasattr(data, "service_ids") and data.service_ids:
-        service_ids = data.service_ids
-    else:
-        service_ids = [data.service_id]
-
-    # Проверяем сотрудник
-    employee = db.query(Employee).filter(Employee.id == data.employee_id).first()
-
-    if not employee or not employee.is_active:
-        return {"error": "Invalid employee"}
-
-    # Проверяем активную смену
-    active_shift = db.query(Shift).filter(
-        Shift.employee_id == data.employee_id,
-        Shift.is_active == True
-    ).first()
-
-    if not active_shift:
-        return {"error": "No active shift"}
-
-    # 🔥 Проверяем что услуги существуют (без проверки длины)
-    services = db.query(Service).filter(Service.id.in_(set(service_ids))).all()
-
-    if not services:
-        return {"error": "Invalid services"}
-
-    # 🔥 Первая услуга — в Order (для совместимости)
-    main_service = services[0]
-
-    order = Order(
-        service_id=main_service.id,
-        employee_id=data.employee_id,
-        branch_id=data.branch_id,
-        client_name=data.client_name,
-        client_phone=data.client_phone,
-        status="IN_PROGRESS",
-        payment_status="NOT_PAID"
+        return data.service_ids
+    return [data.service_id]
+
+
+def employees_with_shift_stmt(employee_ids):
+    # Сотрудник, его филиал и активная смена одним запросом
+    return (
+        select(Employee.id, Employee.is_active, Employee.branch_id, Shift.id)
+        .outerjoin(
+            Shift,
+            and_(Shift.employee_id == Employee.id, Shift.is_active == True)
+        )
+        .where(Employee.id.in_(set(employee_ids)))
     )
 
-    db.add(order)
-    db.commit()
-    db.refresh(order)
 
-    # 🔥 Добавляем услуги (учитывая дубликаты)
-    for service_id in service_ids:
-        order_service = OrderService(
-            order_id=order.id,
-            service_id=service_id
+def _build_orders(items, employee_rows, prices, started_at=None):
+    # Проверки без запросов к БД; возвращает (результаты, [(order, service_ids)])
+
+    employees = {}
+    for employee_id, is_active, branch_id, shift_id in employee_rows:
+        employees[employee_id] = (is_active, shift_id, branch_id)
+
+    results = []
+    created = []
+
+    for data in items:
+        service_ids = _service_ids(data)
+        employee = employees.get(data.employee_id)
+
+        if not employee or not employee[0]:
+            results.append({"error": "Invalid employee"})
+            continue
+
+        if not employee[1]:
+            results.append({"error": "No active shift"})
+            continue
+
+        # 🔥 Проверяем что услуги существуют: строка с неизвестной услугой
+        # нарушила бы внешний ключ и уронила весь batch
+        if any(service_id not in prices for service_id in service_ids):
+            results.append({"error": "Invalid services"})
+            continue
+
+        order = Order(
+            # 🔥 Первая услуга — в Order (для совместимости)
+            service_id=service_ids[0],
+            employee_id=data.employee_id,
+            # Филиал — всегда филиал сотрудника, а не то, что прислал клиент
+            branch_id=employee[2],
+            client_name=data.client_name,
+            client_phone=data.client_phone,
+            status="IN_PROGRESS",
+            payment_status="NOT_PAID",
+            # 🔥 Фиксируем цены на момент старта
+            total=sum(prices[service_id] for service_id in service_ids),
+            client_id=data.client_id
         )
-        db.add(order_service)
 
-    db.commit()
+        if started_at:
+            order.created_at = started_at
+
+        results.append(order)
+        created.append((order, service_ids))
+
+    return results, created
+
+
+def _lines(created, prices):
+    # 🔥 Строки заказов (учитывая дубликаты) для одного bulk insert
+    return [
+        {
+            "order_id": order.id,
+            "service_id": service_id,
+            "price": prices[service_id]
+        }
+        for order, service_ids in created
+        for service_id in service_ids
+    ]
+
+
+def _finish(results):
+    return [
+        {"order_id": r.id} if isinstance(r, Order) else r
+        for r in results
+    ]
+
+
+def _line_ids_stmt(order_id: int):
+    return (
+        select(OrderService.service_id)
+        .where(OrderService.order_id == order_id)
+        .order_by(OrderService.id)
+    )
+
+
+# ================= EVENTS =================
+
+# События собираем до commit (после него атрибуты expire), публикуем после
+
+def _started_events(created, catalog):
+    return [
+        ("order_started", {
+            "employee_id": order.employee_id,
+            "order_id": order.id,
+            "client_id": order.client_id,
+            "client_name": order.client_name,
+            "services": [catalog.names.get(i, "") for i in service_ids],
+            "minutes_in_progress": 0
+        })
+        for order, service_ids in created
+    ]
+
+
+def _finished_event(event_type, order, service_ids, catalog, values):
+    return (event_type, {
+        "employee_id": order.employee_id,
+        "order_id": order.id,
+        "client_name": order.client_name,
+        "payment_type": order.payment_type,
+        "services": [catalog.names.get(i, "") for i in service_ids],
+        "services_count": values["services_count"],
+        "amount": values["amount"]
+    })
+
+
+def _publish(events):
+    for event_type, payload in events:
+        bus.publish(event_type, **payload)
+
+
+def _commit(db: Session, events):
+    # Пустой список — ошибка проверки, в сессии ничего не менялось
+    if events:
+        db.commit()
+        _publish(events)
+
+
+# apply_* — изменения без commit: (результат, события). Обёртки ниже
+# коммитят каждую операцию, POST /sync — всю очередь киоска разом
+
+def apply_start(db: Session, items, started_at=None):
+    # Все заказы — одна транзакция: проверки, заказы, строки одним insert
+
+    employee_rows = db.execute(
+        employees_with_shift_stmt([d.employee_id for d in items])
+    ).all()
+
+    # Цены и проверка service_ids — из кэша каталога, без запроса
+    catalog = get_catalog(db)
+    prices = catalog.prices
+
+    results, created = _build_orders(items, employee_rows, prices, started_at)
+
+    if not created:
+        return _finish(results), []
+
+    db.add_all([order for order, _ in created])
+    db.flush()
+
+    db.execute(insert(OrderService), _lines(created, prices))
+
+    # id берём до commit, чтобы не перечитывать заказы после expire
+    return _finish(results), _started_events(created, catalog)
+
+
+def _finished_at(order, finished_at):
+    # Время с киоска не раньше старта заказа
+    if finished_at is None:
+        return datetime.datetime.utcnow()
+    if order.created_at and finished_at < order.created_at:
+        return order.created_at
+    return finished_at
+
+
+def _owned_in_progress(order, employee_id):
+    if not order or order.status != "IN_PROGRESS":
+        return False
+    return employee_id is None or order.employee_id == employee_id
+
+
+def apply_complete(db: Session, order_id: int, payment_type: str,
+                   finished_at=None, employee_id: int = None):
+
+    # get — без запроса, если заказ уже в сессии (POST /sync грузит их заранее)
+    order = db.get(Order, order_id)
+
+    if not _owned_in_progress(order, employee_id):
+        return {"error": "Invalid order"}, []
+
+    payment_type = (payment_type or "").upper()
+
+    # проверка типа оплаты
+    if payment_type not in ALLOWED_PAYMENTS:
+        return {"error": "Invalid payment type"}, []
+
+    order.status = "COMPLETED"
+    order.payment_status = "PAID"
+    order.payment_type = payment_type
+    order.completed_at = _finished_at(order, finished_at)
+    order.business_date = business_date(order.completed_at, order.branch_id)
+
+    service_ids = db.execute(_line_ids_stmt(order.id)).scalars().all()
+    values = record_completed(db, order, len(service_ids))
+
+    event = _finished_event(
+        "order_completed", order, service_ids, get_catalog(db), values
+    )
+
+    return {"status": "completed"}, [event]
+
+
+def apply_not_provided(db: Session, order_id: int, reason: str,
+                       finished_at=None, employee_id: int = None):
+
+    order = db.get(Order, order_id)
+
+    if not _owned_in_progress(order, employee_id):
+        return {"error": "Invalid order"}, []
+
+    order.status = "NOT_PROVIDED"
+    order.not_provided_reason = reason
+    order.completed_at = _finished_at(order, finished_at)
+    order.business_date = business_date(order.completed_at, order.branch_id)
+
+    service_ids = db.execute(_line_ids_stmt(order.id)).scalars().all()
+    values = record_not_provided(db, order, len(service_ids))
+
+    event = _finished_event(
+        "order_not_provided", order, service_ids, get_catalog(db), values
+    )
+
+    return {"status": "not_provided"}, [event]
+
+
+def start_orders(db: Session, items):
+    output, events = apply_start(db, items)
+    _commit(db, events)
+    return output
+
+
+def start_order(db: Session, data):
+    return start_orders(db, [data])[0]
 
-    return {"order_id": order.id}
 
 def complete_order(db: Session, order_id: int, payment_type: str):
+    result, events = apply_complete(db, order_id, payment_type)
+    _commit(db, events)
+    return result
+
+
+def not_provided(db: Session, order_id: int, reason: str):
+    result, events = apply_not_provided(db, order_id, reason)
+    _commit(db, events)
+    return result
+
+
+# ================= IN PROGRESS =================
+
+def in_progress_stmt(employee_id: int):
+    # Заказы и названия услуг одним запросом
+    return (
+        select(Order.id, Order.client_id, Order.client_name, Order.created_at, Service.name)
+        .outerjoin(OrderService, OrderService.order_id == Order.id)
+        .outerjoin(Service, Service.id == OrderService.service_id)
+        .where(
+            Order.status == "IN_PROGRESS",
+            Order.employee_id == employee_id
+        )
+        .order_by(Order.id, OrderService.id)
+    )
+
+
+def format_in_progress(rows, now):
+
+    result = []
+    by_id = {}
+
+    for order_id, client_id, client_name, created_at, service_name in rows:
+
+        item = by_id.get(order_id)
+
+        if item is None:
+            minutes = 0
+            if created_at:
+                minutes = int((now - created_at).total_seconds() / 60)
 
-    # допустимые типы оплаты
-    ALLOWED_PAYMENTS = ["CASH", "QR", "TRANSFER"]
+            item = {
+                "order_id": order_id,
+                "client_id": client_id,
+                "services": [],
+                "client_name": client_name,
+                "minutes_in_progress": minutes
+            }
+            by_id[order_id] = item
+            result.append(item)
 
-    order = db.query(Order).filter(Order.id == order_id).first()
+        if service_name:
+            item["services"].append(service_name)
+
+    return result
+
+
+# ================= ASYNC =================
+
+async def start_orders_async(db: AsyncSession, items):
+
+    employee_rows = (await db.execute(
+        employees_with_shift_stmt([d.employee_id for d in items])
+    )).all()
+
+    catalog = await get_catalog_async(db)
+    prices = catalog.prices
+
+    results, created = _build_orders(items, employee_rows, prices)
+
+    if not created:
+        return _finish(results)
+
+    db.add_all([order for order, _ in created])
+    await db.flush()
+
+    await db.execute(insert(OrderService), _lines(created, prices))
+
+    output = _finish(results)
+    events = _started_events(created, catalog)
+    await db.commit()
+
+    _publish(events)
+
+    return output
+
+
+async def start_order_async(db: AsyncSession, data):
+    return (await start_orders_async(db, [data]))[0]
+
+
+async def complete_order_async(db: AsyncSession, order_id: int, payment_type: str):
+
+    order = await db.get(Order, order_id)
 
     if not order or order.status != "IN_PROGRESS":
         return {"error": "Invalid order"}
 
     payment_type = payment_type.upper()
 
-    # проверка типа оплаты
     if payment_type not in ALLOWED_PAYMENTS:
         return {"error": "Invalid payment type"}
 
@@ -81,13 +375,24 @@ def complete_order(db: Session, order_id: int, payment_type: str):
     order.payment_status = "PAID"
     order.payment_type = payment_type
     order.completed_at = datetime.datetime.utcnow()
+    order.business_date = business_date(order.completed_at, order.branch_id)
 
-    db.commit()
+    service_ids = (await db.execute(_line_ids_stmt(order.id))).scalars().all()
+    values = await record_completed_async(db, order, len(service_ids))
+
+    event = _finished_event(
+        "order_completed", order, service_ids, await get_catalog_async(db), values
+    )
+    await db.commit()
+
+    _publish([event])
 
     return {"status": "completed"}
-def not_provided(db: Session, order_id: int, reason: str):
 
-    order = db.query(Order).filter(Order.id == order_id).first()
+
+async def not_provided_async(db: AsyncSession, order_id: int, reason: str):
+
+    order = await db.get(Order, order_id)
 
     if not order or order.status != "IN_PROGRESS":
         return {"error": "Invalid order"}
@@ -95,7 +400,21 @@ def not_provided(db: Session, order_id: int, reason: str):
     order.status = "NOT_PROVIDED"
     order.not_provided_reason = reason
     order.completed_at = datetime.datetime.utcnow()
+    order.business_date = business_date(order.completed_at, order.branch_id)
+
+    service_ids = (await db.execute(_line_ids_stmt(order.id))).scalars().all()
+    values = await record_not_provided_async(db, order, len(service_ids))
+
+    event = _finished_event(
+        "order_not_provided", order, service_ids, await get_catalog_async(db), values
+    )
+    await db.commit()
+
+    _publish([event])
+
+    return {"status": "not_provided"}
 
-    db.commit()
 
-    return {"status": "not_provided"}
\ No newline at end of file
+async def in_progress_async(db: AsyncSession, employee_id: int):
+    rows = (await db.execute(in_progress_stmt(employee_id))).all()
+    return format_in_progress(rows, datetime.datetime.utcnow())
@@ -0,0 +1,269 @@
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import Employee, Order, OrderService, Service
+from services.clock import to_local, today_clause
+from services.rollup import totals_stmt as rollup_totals_stmt, today_totals_stmt
+from services.shards import fan_out_rows
+
+
+PAYMENT_FIELDS = {
+    "CASH": "cash",
+    "QR": "qr",
+    "TRANSFER": "transfer",
+}
+
+
+# ================= QUERIES =================
+
+def _paid_between(start_date, end_date, orders=Order.__table__):
+    # orders — таблица orders или orders_archive; даты — рабочие дни филиала
+    day = orders.c.business_date
+    return (
+        orders.c.status == "COMPLETED",
+        orders.c.payment_status == "PAID",
+        *((day == start_date,) if start_date == end_date else (day >= start_date, day <= end_date)),
+    )
+
+
+def _paid_today(branch_id: int = None):
+    # «Сегодня» — в поясе филиала заказа
+    return (
+        Order.status == "COMPLETED",
+        Order.payment_status == "PAID",
+        today_clause(Order.business_date, Order.branch_id, branch_id),
+    )
+
+
+def active_employees_stmt(branch_id: int = None):
+    stmt = (
+        select(Employee.id, Employee.name)
+        .where(Employee.is_active == True)
+        .order_by(Employee.id)
+    )
+
+    if branch_id is not None:
+        stmt = stmt.where(Employee.branch_id == branch_id)
+
+    return stmt
+
+
+def lines_stmt(branch_id: int = None):
+    stmt = (
+        select(
+            Employee.id,
+            Employee.name,
+            Order.client_name,
+            Order.payment_type,
+            Order.created_at,
+            Order.completed_at,
+            Service.name,
+            func.coalesce(OrderService.price, 0),
+            Order.branch_id,
+        )
+        .join(Employee, Employee.id == Order.employee_id)
+        .outerjoin(OrderService, OrderService.order_id == Order.id)
+        .outerjoin(Service, Service.id == OrderService.service_id)
+        .where(Employee.is_active == True, *_paid_today(branch_id))
+        .order_by(Employee.id, Order.id, OrderService.id)
+    )
+
+    if branch_id is not None:
+        stmt = stmt.where(Order.branch_id == branch_id)
+
+    return stmt
+
+
+# ================= AGGREGATION =================
+
+def _empty_totals():
+    return {
+        "services_count": 0,
+        "total": 0,
+        "cash": 0,
+        "qr": 0,
+        "transfer": 0,
+    }
+
+
+def build_report(employees, totals_rows):
+
+    by_employee = {}
+
+    for employee_id, payment_type, services_count, amount in totals_rows:
+        t = by_employee.setdefault(employee_id, _empty_totals())
+        t["services_count"] += services_count
+        t["total"] += amount
+
+        field = PAYMENT_FIELDS.get(payment_type)
+        if field:
+            t[field] += amount
+
+    rows = []
+    summary = {
+        "total_all": 0,
+        "cash_all": 0,
+        "qr_all": 0,
+        "transfer_all": 0,
+    }
+
+    for employee_id, name in employees:
+        t = by_employee.get(employee_id, _empty_totals())
+
+        summary["total_all"] += t["total"]
+        summary["cash_all"] += t["cash"]
+        summary["qr_all"] += t["qr"]
+        summary["transfer_all"] += t["transfer"]
+
+        rows.append({"employee_id": employee_id, "employee": name, **t})
+
+    return rows, summary
+
+
+def employee_report(db: Session, start_date, end_date, branch_id: int = None):
+    # Читаем готовые суммы из daily_employee_totals, а не сырые заказы.
+    # Сотрудники — из справочника, суммы — со всех шардов филиалов
+    employees = db.execute(active_employees_stmt(branch_id)).all()
+    totals_rows = fan_out_rows(
+        db, rollup_totals_stmt(start_date, end_date, branch_id), branch_id
+    )
+    return build_report(employees, totals_rows)
+
+
+async def employee_report_async(db: AsyncSession, start_date, end_date, branch_id: int = None):
+    employees = (await db.execute(active_employees_stmt(branch_id))).all()
+    totals_rows = (await db.execute(rollup_totals_stmt(start_date, end_date, branch_id))).all()
+    return build_report(employees, totals_rows)
+
+
+def today_report(db: Session, branch_id: int = None):
+    # Отчёт «за сегодня»: у каждого филиала день в его поясе
+    employees = db.execute(active_employees_stmt(branch_id)).all()
+    totals_rows = fan_out_rows(db, today_totals_stmt(branch_id), branch_id)
+    return build_report(employees, totals_rows)
+
+
+async def today_report_async(db: AsyncSession, branch_id: int = None):
+    employees = (await db.execute(active_employees_stmt(branch_id))).all()
+    totals_rows = (await db.execute(today_totals_stmt(branch_id))).all()
+    return build_report(employees, totals_rows)
+
+
+def today_payload(day, rows, summary):
+    return {
+        "date": str(day),
+        "employees": rows,
+        **summary
+    }
+
+
+def period_payload(start_date: str, end_date: str, rows, summary):
+    return {
+        "start": start_date,
+        "end": end_date,
+        "employees": [
+            {
+                "employee": r["employee"],
+                "services": r["services_count"],
+                "total": r["total"],
+                "cash": r["cash"],
+                "qr": r["qr"],
+                "transfer": r["transfer"]
+            }
+            for r in rows
+        ],
+        **summary
+    }
+
+
+# ================= TELEGRAM MESSAGE =================
+
+def render_detailed_report(lines):
+
+    parts = ["📊 Подробный отчёт за сегодня\n\n"]
+
+    total_all = 0
+    cash_all = 0
+    qr_all = 0
+    transfer_all = 0
+
+    def close_employee(name, t):
+        parts.append(
+            f"Итого по {name}:\n"
+            f"Услуг: {t['services_count']}\n"
+            f"Сумма: {t['total']} ₸\n"
+            f"Нал: {t['cash']} ₸\n"
+            f"QR: {t['qr']} ₸\n"
+            f"Перевод: {t['transfer']} ₸\n"
+        )
+        parts.append("\n━━━━━━━━━━━━━━\n\n")
+
+    current_id = None
+    current_name = None
+    t = None
+
+    for (employee_id, employee_name, client_name, payment_type,
+         created_at, completed_at, service_name, price, branch_id) in lines:
+
+        if employee_id != current_id:
+            if current_id is not None:
+                close_employee(current_name, t)
+
+            current_id = employee_id
+            current_name = employee_name
+            t = _empty_totals()
+            parts.append(f"👤 {employee_name}\n\n")
+
+        if service_name is None:
+            continue
+
+        start_time = to_local(created_at, branch_id)
+        end_time = to_local(completed_at, branch_id)
+        duration = int((completed_at - created_at).total_seconds() / 60)
+
+        t["total"] += price
+        t["services_count"] += 1
+        total_all += price
+
+        if payment_type == "CASH":
+            t["cash"] += price
+            cash_all += price
+        elif payment_type == "QR":
+            t["qr"] += price
+            qr_all += price
+        elif payment_type == "TRANSFER":
+            t["transfer"] += price
+            transfer_all += price
+
+        parts.append(
+            f"• {service_name}\n"
+            f"Клиент: {client_name}\n"
+            f"{start_time.strftime('%H:%M')} → {end_time.strftime('%H:%M')} ({duration} мин)\n"
+            f"Оплата: {payment_type}\n\n"
+        )
+
+    if current_id is not None:
+        close_employee(current_name, t)
+
+    parts.append(
+        f"💰 Общий итог:\n"
+        f"Сумма: {total_all} ₸\n"
+        f"Нал: {cash_all} ₸\n"
+        f"QR: {qr_all} ₸\n"
+        f"Перевод: {transfer_all} ₸"
+    )
+
+    return "".join(parts)
+
+
+def detailed_report_message(db: Session, branch_id: int = None):
+    lines = fan_out_rows(db, lines_stmt(branch_id), branch_id)
+    # Сотрудник целиком в одном шарде: стабильная сортировка по id
+    # склеивает шарды, не ломая порядок внутри сотрудника
+    lines.sort(key=lambda line: line[0])
+    return render_detailed_report(lines)
+
+
+async def detailed_report_message_async(db: AsyncSession, branch_id: int = None):
+    lines = (await db.execute(lines_stmt(branch_id))).all()
+    return render_detailed_report(lines)
@@ -0,0 +1,286 @@
+import sys
+from datetime import date
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import DailyEmployeeTotal, Order, OrderService
+from services.clock import business_date, today_clause
+
+
+NOT_PROVIDED = "NOT_PROVIDED"
+
+_KEY = ("business_date", "employee_id", "branch_id", "payment_type")
+_COUNTERS = ("orders_count", "services_count", "amount")
+
+
+# ================= UPSERT =================
+
+def _values(key: dict, orders_count: int, services_count: int, amount: int):
+    return {
+        **key,
+        "orders_count": orders_count,
+        "services_count": services_count,
+        "amount": amount,
+    }
+
+
+def _upsert_stmt(dialect: str, values: dict):
+    if dialect not in ("postgresql", "sqlite"):
+        return None
+
+    table = DailyEmployeeTotal.__table__
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert(table).values(**values)
+
+    return stmt.on_conflict_do_update(
+        index_elements=list(_KEY),
+        set_={c: table.c[c] + stmt.excluded[c] for c in _COUNTERS},
+    )
+
+
+def _increment_stmt(values: dict):
+    table = DailyEmployeeTotal.__table__
+    return (
+        table.update()
+        .where(*(table.c[k] == values[k] for k in _KEY))
+        .values({c: table.c[c] + values[c] for c in _COUNTERS})
+    )
+
+
+def _add(db: Session, values: dict):
+
+    stmt = _upsert_stmt(db.get_bind().dialect.name, values)
+
+    if stmt is not None:
+        db.execute(stmt)
+        return
+
+    # Прочие диалекты: UPDATE, а если строки нет — INSERT
+    if db.execute(_increment_stmt(values)).rowcount == 0:
+        db.execute(DailyEmployeeTotal.__table__.insert().values(**values))
+
+
+async def _add_async(db: AsyncSession, values: dict):
+
+    stmt = _upsert_stmt(db.get_bind().dialect.name, values)
+
+    if stmt is not None:
+        await db.execute(stmt)
+        return
+
+    if (await db.execute(_increment_stmt(values))).rowcount == 0:
+        await db.execute(DailyEmployeeTotal.__table__.insert().values(**values))
+
+
+def _services_count_stmt(order_id: int):
+    return select(func.count(OrderService.id)).where(
+        OrderService.order_id == order_id
+    )
+
+
+def _key(order: Order, payment_type: str):
+    return {
+        "business_date": order.business_date or business_date(order.completed_at, order.branch_id),
+        "employee_id": order.employee_id,
+        "branch_id": order.branch_id,
+        "payment_type": payment_type,
+    }
+
+
+# ================= ORDER EVENTS =================
+
+def record_completed(db: Session, order: Order, services_count=None):
+    # Вызывается до commit — попадает в ту же транзакцию, что и заказ
+    if services_count is None:
+        services_count = db.execute(_services_count_stmt(order.id)).scalar()
+
+    values = _values(
+        _key(order, order.payment_type), 1, services_count, order.total or 0
+    )
+    _add(db, values)
+    return values
+
+
+def record_not_provided(db: Session, order: Order, services_count=None):
+    if services_count is None:
+        services_count = db.execute(_services_count_stmt(order.id)).scalar()
+
+    values = _values(_key(order, NOT_PROVIDED), 1, services_count, 0)
+    _add(db, values)
+    return values
+
+
+async def record_completed_async(db: AsyncSession, order: Order, services_count=None):
+    if services_count is None:
+        services_count = (await db.execute(_services_count_stmt(order.id))).scalar()
+
+    values = _values(
+        _key(order, order.payment_type), 1, services_count, order.total or 0
+    )
+    await _add_async(db, values)
+    return values
+
+
+async def record_not_provided_async(db: AsyncSession, order: Order, services_count=None):
+    if services_count is None:
+        services_count = (await db.execute(_services_count_stmt(order.id))).scalar()
+
+    values = _values(_key(order, NOT_PROVIDED), 1, services_count, 0)
+    await _add_async(db, values)
+    return values
+
+
+def clear_paid(db: Session, day: date, branch_ids=None):
+    # Сброс дня: оплаченные заказы ушли в ARCHIVED
+    stmt = delete(DailyEmployeeTotal).where(
+        DailyEmployeeTotal.business_date == day,
+        DailyEmployeeTotal.payment_type != NOT_PROVIDED,
+    )
+
+    if branch_ids is not None:
+        stmt = stmt.where(DailyEmployeeTotal.branch_id.in_(branch_ids))
+
+    db.execute(stmt)
+
+
+# ================= READ =================
+
+def _totals_stmt(day_filter, branch_id: int = None):
+    t = DailyEmployeeTotal
+    stmt = (
+        select(
+            t.employee_id,
+            t.payment_type,
+            func.sum(t.services_count),
+            func.sum(t.amount),
+        )
+        .where(*day_filter, t.payment_type != NOT_PROVIDED)
+        .group_by(t.employee_id, t.payment_type)
+    )
+
+    if branch_id is not None:
+        stmt = stmt.where(t.branch_id == branch_id)
+
+    return stmt
+
+
+def totals_stmt(start_date: date, end_date: date, branch_id: int = None):
+    t = DailyEmployeeTotal
+    return _totals_stmt((t.business_date >= start_date, t.business_date <= end_date), branch_id)
+
+
+def today_totals_stmt(branch_id: int = None):
+    t = DailyEmployeeTotal
+    return _totals_stmt((today_clause(t.business_date, t.branch_id, branch_id),), branch_id)
+
+
+def employee_day_stmt(employee_id: int, day: date):
+    t = DailyEmployeeTotal
+    return select(
+        func.coalesce(func.sum(t.services_count), 0),
+        func.coalesce(func.sum(t.amount), 0),
+    ).where(
+        t.employee_id == employee_id,
+        t.business_date == day,
+        t.payment_type != NOT_PROVIDED,
+    )
+
+
+# ================= REBUILD =================
+
+def _orders_stmt(orders, lines, start_date: date = None, end_date: date = None):
+    stmt = (
+        select(
+            orders.c.business_date,
+            orders.c.employee_id,
+            orders.c.branch_id,
+            orders.c.status,
+            orders.c.payment_type,
+            orders.c.total,
+            func.count(lines.c.id),
+        )
+        .outerjoin(lines, lines.c.order_id == orders.c.id)
+        .where(
+            orders.c.completed_at != None,
+            (orders.c.status == "NOT_PROVIDED")
+            | ((orders.c.status == "COMPLETED") & (orders.c.payment_status == "PAID")),
+        )
+        .group_by(orders.c.id)
+    )
+
+    if start_date:
+        stmt = stmt.where(orders.c.business_date >= start_date)
+    if end_date:
+        stmt = stmt.where(orders.c.business_date <= end_date)
+
+    return stmt.execution_options(yield_per=1000)
+
+
+def rebuild(
+    db: Session,
+    start_date: date = None,
+    end_date: date = None,
+    include_archive: bool = True
+):
+    from services.archive import sources
+
+    table = DailyEmployeeTotal.__table__
+
+    wipe = delete(table)
+
+    if start_date:
+        wipe = wipe.where(table.c.business_date >= start_date)
+    if end_date:
+        wipe = wipe.where(table.c.business_date <= end_date)
+
+    totals = {}
+
+    # Старые периоды — и из архива, и из горячих таблиц
+    for orders, lines in sources(start_date, include_archive):
+        for day, employee_id, branch_id, status, payment_type, total, count in (
+            db.execute(_orders_stmt(orders, lines, start_date, end_date))
+        ):
+            if status == "NOT_PROVIDED":
+                payment_type = NOT_PROVIDED
+                total = 0
+
+            # Ключ — сохранённый рабочий день заказа: по нему же и фильтруем
+            key = (day, employee_id, branch_id, payment_type)
+            t = totals.setdefault(key, [0, 0, 0])
+            t[0] += 1
+            t[1] += count
+            t[2] += total or 0
+
+    db.execute(wipe)
+
+    if totals:
+        db.execute(
+            table.insert(),
+            [_values(dict(zip(_KEY, key)), *t) for key, t in totals.items()],
+        )
+
+    return len(totals)
+
+
+if __name__ == "__main__":
+    # python -m services.rollup rebuild [YYYY-MM-DD] [YYYY-MM-DD]
+    from database import SessionLocal
+
+    args = sys.argv[1:]
+
+    if not args or args[0] != "rebuild":
+        print("usage: python -m services.rollup rebuild [start_date] [end_date]")
+        sys.exit(1)
+
+    start = date.fromisoformat(args[1]) if len(args) > 1 else None
+    end = date.fromisoformat(args[2]) if len(args) > 2 else start
+
+    db = SessionLocal()
+    try:
+        rows = rebuild(db, start, end)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"daily_employee_totals rebuilt: {rows} rows")
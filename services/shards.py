@@ -0,0 +1,294 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from database import SessionLocal, build_engine, get_engine
+from models import Employee, Service
+
+
+# ================= BRANCH SHARDS =================
+
+# Филиалы можно разнести по отдельным базам (локально — отдельные SQLite-файлы):
+#
+#   BRANCH_SHARDS="2,3=sqlite:///branch_2_3.db;4=sqlite:///branch_4.db"
+#
+# Филиалы без записи живут в основной базе (DATABASE_URL). Основная база —
+# справочник: employees и services пишутся туда и копируются в шарды целиком
+# (sync_reference), поэтому в каждом шарде работают те же запросы с JOIN.
+# Заказы, смены, rollup, архив и outbox — в базе филиала.
+#
+# Схема шардов: python -m services.shards migrate
+
+DEFAULT = "default"
+
+
+def parse_shards(value: str) -> dict:
+    # "2,3=url;4=url" -> {2: url, 3: url, 4: url}
+    branches = {}
+
+    for entry in filter(None, (part.strip() for part in value.split(";"))):
+        ids, sep, url = entry.partition("=")
+        if not sep or not url.strip():
+            raise ValueError(f"Invalid BRANCH_SHARDS entry: {entry!r}")
+
+        for branch_id in ids.split(","):
+            branches[int(branch_id)] = url.strip()
+
+    return branches
+
+
+class BranchRouter:
+    # Филиал -> шард. Для другой схемы размещения достаточно переопределить
+    # shard_for/shards и подставить свой роутер через set_router
+
+    def __init__(self, branches: dict = None):
+        self.branches = dict(branches or {})
+        self._factories = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sharded(self) -> bool:
+        return bool(self.branches)
+
+    def shard_for(self, branch_id) -> str:
+        return self.branches.get(branch_id, DEFAULT)
+
+    def shards(self) -> list:
+        return [DEFAULT] + sorted(set(self.branches.values()) - {DEFAULT})
+
+    def session_factory(self, shard):
+        if shard == DEFAULT:
+            return SessionLocal
+
+        with self._lock:
+            if shard not in self._factories:
+                self._factories[shard] = sessionmaker(
+                    bind=build_engine(shard),
+                    autocommit=False,
+                    autoflush=False
+                )
+            return self._factories[shard]
+
+    def engine(self, shard):
+        if shard == DEFAULT:
+            return get_engine()
+        return self.session_factory(shard).kw["bind"]
+
+    def label(self, shard) -> str:
+        # Для логов и ответов — без пароля
+        if shard == DEFAULT:
+            return DEFAULT
+        return make_url(shard).render_as_string(hide_password=True)
+
+    def fan_out(self, fn, branch_id: int = None):
+        # fn(session) на каждом шарде (или только на шарде филиала) параллельно
+        shards = [self.shard_for(branch_id)] if branch_id is not None else self.shards()
+
+        def run(shard):
+            db = self.session_factory(shard)()
+            try:
+                return fn(db)
+            finally:
+                db.close()
+
+        if len(shards) == 1:
+            return [run(shards[0])]
+
+        with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shard") as pool:
+            return list(pool.map(run, shards))
+
+
+_router = BranchRouter(parse_shards(os.getenv("BRANCH_SHARDS", "")))
+
+
+def get_router() -> BranchRouter:
+    return _router
+
+
+def set_router(router: BranchRouter):
+    global _router
+    _router = router
+
+
+# ================= EMPLOYEE -> BRANCH =================
+
+# Филиал сотрудника не меняется через API; кэш сбрасывается вместе с PIN-кэшем
+_employee_branches = {}
+_employee_branches_lock = threading.Lock()
+
+
+def employee_branch(employee_id: int):
+    with _employee_branches_lock:
+        if employee_id in _employee_branches:
+            return _employee_branches[employee_id]
+
+    db = SessionLocal()
+    try:
+        branch_id = db.execute(
+            select(Employee.branch_id).where(Employee.id == employee_id)
+        ).scalar()
+    finally:
+        db.close()
+
+    if branch_id is not None:
+        with _employee_branches_lock:
+            _employee_branches[employee_id] = branch_id
+
+    return branch_id
+
+
+async def employee_branch_async(db, employee_id: int):
+    # Для async-слоя: справочник в основной базе, запрос — через его сессию
+    with _employee_branches_lock:
+        if employee_id in _employee_branches:
+            return _employee_branches[employee_id]
+
+    branch_id = (await db.execute(
+        select(Employee.branch_id).where(Employee.id == employee_id)
+    )).scalar()
+
+    if branch_id is not None:
+        with _employee_branches_lock:
+            _employee_branches[employee_id] = branch_id
+
+    return branch_id
+
+
+def invalidate_branches():
+    with _employee_branches_lock:
+        _employee_branches.clear()
+
+
+@contextmanager
+def employee_session(employee_id: int = None):
+    # Сессия базы филиала сотрудника; без шардов — основная база без запросов
+    router = get_router()
+
+    branch_id = None
+    if router.sharded and employee_id is not None:
+        branch_id = employee_branch(employee_id)
+
+    db = router.session_factory(router.shard_for(branch_id))()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_employee_db(employee_id: int):
+    # FastAPI-зависимость для эндпоинтов с ?employee_id=
+    with employee_session(employee_id) as db:
+        yield db
+
+
+# ================= FAN-OUT =================
+
+def fan_out_rows(db: Session, stmt, branch_id: int = None):
+    # Строки запроса со всех нужных шардов; без шардов — просто db.execute
+    router = get_router()
+
+    if not router.sharded:
+        return db.execute(stmt).all()
+
+    return [
+        row
+        for rows in router.fan_out(lambda shard_db: shard_db.execute(stmt).all(), branch_id)
+        for row in rows
+    ]
+
+
+# ================= REFERENCE DATA =================
+
+REFERENCE = (Employee, Service)
+
+
+# PIN проверяется только в основной базе и в шарды не копируется. Колонка
+# там тоже NOT NULL и UNIQUE — в копию кладём хэш
+SKIP_COLUMNS = {Employee: {"pin"}}
+
+
+def _reference_rows(db: Session):
+    rows = {}
+
+    for model in REFERENCE:
+        skip = SKIP_COLUMNS.get(model, set())
+        columns = [c for c in model.__table__.columns if c.name not in skip]
+        rows[model] = [dict(row._mapping) for row in db.execute(select(*columns))]
+
+    for row in rows[Employee]:
+        row["pin"] = row["pin_hash"] or f"id:{row['id']}"
+
+    return rows
+
+
+def sync_reference(router: BranchRouter = None):
+    # Копия справочника в каждый шард: upsert по id, удалённые — удаляем,
+    # если на них уже не ссылаются заказы филиала
+    router = router or get_router()
+
+    if not router.sharded:
+        return 0
+
+    db = SessionLocal()
+    try:
+        source = _reference_rows(db)
+    finally:
+        db.close()
+
+    for shard in router.shards()[1:]:
+        shard_db = router.session_factory(shard)()
+        try:
+            for model in REFERENCE:
+                rows = source[model]
+                for row in rows:
+                    shard_db.merge(model(**row))
+
+                keep = {row["id"] for row in rows}
+                stale = [i for (i,) in shard_db.query(model.id) if i not in keep]
+
+                for obj_id in stale:
+                    try:
+                        with shard_db.begin_nested():
+                            shard_db.query(model).filter(model.id == obj_id).delete()
+                    except IntegrityError:
+                        pass
+
+            shard_db.commit()
+        finally:
+            shard_db.close()
+
+    return len(router.shards()) - 1
+
+
+# ================= CLI =================
+
+def migrate(router: BranchRouter = None):
+    from migrations import upgrade
+
+    router = router or get_router()
+
+    for shard in router.shards():
+        upgrade(router.engine(shard))
+
+    sync_reference(router)
+
+
+if __name__ == "__main__":
+    # python -m services.shards migrate | list
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+
+    if command == "migrate":
+        migrate()
+    elif command == "list":
+        router = get_router()
+        for shard in router.shards():
+            branches = sorted(b for b, s in router.branches.items() if s == shard)
+            print(f"{router.label(shard)}: {branches or 'all other branches'}")
+    else:
+        print("usage: python -m services.shards migrate|list")
+        sys.exit(1)
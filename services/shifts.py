@@ -1,53 +1,181 @@
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from models import Shift, Order
+from models import Shift, Order, Employee, OrderService, Service
 from datetime import datetime
 
 
-def close_shift(db: Session, employee_id: int):
+# ================= QUERIES =================
+
+def active_shift_stmt(employee_id: int):
+    return (
+        select(Shift, Employee.name)
+        .join(Employee, Employee.id == Shift.employee_id)
+        .where(Shift.employee_id == employee_id, Shift.is_active == True)
+    )
+
+
+def shift_lines_stmt(employee_id: int, started_at: datetime, ended_at: datetime):
+    # Оплаченные и неоказанные заказы смены со строками — одним запросом
+    return (
+        select(
+            Order.id,
+            Order.status,
+            Order.payment_type,
+            Order.client_name,
+            OrderService.id,
+            Service.name,
+            func.coalesce(OrderService.price, 0),
+        )
+        .outerjoin(OrderService, OrderService.order_id == Order.id)
+        .outerjoin(Service, Service.id == OrderService.service_id)
+        .where(
+            Order.employee_id == employee_id,
+            or_(
+                and_(Order.status == "COMPLETED", Order.payment_status == "PAID"),
+                Order.status == "NOT_PROVIDED"
+            ),
+            Order.completed_at >= started_at,
+            Order.completed_at <= ended_at
+        )
+        .order_by(Order.id, OrderService.id)
+    )
+
+
+# ================= SUMMARY =================
+
+PAYMENT_FIELDS = {
+    "CASH": "cash",
+    "QR": "qr",
+    "TRANSFER": "transfer",
+}
+
+
+def summarize(lines):
+
+    orders = {}
+    not_provided = set()
+
+    for order_id, status, payment_type, client_name, line_id, service_name, price in lines:
+
+        if status == "NOT_PROVIDED":
+            not_provided.add(order_id)
+            continue
 
-    # Ищем активную смену
-    shift = db.query(Shift).filter(
-        Shift.employee_id == employee_id,
-        Shift.is_active == True
-    ).first()
+        order = orders.setdefault(order_id, {
+            "order_id": order_id,
+            "services": [],
+            "client_name": client_name,
+            "payment_type": payment_type,
+            "services_count": 0,
+            "total": 0
+        })
+
+        if line_id is None:
+            continue
+
+        order["services_count"] += 1
+        order["total"] += price
+
+        if service_name:
+            order["services"].append(service_name)
+
+    # Заказы без строк (старые данные) в итог не попадают
+    paid = [o for o in orders.values() if o["services_count"]]
+
+    summary = {
+        "orders": paid,
+        "orders_count": len(paid),
+        "services_count": sum(o["services_count"] for o in paid),
+        "total": sum(o["total"] for o in paid),
+        "cash": 0,
+        "qr": 0,
+        "transfer": 0,
+        "not_provided": len(not_provided)
+    }
+
+    for o in paid:
+        field = PAYMENT_FIELDS.get(o["payment_type"])
+        if field:
+            summary[field] += o["total"]
+
+    return summary
+
+
+def close_shift(db: Session, employee_id: int):
+    # Закрывает смену и считает итоги; commit — за вызывающим,
+    # чтобы уведомление ушло в той же транзакции
+    row = db.execute(active_shift_stmt(employee_id)).first()
 
-    if not shift:
+    if not row:
         return None
 
-    # Закрываем смену
+    shift, employee_name = row
+
     shift.is_active = False
     shift.ended_at = datetime.utcnow()
-    db.commit()
-
-    # Получаем все завершённые заказы за эту смену
-    orders = db.query(Order).filter(
-        Order.employee_id == employee_id,
-        Order.status == "COMPLETED",
-        Order.payment_status == "PAID",
-        Order.completed_at != None,
-        Order.completed_at >= shift.started_at,
-        Order.completed_at <= shift.ended_at
-    ).all()
 
-    # Неоказанные
-    not_provided = db.query(Order).filter(
-        Order.employee_id == employee_id,
-        Order.status == "NOT_PROVIDED",
-        Order.completed_at != None,
-        Order.completed_at >= shift.started_at,
-        Order.completed_at <= shift.ended_at
+    lines = db.execute(
+        shift_lines_stmt(employee_id, shift.started_at, shift.ended_at)
     ).all()
 
-    total = sum(o.service.price for o in orders if o.service)
-    cash = sum(o.service.price for o in orders if o.payment_type == "CASH" and o.service)
-    qr = sum(o.service.price for o in orders if o.payment_type == "QR" and o.service)
+    return _shift_summary(shift, employee_name, lines)
+
+
+async def close_shift_async(db: AsyncSession, employee_id: int):
+    row = (await db.execute(active_shift_stmt(employee_id))).first()
+
+    if not row:
+        return None
+
+    shift, employee_name = row
+
+    shift.is_active = False
+    shift.ended_at = datetime.utcnow()
+
+    lines = (await db.execute(
+        shift_lines_stmt(employee_id, shift.started_at, shift.ended_at)
+    )).all()
 
+    return _shift_summary(shift, employee_name, lines)
+
+
+def _shift_summary(shift, employee_name, lines):
     return {
-        "employee": shift.employee.name,
         "shift_id": shift.id,
-        "total_orders": len(orders),
-        "total_amount": total,
-        "cash": cash,
-        "qr": qr,
-        "not_provided": len(not_provided)
-    }
\ No newline at end of file
+        "employee_id": shift.employee_id,
+        "employee": employee_name,
+        "started_at": shift.started_at,
+        "ended_at": shift.ended_at,
+        **summarize(lines)
+    }
+
+
+# ================= MESSAGE =================
+
+def render_shift_message(summary):
+
+    parts = [
+        "📊 Смена закрыта\n\n",
+        f"👤 Сотрудник: {summary['employee']}\n\n",
+        "━━━━━━━━━━━━━━\n\n",
+    ]
+
+    for i, o in enumerate(summary["orders"], 1):
+        parts.append(
+            f"{i}. {', '.join(o['services'])}\n"
+            f"Клиент: {o['client_name']}\n"
+            f"Оплата: {o['payment_type']}\n\n"
+        )
+
+    parts.append("━━━━━━━━━━━━━━\n")
+    parts.append(f"Услуг: {summary['services_count']}\n")
+    parts.append(f"💰 Сумма: {summary['total']} ₸\n")
+    parts.append(f"Нал: {summary['cash']} ₸\n")
+    parts.append(f"QR: {summary['qr']} ₸\n")
+    parts.append(f"Перевод: {summary['transfer']} ₸")
+
+    if summary["not_provided"]:
+        parts.append(f"\n❌ Не оказано: {summary['not_provided']}")
+
+    return "".join(parts)
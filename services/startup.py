@@ -0,0 +1,81 @@
+import logging
+import os
+import time
+from sqlalchemy import text
+from database import SessionLocal
+from services.catalog import get_catalog
+
+log = logging.getLogger(__name__)
+
+
+# ================= WARM-UP =================
+
+# Выполняется в lifespan в фоне: воркер принимает запросы сразу,
+# /ready отвечает 503, пока прогрев не закончился.
+#
+# WARMUP=0 — без прогрева
+# WARMUP_CONNECTIONS=2 — сколько соединений открыть заранее (не больше пула)
+
+WARMUP = os.getenv("WARMUP", "1") == "1"
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "2"))
+
+
+def _pool_capacity(engine):
+    size = getattr(engine.pool, "size", None)
+    return size() if callable(size) else 1
+
+
+def warm_pool(engine, connections=WARMUP_CONNECTIONS):
+    # Держим все соединения одновременно — иначе пул отдаст одно и то же
+    opened = []
+
+    try:
+        for _ in range(min(connections, _pool_capacity(engine))):
+            conn = engine.connect()
+            opened.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            conn.close()
+
+    return len(opened)
+
+
+def warm_caches():
+    db = SessionLocal()
+    try:
+        return len(get_catalog(db).services)
+    finally:
+        db.close()
+
+
+def warm_up(engine):
+    # Ошибка БД на старте не роняет воркер — только пишем в лог,
+    # готовность дальше проверяет /ready
+    started = time.perf_counter()
+
+    try:
+        connections = warm_pool(engine)
+        services = warm_caches()
+    except Exception:
+        log.exception("warmup_failed")
+        return False
+
+    log.info("warmup_done", extra={
+        "connections": connections,
+        "services": services,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+    return True
+
+
+# ================= READINESS =================
+
+def ping(engine):
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        log.warning("db_ping_failed", exc_info=True)
+        return False
@@ -0,0 +1,168 @@
+import datetime
+import json
+import logging
+import os
+from sqlalchemy import select, delete, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from models import Order, SyncOperation
+from schemas import OrderStart
+from services.orders import apply_start, apply_complete, apply_not_provided, _publish
+
+log = logging.getLogger(__name__)
+
+# ================= OFFLINE SYNC =================
+
+# Киоск копит start/complete/not_provided в IndexedDB (frontend/offline.js)
+# и отправляет очередь в POST /sync. Вся пачка — одна транзакция, операции
+# применяются по порядку. op_id — ключ идемпотентности: ответ сохраняется в
+# sync_operations, повтор пачки после обрыва получает его же, без дублей.
+# Ошибка проверки (смена закрыта, заказ уже завершён) — тоже ответ: операция
+# считается доставленной и из очереди уходит. Ошибка базы на одной операции
+# откатывает только её (SAVEPOINT) и тоже сохраняется ответом: иначе 500 на
+# всю пачку, и киоск повторял бы её бесконечно.
+
+# Время с киоска принимаем не старше этого (часы киоска могут врать)
+MAX_CLIENT_AGE = datetime.timedelta(hours=int(os.getenv("SYNC_MAX_AGE_HOURS", "24")))
+
+# Ответы хранятся дольше, чем киоск может держать операцию в очереди
+KEEP_DAYS = int(os.getenv("SYNC_KEEP_DAYS", "30"))
+
+
+def client_time(at, now):
+    # мс с эпохи -> naive UTC; без времени или вне окна — время сервера
+    if at is None:
+        return None
+
+    try:
+        value = datetime.datetime.utcfromtimestamp(at / 1000)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+    if value > now or value < now - MAX_CLIENT_AGE:
+        return None
+
+    return value
+
+
+def _applied(db: Session, op_ids):
+    rows = db.execute(
+        select(SyncOperation.op_id, SyncOperation.result)
+        .where(SyncOperation.op_id.in_(op_ids))
+    ).all()
+    return {op_id: json.loads(result) for op_id, result in rows}
+
+
+def _load_orders(db: Session, operations):
+    # Все заказы, на которые ссылается пачка, одним запросом: дальше
+    # apply_complete берёт их из сессии. client_id -> id для ссылок из очереди
+    order_ids = {op.order_id for op in operations if op.order_id}
+    client_ids = {
+        cid
+        for op in operations
+        for cid in (op.client_id, op.order_client_id)
+        if cid
+    }
+
+    if not order_ids and not client_ids:
+        return {}
+
+    orders = db.execute(
+        select(Order).where(or_(
+            Order.id.in_(order_ids),
+            Order.client_id.in_(client_ids)
+        ))
+    ).scalars().all()
+
+    return {order.client_id: order.id for order in orders if order.client_id}
+
+
+def _apply(db: Session, employee_id: int, op, by_client_id: dict, at):
+
+    if op.type == "start":
+        # Тот же client_id под другим op_id — заказ уже создан
+        if op.client_id and op.client_id in by_client_id:
+            return {"order_id": by_client_id[op.client_id]}, []
+
+        data = OrderStart(
+            employee_id=employee_id,
+            service_ids=op.service_ids,
+            client_name=op.client_name or "",
+            client_phone=op.client_phone or "",
+            client_id=op.client_id,
+        )
+        output, events = apply_start(db, [data], at)
+        result = output[0]
+
+        if op.client_id and "order_id" in result:
+            by_client_id[op.client_id] = result["order_id"]
+
+        return result, events
+
+    order_id = op.order_id or by_client_id.get(op.order_client_id)
+
+    if order_id is None:
+        return {"error": "Invalid order"}, []
+
+    if op.type == "complete":
+        return apply_complete(db, order_id, op.payment_type, at, employee_id)
+
+    return apply_not_provided(db, order_id, op.reason or "", at, employee_id)
+
+
+def apply_operations(db: Session, employee_id: int, operations):
+    now = datetime.datetime.utcnow()
+
+    done = _applied(db, [op.op_id for op in operations])
+    by_client_id = _load_orders(db, operations)
+
+    results = []
+    events = []
+
+    for op in operations:
+        if op.op_id in done:
+            results.append({"op_id": op.op_id, "duplicate": True, **done[op.op_id]})
+            continue
+
+        known = op.client_id in by_client_id
+
+        try:
+            with db.begin_nested():
+                result, op_events = _apply(
+                    db, employee_id, op, by_client_id, client_time(op.at, now)
+                )
+        except SQLAlchemyError:
+            log.exception("sync_operation_failed", extra={"op_id": op.op_id})
+            # Заказ откатился вместе с точкой сохранения
+            if not known:
+                by_client_id.pop(op.client_id, None)
+            result, op_events = {"error": "Operation failed"}, []
+
+        events.extend(op_events)
+
+        db.add(SyncOperation(
+            op_id=op.op_id,
+            employee_id=employee_id,
+            type=op.type,
+            result=json.dumps(result, ensure_ascii=False)
+        ))
+        done[op.op_id] = result
+
+        results.append({"op_id": op.op_id, **result})
+
+    db.commit()
+
+    _publish(events)
+
+    return results
+
+
+def purge_operations(db: Session, keep_days: int = KEEP_DAYS):
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=keep_days)
+
+    result = db.execute(
+        delete(SyncOperation).where(SyncOperation.created_at < cutoff)
+    )
+    db.commit()
+
+    return result.rowcount
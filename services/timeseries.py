@@ -0,0 +1,261 @@
+from datetime import date, timedelta
+from sqlalchemy import select, func, cast, union_all, literal_column, null, Date, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import DailyEmployeeTotal, Employee
+from services.archive import sources
+from services.catalog import get_catalog, get_catalog_async
+from services.reports import PAYMENT_FIELDS, _paid_between
+from services.rollup import NOT_PROVIDED
+from services.shards import fan_out_rows
+
+
+BUCKETS = ("day", "week", "month")
+GROUPS = ("employee", "service")
+
+
+# ================= DATE BUCKETS =================
+
+# Начало периода (день / понедельник недели / 1-е число) для колонки DATE.
+# Для других диалектов SQL группирует по дням, а в недели и месяцы их
+# сворачивает bucket_start в Python.
+# Константы — литералами: Postgres не считает date_trunc($1, x) в SELECT
+# и date_trunc($2, x) в GROUP BY одним выражением
+
+def _const(value: str):
+    return literal_column(f"'{value}'")
+
+
+def bucket_expr(column, bucket: str, dialect: str):
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+
+    if bucket == "day":
+        return column
+
+    if dialect == "postgresql":
+        return cast(func.date_trunc(_const(bucket), cast(column, DateTime)), Date)
+
+    if dialect == "sqlite":
+        if bucket == "week":
+            return func.date(column, _const("-6 days"), _const("weekday 1"))
+        return func.strftime(_const("%Y-%m-01"), column)
+
+    return column
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def periods(start_date: date, end_date: date, bucket: str):
+    # Все периоды диапазона — ось графика, включая пустые
+    result = []
+    current = bucket_start(start_date, bucket)
+
+    while current <= end_date:
+        result.append(current)
+        if bucket == "month":
+            current = (current + timedelta(days=32)).replace(day=1)
+        else:
+            current += timedelta(days=7 if bucket == "week" else 1)
+
+    return result
+
+
+def _as_date(value) -> date:
+    # SQLite отдаёт строку "YYYY-MM-DD", Postgres — date
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def parse_params(start_date: str, end_date: str, bucket: str, group_by: str = None):
+    try:
+        start = date.fromisoformat(start_date[:10])
+        end = date.fromisoformat(end_date[:10])
+    except ValueError:
+        raise ValueError("Invalid dates")
+
+    if start > end:
+        raise ValueError("Invalid dates")
+    if bucket not in BUCKETS:
+        raise ValueError("Unknown bucket")
+    if group_by is not None and group_by not in GROUPS:
+        raise ValueError("Unknown group_by")
+
+    return start, end
+
+
+# ================= QUERIES =================
+
+def totals_series_stmt(dialect, start_date, end_date, bucket, group_by=None, branch_id=None):
+    # Без разбивки и по сотрудникам — из daily_employee_totals
+    t = DailyEmployeeTotal
+    period = bucket_expr(t.business_date, bucket, dialect).label("period")
+    group = t.employee_id if group_by == "employee" else null()
+
+    stmt = (
+        select(
+            period,
+            group,
+            t.payment_type,
+            func.sum(t.orders_count),
+            func.sum(t.services_count),
+            func.sum(t.amount),
+        )
+        .where(
+            t.business_date >= start_date,
+            t.business_date <= end_date,
+            t.payment_type != NOT_PROVIDED,
+        )
+        .group_by(period, t.payment_type)
+    )
+
+    if group_by == "employee":
+        stmt = stmt.group_by(t.employee_id)
+    if branch_id is not None:
+        stmt = stmt.where(t.branch_id == branch_id)
+
+    return stmt
+
+
+def _service_lines_stmt(orders, lines, dialect, start_date, end_date, bucket, branch_id=None):
+    period = bucket_expr(orders.c.business_date, bucket, dialect).label("period")
+
+    stmt = (
+        select(
+            period,
+            lines.c.service_id,
+            orders.c.payment_type,
+            func.count(func.distinct(orders.c.id)),
+            func.count(lines.c.id),
+            func.coalesce(func.sum(lines.c.price), 0),
+        )
+        .join(lines, lines.c.order_id == orders.c.id)
+        .where(*_paid_between(start_date, end_date, orders))
+        .group_by(period, lines.c.service_id, orders.c.payment_type)
+    )
+
+    if branch_id is not None:
+        stmt = stmt.where(orders.c.branch_id == branch_id)
+
+    return stmt
+
+
+def service_series_stmt(dialect, start_date, end_date, bucket, branch_id=None):
+    # По услугам rollup не подходит — строки заказов; старые периоды
+    # и из архива, одним запросом через UNION ALL
+    stmts = [
+        _service_lines_stmt(orders, lines, dialect, start_date, end_date, bucket, branch_id)
+        for orders, lines in sources(start_date)
+    ]
+    return stmts[0] if len(stmts) == 1 else union_all(*stmts)
+
+
+def series_stmt(dialect, start_date, end_date, bucket, group_by=None, branch_id=None):
+    if group_by == "service":
+        return service_series_stmt(dialect, start_date, end_date, bucket, branch_id)
+    return totals_series_stmt(dialect, start_date, end_date, bucket, group_by, branch_id)
+
+
+# ================= AGGREGATION =================
+
+def _empty_point():
+    return {
+        "orders": 0,
+        "services": 0,
+        "total": 0,
+        "cash": 0,
+        "qr": 0,
+        "transfer": 0,
+    }
+
+
+def build_series(rows, bucket, names=None):
+    # Строки (период, группа, тип оплаты, заказы, услуги, сумма) -> точки.
+    # Шарды и архив дают повторяющиеся ключи — суммируем
+    points = {}
+
+    for period, group, payment_type, orders_count, services_count, amount in rows:
+        key = (bucket_start(_as_date(period), bucket), group)
+        p = points.setdefault(key, _empty_point())
+
+        p["orders"] += orders_count or 0
+        p["services"] += services_count or 0
+        p["total"] += amount or 0
+
+        field = PAYMENT_FIELDS.get(payment_type)
+        if field:
+            p[field] += amount or 0
+
+    series = []
+    for (period, group), p in sorted(points.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        point = {"period": str(period), **p}
+        if names is not None:
+            point["id"] = group
+            point["name"] = names.get(group, "")
+        series.append(point)
+
+    return series
+
+
+def timeseries_payload(start_date, end_date, bucket, group_by, series):
+    return {
+        "start": str(start_date),
+        "end": str(end_date),
+        "bucket": bucket,
+        "group_by": group_by,
+        "periods": [str(p) for p in periods(start_date, end_date, bucket)],
+        "series": series,
+        "total_all": sum(p["total"] for p in series),
+        "cash_all": sum(p["cash"] for p in series),
+        "qr_all": sum(p["qr"] for p in series),
+        "transfer_all": sum(p["transfer"] for p in series),
+    }
+
+
+def _employee_names_stmt(employee_ids):
+    return select(Employee.id, Employee.name).where(Employee.id.in_(employee_ids))
+
+
+def _group_ids(rows):
+    return {row[1] for row in rows if row[1] is not None}
+
+
+def timeseries(db: Session, start_date, end_date, bucket="day", group_by=None, branch_id=None):
+    dialect = db.get_bind().dialect.name
+
+    rows = fan_out_rows(
+        db, series_stmt(dialect, start_date, end_date, bucket, group_by, branch_id), branch_id
+    )
+
+    names = None
+    if group_by == "employee":
+        ids = _group_ids(rows)
+        names = dict(db.execute(_employee_names_stmt(ids)).all()) if ids else {}
+    elif group_by == "service":
+        names = get_catalog(db).names
+
+    series = build_series(rows, bucket, names)
+    return timeseries_payload(start_date, end_date, bucket, group_by, series)
+
+
+async def timeseries_async(db: AsyncSession, start_date, end_date, bucket="day", group_by=None, branch_id=None):
+    dialect = db.get_bind().dialect.name
+
+    rows = (await db.execute(
+        series_stmt(dialect, start_date, end_date, bucket, group_by, branch_id)
+    )).all()
+
+    names = None
+    if group_by == "employee":
+        ids = _group_ids(rows)
+        names = dict((await db.execute(_employee_names_stmt(ids))).all()) if ids else {}
+    elif group_by == "service":
+        names = (await get_catalog_async(db)).names
+
+    series = build_series(rows, bucket, names)
+    return timeseries_payload(start_date, end_date, bucket, group_by, series)
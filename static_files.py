@@ -0,0 +1,84 @@
+import os
+import re
+from mimetypes import guess_type
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+
+# ================= STATIC FILES =================
+
+# StaticFiles для собранного фронтенда (build_frontend.py):
+# - app.js.br / app.js.gz рядом с файлом отдаются, если клиент их принимает;
+# - app.<hash>.js — Cache-Control immutable на год (новое содержимое = новое имя);
+# - всё остальное (HTML, несобранные исходники) — no-cache: каждый раз
+#   revalidate по ETag, в ответ обычно 304 без тела.
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_HASHED = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+
+
+def accepted_encodings(header: str) -> set:
+    # "gzip, deflate, br;q=0.9" -> {"gzip", "deflate", "br"}; q=0 — отказ
+    accepted = set()
+
+    for part in header.split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        if name and quality > 0:
+            accepted.add(name.lower())
+
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+
+    def cache_control(self, full_path) -> str:
+        return IMMUTABLE if _HASHED.search(os.path.basename(full_path)) else REVALIDATE
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+
+        path, encoding = full_path, None
+
+        for name, suffix in ENCODINGS:
+            if name not in accepted:
+                continue
+            try:
+                stat_result = os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+            path, encoding = f"{full_path}{suffix}", name
+            break
+
+        # Тип — по исходному имени, длина и ETag — по отдаваемому файлу
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            stat_result=stat_result,
+            media_type=guess_type(str(full_path))[0] or "text/plain",
+        )
+
+        if encoding:
+            response.headers["content-encoding"] = encoding
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = self.cache_control(full_path)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        return response
@@ -1,35 +1,245 @@
+import logging
 import os
-import requests
-from dotenv import load_dotenv
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import Session
+from metrics import observe_telegram
+from models import TelegramOutbox
 
-load_dotenv()
+log = logging.getLogger(__name__)
 
-def send_telegram(message):
+MAX_LENGTH = 4000
 
-    bot_token = os.getenv("TELEGRAM_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    print("TELEGRAM SEND STARTED")
-    if not bot_token or not chat_id:
-        print("TELEGRAM ERROR: TOKEN OR CHAT_ID MISSING")
+
+def _split(message):
+    return [
+        message[i:i + MAX_LENGTH]
+        for i in range(0, len(message), MAX_LENGTH)
+    ]
+
+
+# ================= OUTBOX =================
+
+def enqueue_telegram(db: Session, message, chat_id=None):
+    # Пишем в outbox внутри транзакции обработчика; отправляет воркер
+    chat_id = chat_id or os.getenv("TELEGRAM_CHAT_ID")
+
+    if not chat_id:
+        log.error("telegram_chat_id_missing")
         return
 
-    max_length = 4000
+    for part in _split(message):
+        db.add(TelegramOutbox(chat_id=str(chat_id), text=part))
 
-    parts = [
-        message[i:i + max_length]
-        for i in range(0, len(message), max_length)
-    ]
 
-    for part in parts:
+# ================= WORKER =================
+
+class OutboxWorker:
+
+    # Ключ advisory lock в Postgres: очередь разбирает один воркер за раз
+    LOCK_KEY = 727001
+
+    def __init__(
+        self,
+        bind,
+        token=None,
+        api_url=None,
+        http=None,
+        poll_interval=2.0,
+        batch_size=50,
+        timeout=(3.05, 10),
+        max_attempts=8,
+        backoff_base=2.0,
+        backoff_max=600.0,
+    ):
+        self.bind = bind
+        self.token = token or os.getenv("TELEGRAM_TOKEN")
+        # TELEGRAM_API_URL позволяет подставить локальный фейковый Telegram
+        self.api_url = (
+            api_url or os.getenv("TELEGRAM_API_URL") or "https://api.telegram.org"
+        ).rstrip("/")
+        self.http = http or self._make_session()
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _make_session():
+        # requests импортируем только когда воркер реально нужен
+        import requests
+        from requests.adapters import HTTPAdapter
 
-        response = requests.post(
-            f"https://api.telegram.org/bot{bot_token}/sendMessage",
-            data={
-                "chat_id": chat_id,
-                "text": part
-            }
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._loop, name="telegram-outbox", daemon=True
         )
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.run_once()
+            except Exception:
+                log.exception("telegram_worker_failed")
+                sent = 0
+
+            # Если отправили полную пачку — сразу берём следующую
+            if sent < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    # ---------- delivery ----------
+
+    def _send(self, chat_id, text_):
+        response = self.http.post(
+            f"{self.api_url}/bot{self.token}/sendMessage",
+            data={"chat_id": chat_id, "text": text_},
+            timeout=self.timeout,
+        )
+
+        if response.status_code == 200:
+            return None, None
+
+        retry_after = None
+        try:
+            retry_after = response.json().get("parameters", {}).get("retry_after")
+        except ValueError:
+            pass
+
+        return f"{response.status_code}: {response.text[:500]}", retry_after
+
+    def _backoff(self, attempts, retry_after=None):
+        if retry_after:
+            return float(retry_after)
+
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def run_once(self):
+        with self.bind.connect() as conn:
+
+            if conn.dialect.name == "postgresql":
+                locked = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:k)"), {"k": self.LOCK_KEY}
+                ).scalar()
+                conn.commit()
+                if not locked:
+                    return 0
+
+            try:
+                with Session(bind=conn) as db:
+                    return self._drain(db)
+            finally:
+                if conn.dialect.name == "postgresql":
+                    conn.execute(
+                        text("SELECT pg_advisory_unlock(:k)"), {"k": self.LOCK_KEY}
+                    )
+                    conn.commit()
+
+    def _drain(self, db: Session):
+        from requests import RequestException
+
+        # Простые значения, а не ORM-объекты: commit после каждой строки
+        # не сбрасывает состояние остальных строк пачки
+        rows = db.execute(
+            select(
+                TelegramOutbox.id,
+                TelegramOutbox.chat_id,
+                TelegramOutbox.text,
+                TelegramOutbox.attempts,
+                TelegramOutbox.next_attempt_at,
+            )
+            .where(TelegramOutbox.status == "PENDING")
+            .order_by(TelegramOutbox.id)
+            .limit(self.batch_size)
+        ).all()
+
+        now = datetime.utcnow()
+        blocked = set()
+        sent = 0
+
+        for outbox_id, chat_id, text_, attempts, next_attempt_at in rows:
+            # Порядок внутри чата: пока голова не ушла, остальные ждут
+            if chat_id in blocked:
+                continue
+
+            if next_attempt_at and next_attempt_at > now:
+                blocked.add(chat_id)
+                continue
+
+            started = time.perf_counter()
+
+            try:
+                error, retry_after = self._send(chat_id, text_)
+            except RequestException as e:
+                error = str(e)
+                # В тексте исключения requests — URL с токеном бота
+                if self.token:
+                    error = error.replace(self.token, "***")
+                error, retry_after = error[:500], None
+
+            observe_telegram(time.perf_counter() - started, error is None)
+
+            attempts += 1
+            values = {"attempts": attempts}
+
+            if error is None:
+                values.update(status="SENT", sent_at=datetime.utcnow(), last_error=None)
+                sent += 1
+                log.info("telegram_sent", extra={"outbox_id": outbox_id, "attempts": attempts})
+            else:
+                log.warning("telegram_send_failed", extra={
+                    "outbox_id": outbox_id, "attempts": attempts, "error": error
+                })
+                values["last_error"] = error
+                blocked.add(chat_id)
+
+                if attempts >= self.max_attempts:
+                    values["status"] = "FAILED"
+                else:
+                    values["next_attempt_at"] = datetime.utcnow() + timedelta(
+                        seconds=self._backoff(attempts, retry_after)
+                    )
+
+            db.execute(
+                update(TelegramOutbox)
+                .where(TelegramOutbox.id == outbox_id)
+                .values(**values)
+            )
+            db.commit()
+
+        return sent
+
+
+def start_outbox_worker(bind):
+
+    if os.getenv("TELEGRAM_WORKER", "1") == "0":
+        return None
+
+    if not os.getenv("TELEGRAM_TOKEN"):
+        log.warning("telegram_worker_disabled", extra={"reason": "TELEGRAM_TOKEN missing"})
+        return None
 
-        # показываем ошибки Telegram
-        if response.status_code != 200:
-            print("TELEGRAM ERROR:", response.text)
\ No newline at end of file
+    return OutboxWorker(bind).start()
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+# Окружение тестов задаём до импорта модулей приложения: load_dotenv не
+# перезаписывает уже заданные переменные, поэтому .env в тесты не попадает
+_tmp = tempfile.mkdtemp(prefix="egov-tests-")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'app.db')}"
+os.environ["TELEGRAM_TOKEN"] = "test-token"
+os.environ["TELEGRAM_CHAT_ID"] = "100"
+os.environ["TELEGRAM_WORKER"] = "0"
+os.environ["WARMUP"] = "0"
+# Бюджеты запросов проверяются на обоих слоях: sync и /async
+os.environ["QUERY_WATCH"] = "1"
+os.environ["DATA_LAYER"] = "both"
+os.environ.pop("QUERY_WATCH_STRICT", None)
+os.environ.pop("BRANCH_TIMEZONES", None)
+os.environ.pop("BRANCH_SHARDS", None)
+os.environ.pop("TELEGRAM_API_URL", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
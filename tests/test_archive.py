@@ -0,0 +1,132 @@
+from datetime import datetime, time, timedelta
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from migrations import upgrade
+from models import Employee, Order, OrderArchive, OrderService, Service
+from services.archive import archive_boundary, archive_orders
+from services.history import order_history
+from services.reports import employee_report
+from services.rollup import rebuild
+from services.timeseries import timeseries
+
+
+# Заказы по обе стороны границы архива: отчёты, история и ряды должны
+# давать те же итоги до и после переноса
+
+DAYS = (5, 3, 1, -1, -3)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    upgrade(engine)
+
+    with Session(engine) as session:
+        yield session
+
+    engine.dispose()
+
+
+@pytest.fixture
+def period(db):
+    employee = Employee(name="Archive", branch_id=1, pin="2001", is_active=True)
+    services = [Service(name="Старая", price=300), Service(name="Новая", price=500)]
+    db.add_all([employee, *services])
+    db.flush()
+
+    boundary = archive_boundary()
+
+    for i, offset in enumerate(DAYS):
+        day = boundary - timedelta(days=offset)
+        completed_at = datetime.combine(day, time(12))
+        service = services[i % 2]
+
+        order = Order(
+            service_id=service.id,
+            employee_id=employee.id,
+            branch_id=1,
+            client_name=f"Клиент {i}",
+            client_phone="+77000000000",
+            status="COMPLETED",
+            payment_status="PAID",
+            payment_type="CASH" if i % 2 else "QR",
+            total=service.price * 2,
+            created_at=completed_at - timedelta(minutes=10),
+            completed_at=completed_at,
+            business_date=day,
+        )
+        db.add(order)
+        db.flush()
+        db.add_all([
+            OrderService(order_id=order.id, service_id=service.id, price=service.price),
+            OrderService(order_id=order.id, service_id=service.id, price=service.price),
+        ])
+
+    db.commit()
+    rebuild(db)
+    db.commit()
+
+    return boundary - timedelta(days=max(DAYS)), boundary - timedelta(days=min(DAYS))
+
+
+def _snapshot(db, start, end):
+    history = order_history(db, limit=200, start_date=start, end_date=end)
+    return {
+        "report": employee_report(db, start, end),
+        "history": [(o["order_id"], o["total"], o["services"]) for o in history["orders"]],
+        "series": {
+            group_by: timeseries(db, start, end, "day", group_by)
+            for group_by in (None, "employee", "service")
+        },
+    }
+
+
+def test_totals_unchanged_by_archiving(db, period):
+    start, end = period
+    before = _snapshot(db, start, end)
+    assert len(before["history"]) == len(DAYS)
+    assert before["report"][1]["total_all"] == 3 * 600 + 2 * 1000
+
+    assert archive_orders(db) == 3
+    assert _snapshot(db, start, end) == before
+
+    # Пересборка итогов читает и архив
+    rebuild(db)
+    db.commit()
+    assert _snapshot(db, start, end) == before
+
+
+def test_newest_order_stays_hot(db, period):
+    newest = db.execute(select(Order.id).order_by(Order.id.desc())).scalars().first()
+
+    # Самый новый заказ старше границы: всё равно остаётся в orders
+    db.execute(
+        Order.__table__.update()
+        .where(Order.id == newest)
+        .values(business_date=archive_boundary() - timedelta(days=10))
+    )
+    db.commit()
+
+    archive_orders(db)
+
+    hot = db.execute(select(Order.id)).scalars().all()
+    archived = set(db.execute(select(OrderArchive.id)).scalars().all())
+    assert newest in hot
+    assert newest not in archived
+
+    # SQLite выдаёт id как max(rowid) + 1 — с архивом он не пересекается
+    order = Order(
+        service_id=db.execute(select(Service.id)).scalars().first(),
+        employee_id=db.execute(select(Employee.id)).scalars().first(),
+        branch_id=1,
+        client_name="Новый",
+        client_phone="+77000000000",
+        status="IN_PROGRESS",
+        payment_status="NOT_PAID",
+    )
+    db.add(order)
+    db.commit()
+
+    assert order.id == newest + 1
+    assert order.id not in archived
@@ -0,0 +1,53 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from database import SessionLocal
+from migrations import upgrade
+from models import Employee
+from services.auth import pin_key
+
+
+@pytest.fixture(scope="module")
+def client():
+    upgrade()
+
+    import main
+    with TestClient(main.app) as c:
+        yield c
+
+
+def _employee(client, name, pin):
+    r = client.post("/employees", json={"name": name, "branch_id": 1, "pin": pin})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def _change(employee_id, **values):
+    # Изменение из другого воркера: наш invalidate_pin_cache не вызывается
+    with SessionLocal() as db:
+        db.execute(update(Employee).where(Employee.id == employee_id).values(**values))
+        db.commit()
+
+
+@pytest.mark.parametrize("prefix", ["", "/async"])
+def test_cached_pin_rechecks_is_active(client, prefix):
+    pin = "4001" if not prefix else "4002"
+    employee_id = _employee(client, f"Cached {prefix}", pin)
+
+    assert client.post(f"{prefix}/auth/pin", json={"pin": pin}).status_code == 200
+
+    _change(employee_id, is_active=False)
+
+    assert client.post(f"{prefix}/auth/pin", json={"pin": pin}).status_code == 401
+
+
+@pytest.mark.parametrize("prefix", ["", "/async"])
+def test_cached_pin_rechecks_pin_hash(client, prefix):
+    pin = "4003" if not prefix else "4004"
+    employee_id = _employee(client, f"Repinned {prefix}", pin)
+
+    assert client.post(f"{prefix}/auth/pin", json={"pin": pin}).status_code == 200
+
+    _change(employee_id, pin_hash=pin_key(pin + "9"))
+
+    assert client.post(f"{prefix}/auth/pin", json={"pin": pin}).status_code == 401
@@ -0,0 +1,116 @@
+from zoneinfo import ZoneInfo
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+import services.clock
+from database import SessionLocal
+from migrations import upgrade
+from models import TelegramOutbox
+from services.clock import local_today
+from services.rollup import rebuild
+
+
+# Пояса разнесены на 26 часов: у филиала 2 «сегодня» всегда другое,
+# чем у остальных филиалов
+
+ZONES = {2: ZoneInfo("Etc/GMT+12")}
+DEFAULT = ZoneInfo("Etc/GMT-14")
+
+
+@pytest.fixture(scope="module")
+def client():
+    upgrade()
+
+    import main
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="module", autouse=True)
+def zones():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(services.clock, "BRANCH_ZONES", ZONES)
+        mp.setattr(services.clock, "DEFAULT_ZONE", DEFAULT)
+        yield
+
+
+@pytest.fixture(scope="module")
+def ids(client):
+    def post(path, json):
+        r = client.post(path, json=json)
+        assert r.status_code == 200, r.text
+        return r.json()["id"]
+
+    return {
+        "admin": post("/employees", {"name": "Zone Admin", "branch_id": 1, "pin": "7001", "role": "ADMIN"}),
+        1: post("/employees", {"name": "Zone 1", "branch_id": 1, "pin": "7002"}),
+        2: post("/employees", {"name": "Zone 2", "branch_id": 2, "pin": "7003"}),
+        "service": post("/services", {"name": "Услуга в поясе", "price": 700}),
+    }
+
+
+@pytest.fixture(scope="module")
+def orders(client, ids):
+    # Одна оплаченная услуга у сотрудника каждого филиала
+    for branch_id, pin in ((1, "7002"), (2, "7003")):
+        assert client.post("/auth/pin", json={"pin": pin}).status_code == 200
+        r = client.post("/orders/start", json={
+            "employee_id": ids[branch_id],
+            "service_ids": [ids["service"]],
+            "client_name": f"Клиент {branch_id}",
+            "client_phone": "+77000000000",
+        })
+        assert r.status_code == 200, r.text
+        order_id = r.json()["order_id"]
+        r = client.post(f"/orders/{order_id}/complete", json={"payment_type": "CASH"})
+        assert r.status_code == 200, r.text
+
+
+def _totals(client, prefix, ids, **params):
+    r = client.get(f"{prefix}/admin/report/today", params={"employee_id": ids["admin"], **params})
+    assert r.status_code == 200, r.text
+    return {row["employee_id"]: row["total"] for row in r.json()["employees"]}
+
+
+def test_days_differ():
+    assert local_today(2) != local_today(1)
+
+
+@pytest.mark.parametrize("prefix", ["", "/async"])
+def test_today_report_uses_branch_day(client, ids, orders, prefix):
+    totals = _totals(client, prefix, ids)
+    assert totals[ids[1]] == 700
+    assert totals[ids[2]] == 700
+
+    branch = _totals(client, prefix, ids, branch_id=2)
+    assert branch[ids[2]] == 700
+    assert ids[1] not in branch
+
+
+@pytest.mark.parametrize("prefix", ["", "/async"])
+def test_send_report_includes_every_branch(client, ids, orders, prefix):
+    r = client.post(f"{prefix}/admin/report/today/send", params={"employee_id": ids["admin"]})
+    assert r.status_code == 200, r.text
+
+    with SessionLocal() as db:
+        text = db.execute(
+            select(TelegramOutbox.text).order_by(TelegramOutbox.id.desc()).limit(1)
+        ).scalar_one()
+
+    assert "Клиент 1" in text
+    assert "Клиент 2" in text
+
+
+def test_rebuild_keeps_branch_day(client, ids, orders, monkeypatch):
+    before = _totals(client, "", ids)
+    start, end = local_today(2), local_today(1)
+
+    # Пересборка берёт рабочий день из заказа, а не пересчитывает его
+    # по текущим поясам
+    monkeypatch.setattr(services.clock, "BRANCH_ZONES", {})
+    with SessionLocal() as db:
+        rebuild(db, start, end)
+        db.commit()
+    monkeypatch.setattr(services.clock, "BRANCH_ZONES", ZONES)
+
+    assert _totals(client, "", ids) == before
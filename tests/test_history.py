@@ -0,0 +1,134 @@
+import base64
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from database import SessionLocal
+from migrations import upgrade
+from models import Order
+
+
+# Страницы истории фильтруем по сотруднику: заказы других тестов
+# в общей базе не мешают
+
+BASE = datetime(2030, 1, 1, 12, 0)
+
+
+@pytest.fixture(scope="module")
+def client():
+    upgrade()
+
+    import main
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="module")
+def admin(client):
+    return _employee(client, "History Admin", "3000", role="ADMIN")
+
+
+@pytest.fixture(scope="module")
+def service(client):
+    r = client.post("/services", json={"name": "История", "price": 100})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def _employee(client, name, pin, role="EMPLOYEE"):
+    r = client.post("/employees", json={"name": name, "branch_id": 1, "pin": pin, "role": role})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def _add_orders(employee_id, service_id, *completed):
+    with SessionLocal() as db:
+        orders = [
+            Order(
+                service_id=service_id,
+                employee_id=employee_id,
+                branch_id=1,
+                client_name="Клиент",
+                client_phone="+77000000000",
+                status="COMPLETED",
+                payment_status="PAID",
+                payment_type="CASH",
+                total=100,
+                created_at=completed_at - timedelta(minutes=5),
+                completed_at=completed_at,
+                business_date=completed_at.date(),
+            )
+            for completed_at in completed
+        ]
+        db.add_all(orders)
+        db.commit()
+        return [order.id for order in orders]
+
+
+def _pager(client, prefix, admin, employee_id, limit=2):
+    def page(**params):
+        r = client.get(f"{prefix}/admin/orders/history", params={
+            "employee_id": admin, "target_employee_id": employee_id, "limit": limit, **params
+        })
+        assert r.status_code == 200, r.text
+        body = r.json()
+        return [o["order_id"] for o in body["orders"]], body["next_cursor"]
+
+    return page
+
+
+def _orders(employee_id, service_id):
+    # Три заказа завершены в одну и ту же секунду: порядок между ними — по id
+    tied = _add_orders(employee_id, service_id, BASE, BASE, BASE)
+    older = _add_orders(employee_id, service_id, BASE - timedelta(minutes=1), BASE - timedelta(minutes=2))
+    return sorted(tied, reverse=True) + older
+
+
+@pytest.mark.parametrize("prefix, pin", [("", "3001"), ("/async", "3002")])
+def test_pages_break_ties_by_id(client, admin, service, prefix, pin):
+    employee_id = _employee(client, f"Ties {prefix}", pin)
+    expected = _orders(employee_id, service)
+    page = _pager(client, prefix, admin, employee_id)
+
+    seen, cursor = page()
+    while cursor:
+        ids, cursor = page(cursor=cursor)
+        seen.extend(ids)
+
+    assert seen == expected
+
+
+@pytest.mark.parametrize("prefix, pin", [("", "3003"), ("/async", "3004")])
+def test_pages_stable_when_orders_added(client, admin, service, prefix, pin):
+    employee_id = _employee(client, f"Inserts {prefix}", pin)
+    expected = _orders(employee_id, service)
+    page = _pager(client, prefix, admin, employee_id)
+
+    seen, cursor = page()
+
+    # Между страницами завершились новые заказы — и новее, и в ту же секунду
+    _add_orders(employee_id, service, BASE + timedelta(minutes=1), BASE)
+
+    while cursor:
+        ids, cursor = page(cursor=cursor)
+        seen.extend(ids)
+
+    assert seen == expected
+
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+@pytest.mark.parametrize("prefix", ["", "/async"])
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    _encode("2030-01-01T12:00:00"),
+    _encode("2030-01-01T12:00:00|x"),
+    _encode("yesterday|1"),
+    _encode("2030-01-01T12:00:00|1|2"),
+])
+def test_malformed_cursor_is_rejected(client, admin, prefix, cursor):
+    r = client.get(f"{prefix}/admin/orders/history", params={
+        "employee_id": admin, "cursor": cursor
+    })
+    assert r.status_code == 400
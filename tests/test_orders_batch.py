@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from database import SessionLocal
+from migrations import upgrade
+from models import Order, OrderService
+
+
+UNKNOWN_SERVICE = 999999
+
+
+@pytest.fixture(scope="module")
+def client():
+    upgrade()
+
+    import main
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="module")
+def ids(client):
+    def post(path, json):
+        r = client.post(path, json=json)
+        assert r.status_code == 200, r.text
+        return r.json()["id"]
+
+    employee_id = post("/employees", {"name": "Batch", "branch_id": 1, "pin": "6001"})
+    assert client.post("/auth/pin", json={"pin": "6001"}).status_code == 200
+
+    return {
+        "employee": employee_id,
+        "services": [
+            post("/services", {"name": "Пакетная 1", "price": 300}),
+            post("/services", {"name": "Пакетная 2", "price": 400}),
+        ],
+    }
+
+
+@pytest.mark.parametrize("prefix", ["", "/async"])
+def test_unknown_service_rejects_only_its_item(client, ids, prefix):
+    first, second = ids["services"]
+
+    def item(name, service_ids):
+        return {
+            "employee_id": ids["employee"],
+            "service_ids": service_ids,
+            "client_name": name,
+            "client_phone": "+77000000000",
+        }
+
+    r = client.post(f"{prefix}/orders/batch", json={"orders": [
+        item("Первый", [first, second]),
+        item("С ошибкой", [first, UNKNOWN_SERVICE]),
+        item("Третий", [second]),
+    ]})
+    assert r.status_code == 200, r.text
+
+    results = r.json()
+    assert results[1] == {"error": "Invalid services"}
+    order_ids = [results[0]["order_id"], results[2]["order_id"]]
+
+    with SessionLocal() as db:
+        totals = db.execute(
+            select(Order.total).where(Order.id.in_(order_ids)).order_by(Order.id)
+        ).scalars().all()
+        lines = db.execute(
+            select(OrderService.order_id, OrderService.service_id, OrderService.price)
+            .where(OrderService.order_id.in_(order_ids))
+            .order_by(OrderService.id)
+        ).all()
+
+    assert totals == [700, 400]
+    assert [tuple(line) for line in lines] == [
+        (order_ids[0], first, 300),
+        (order_ids[0], second, 400),
+        (order_ids[1], second, 400),
+    ]
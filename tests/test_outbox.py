@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+from fake_telegram import FakeTelegram
+from migrations import upgrade
+from models import TelegramOutbox
+from telegram_utils import OutboxWorker, enqueue_telegram
+
+
+TOKEN = "123456:secret-token"
+
+
+@pytest.fixture
+def bind(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    upgrade(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def fake():
+    server = FakeTelegram().start()
+    yield server
+    server.stop()
+
+
+def _enqueue(bind, *messages):
+    with Session(bind) as db:
+        for chat_id, text in messages:
+            enqueue_telegram(db, text, chat_id=chat_id)
+        db.commit()
+
+
+def _rows(bind):
+    with Session(bind) as db:
+        return db.query(TelegramOutbox).order_by(TelegramOutbox.id).all()
+
+
+def _due_now(bind):
+    # Пропускаем ожидание backoff
+    with bind.begin() as conn:
+        conn.execute(update(TelegramOutbox).values(next_attempt_at=datetime.utcnow()))
+
+
+def _worker(bind, url, **kwargs):
+    return OutboxWorker(bind, token=TOKEN, api_url=url, **kwargs)
+
+
+def test_sends_pending_messages(bind, fake):
+    _enqueue(bind, ("1", "hello"), ("1", "x" * 4500))
+
+    assert _worker(bind, fake.url).run_once() == 3
+
+    assert [m["text"] for m in fake.messages] == ["hello", "x" * 4000, "x" * 500]
+    assert all(m["path"] == f"/bot{TOKEN}/sendMessage" for m in fake.messages)
+    assert [(r.status, r.attempts) for r in _rows(bind)] == [("SENT", 1)] * 3
+
+
+def test_retries_with_backoff(bind, fake):
+    fake.fail_first = 1
+    _enqueue(bind, ("1", "hello"))
+    worker = _worker(bind, fake.url, backoff_base=30)
+
+    before = datetime.utcnow()
+    assert worker.run_once() == 0
+
+    row = _rows(bind)[0]
+    assert (row.status, row.attempts) == ("PENDING", 1)
+    assert row.last_error.startswith("500")
+    # base * 2^0 с разбросом ±20%
+    assert before + timedelta(seconds=24) <= row.next_attempt_at <= datetime.utcnow() + timedelta(seconds=36)
+
+    # До срока повтор не отправляется
+    assert worker.run_once() == 0
+    assert fake.messages == []
+
+    _due_now(bind)
+    assert worker.run_once() == 1
+
+    row = _rows(bind)[0]
+    assert (row.status, row.attempts, row.last_error) == ("SENT", 2, None)
+    assert [m["text"] for m in fake.messages] == ["hello"]
+
+
+def test_backoff_grows_and_gives_up(bind, fake):
+    fake.fail_first = 10
+    _enqueue(bind, ("1", "hello"))
+    worker = _worker(bind, fake.url, max_attempts=3)
+
+    delays = []
+    for _ in range(3):
+        _due_now(bind)
+        started = datetime.utcnow()
+        worker.run_once()
+        row = _rows(bind)[0]
+        delays.append((row.next_attempt_at - started).total_seconds())
+
+    assert (row.status, row.attempts) == ("FAILED", 3)
+    # Срок растёт; после последней попытки не переносится
+    assert 0 < delays[0] < delays[1]
+    assert delays[2] <= 0
+    assert fake.messages == []
+
+
+def test_keeps_order_within_chat(bind, fake):
+    fake.fail_first = 1
+    _enqueue(bind, ("1", "a1"), ("1", "a2"), ("2", "b1"))
+    worker = _worker(bind, fake.url)
+
+    # a1 упал — a2 ждёт его, чат 2 не блокируется
+    assert worker.run_once() == 1
+    assert [(m["chat_id"], m["text"]) for m in fake.messages] == [("2", "b1")]
+    assert [r.status for r in _rows(bind)] == ["PENDING", "PENDING", "SENT"]
+
+    _due_now(bind)
+    assert worker.run_once() == 2
+    assert [(m["chat_id"], m["text"]) for m in fake.messages] == [
+        ("2", "b1"), ("1", "a1"), ("1", "a2")
+    ]
+
+
+def test_redacts_token_in_errors(bind, fake):
+    # Порт закрытого сервера: requests падает с URL, где есть токен
+    url = fake.url
+    fake.stop()
+
+    _enqueue(bind, ("1", "hello"))
+    assert _worker(bind, url).run_once() == 0
+
+    row = _rows(bind)[0]
+    assert row.attempts == 1
+    assert TOKEN not in row.last_error
+    assert "/bot***/sendMessage" in row.last_error
@@ -0,0 +1,133 @@
+import pytest
+from fastapi.testclient import TestClient
+import querywatch
+from migrations import upgrade
+from querywatch import QueryBudgetExceeded, assert_query_budget, capture_queries
+
+
+# Каждый маршрут с @query_budget проходит реальный сценарий на обоих слоях,
+# с несколькими заказами и строками — N+1 и лишние запросы видны сразу
+
+N_ORDERS = 6
+
+
+@pytest.fixture(scope="module")
+def app():
+    upgrade()
+
+    import main
+    return main.app
+
+
+@pytest.fixture(scope="module")
+def client(app):
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="module")
+def ids(client):
+    def post(path, json):
+        r = client.post(path, json=json)
+        assert r.status_code == 200, r.text
+        return r.json()["id"]
+
+    return {
+        "admin": post("/employees", {"name": "Admin", "branch_id": 1, "pin": "9001", "role": "ADMIN"}),
+        "sync": post("/employees", {"name": "Sync", "branch_id": 1, "pin": "9002"}),
+        "async": post("/employees", {"name": "Async", "branch_id": 1, "pin": "9003"}),
+        "services": [
+            post("/services", {"name": f"Услуга {i}", "price": 500 * i})
+            for i in range(1, 4)
+        ],
+    }
+
+
+def _budgeted_routes(app):
+    return {
+        (method, route.path)
+        for route in app.routes
+        if getattr(getattr(route, "endpoint", None), "query_budget", None) is not None
+        for method in route.methods
+    }
+
+
+def _scenario(client, ids, layer, employee_key, pin):
+    prefix = "/async" if layer == "async" else ""
+    employee_id = ids[employee_key]
+    admin = {"employee_id": ids["admin"]}
+
+    def call(method, path, prefix=prefix, **kwargs):
+        r = client.request(method, prefix + path, **kwargs)
+        assert r.status_code < 400, (path, r.status_code, r.text)
+        return r.json()
+
+    call("POST", "/auth/pin", json={"pin": pin})
+    # Каталог есть только в sync-слое
+    call("GET", "/services", prefix="")
+
+    order_ids = []
+    for i in range(N_ORDERS):
+        order = call("POST", "/orders/start", json={
+            "employee_id": employee_id,
+            "service_ids": ids["services"][: i % 3 + 1],
+            "client_name": f"Клиент {i}",
+            "client_phone": "+77000000000",
+        })
+        order_ids.append(order["order_id"])
+
+    call("GET", "/orders/in-progress", params={"employee_id": employee_id})
+
+    for order_id in order_ids[:-1]:
+        call("POST", f"/orders/{order_id}/complete", json={"payment_type": "CASH"})
+    call("POST", f"/orders/{order_ids[-1]}/not-provided", json={"reason": "нет документов"})
+
+    call("GET", "/employee/today-stats", params={"employee_id": employee_id})
+    call("GET", "/employee/history", params={"employee_id": employee_id})
+
+    call("GET", "/admin/report/today", params=admin)
+    call("GET", "/admin/report/period", params={
+        **admin, "start_date": "2020-01-01", "end_date": "2030-12-31"
+    })
+    for group_by in (None, "employee", "service"):
+        call("GET", "/admin/report/timeseries", params={
+            **admin, "start_date": "2026-01-01", "end_date": "2026-12-31", "bucket": "month",
+            **({"group_by": group_by} if group_by else {}),
+        })
+
+    page = call("GET", "/admin/orders/history", params={**admin, "limit": 2})
+    call("GET", "/admin/orders/history", params={**admin, "limit": 2, "cursor": page["next_cursor"]})
+
+    call("POST", "/admin/report/today/send", params=admin)
+    call("POST", "/shifts/end", params={"employee_id": employee_id})
+
+
+def test_budgeted_routes_stay_within_budget(app, client, ids):
+    with capture_queries() as reports:
+        _scenario(client, ids, "sync", "sync", "9002")
+        _scenario(client, ids, "async", "async", "9003")
+
+    # Сценарий покрывает все маршруты с бюджетом — новый маршрут без
+    # сценария тоже уронит тест
+    covered = {(r["method"], r["route"]) for r in reports if r["budget"] is not None}
+    assert covered == _budgeted_routes(app)
+
+    assert_query_budget(reports)
+
+
+def test_fails_when_budget_exceeded(app, client, ids, monkeypatch):
+    route = next(
+        r for r in app.routes
+        if getattr(r, "path", None) == "/services" and "GET" in r.methods
+    )
+    monkeypatch.setattr(route.endpoint, "query_budget", 0)
+
+    # Каталог может быть в кэше — сбрасываем, чтобы запрос точно был
+    from services.catalog import invalidate_catalog
+    invalidate_catalog()
+
+    with capture_queries() as reports:
+        client.get("/services")
+
+    with pytest.raises(QueryBudgetExceeded, match="/services"):
+        assert_query_budget(reports)
@@ -0,0 +1,174 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from migrations import upgrade
+from models import Employee, Order
+from services.auth import authenticate, invalidate_pin_cache
+from services.shards import (
+    DEFAULT,
+    BranchRouter,
+    fan_out_rows,
+    get_router,
+    invalidate_branches,
+    migrate,
+    parse_shards,
+    set_router,
+)
+
+
+# Филиал 2 — в отдельной SQLite-базе, остальные — в основной.
+# Клиент без lifespan: при шардах он требует DATA_LAYER=sync, а тесты
+# работают с "both" — здесь вызываем только sync-маршруты
+
+PINS = {"admin": "1101", 1: "1102", 2: "1103"}
+
+
+def test_parse_shards():
+    assert parse_shards("2,3=sqlite:///a.db; 4=sqlite:///b.db;") == {
+        2: "sqlite:///a.db",
+        3: "sqlite:///a.db",
+        4: "sqlite:///b.db",
+    }
+
+    with pytest.raises(ValueError):
+        parse_shards("2=")
+
+
+def test_router_maps_branches_to_shards():
+    router = BranchRouter({2: "sqlite:///b.db", 3: "sqlite:///a.db", 4: "sqlite:///a.db"})
+
+    assert router.sharded
+    assert router.shard_for(2) == "sqlite:///b.db"
+    assert router.shard_for(1) == DEFAULT
+    assert router.shard_for(None) == DEFAULT
+    assert router.shards() == [DEFAULT, "sqlite:///a.db", "sqlite:///b.db"]
+    assert not BranchRouter().sharded
+
+
+@pytest.fixture(scope="module")
+def router(tmp_path_factory):
+    upgrade()
+
+    shard = f"sqlite:///{tmp_path_factory.mktemp('shards') / 'branch_2.db'}"
+    router = BranchRouter({2: shard})
+    previous = get_router()
+
+    set_router(router)
+    migrate(router)
+
+    yield router
+
+    set_router(previous)
+    invalidate_branches()
+    invalidate_pin_cache()
+    router.engine(shard).dispose()
+
+
+@pytest.fixture(scope="module")
+def client(router):
+    import main
+    return TestClient(main.app)
+
+
+@pytest.fixture(scope="module")
+def ids(client):
+    def post(path, json):
+        r = client.post(path, json=json)
+        assert r.status_code == 200, r.text
+        return r.json()["id"]
+
+    return {
+        "admin": post("/employees", {"name": "Shard Admin", "branch_id": 1, "pin": PINS["admin"], "role": "ADMIN"}),
+        1: post("/employees", {"name": "Shard 1", "branch_id": 1, "pin": PINS[1]}),
+        2: post("/employees", {"name": "Shard 2", "branch_id": 2, "pin": PINS[2]}),
+        "service": post("/services", {"name": "Шардовая", "price": 900}),
+    }
+
+
+@pytest.fixture(scope="module")
+def orders(client, ids):
+    # По оплаченному заказу у сотрудника каждого филиала: {филиал: id заказа}
+    order_ids = {}
+
+    for branch_id in (1, 2):
+        employee_id = ids[branch_id]
+        assert client.post("/auth/pin", json={"pin": PINS[branch_id]}).status_code == 200
+
+        r = client.post("/orders/start", json={
+            "employee_id": employee_id,
+            "service_ids": [ids["service"]],
+            "client_name": f"Шард {branch_id}",
+            "client_phone": "+77000000000",
+        })
+        assert r.status_code == 200, r.text
+        order_ids[branch_id] = r.json()["order_id"]
+
+        r = client.post(
+            f"/orders/{order_ids[branch_id]}/complete",
+            params={"employee_id": employee_id},
+            json={"payment_type": "CASH"},
+        )
+        assert r.status_code == 200, r.text
+
+    return order_ids
+
+
+def _orders_of(router, shard, employee_ids):
+    with router.session_factory(shard)() as db:
+        return db.execute(
+            select(Order.employee_id).where(Order.employee_id.in_(employee_ids))
+        ).scalars().all()
+
+
+def test_orders_go_to_branch_shard(router, ids, orders):
+    employees = [ids[1], ids[2]]
+    shard = router.shard_for(2)
+
+    assert _orders_of(router, DEFAULT, employees) == [ids[1]]
+    assert _orders_of(router, shard, employees) == [ids[2]]
+
+
+def test_fan_out_merges_shards(router, client, ids, orders):
+    stmt = select(Order.employee_id).where(Order.employee_id.in_([ids[1], ids[2]]))
+
+    with router.session_factory(DEFAULT)() as db:
+        assert sorted(r[0] for r in fan_out_rows(db, stmt)) == [ids[1], ids[2]]
+        assert [r[0] for r in fan_out_rows(db, stmt, 2)] == [ids[2]]
+
+    assert len(router.fan_out(lambda db: db.execute(stmt).all())) == 2
+
+    def totals(**params):
+        r = client.get("/admin/report/today", params={"employee_id": ids["admin"], **params})
+        assert r.status_code == 200, r.text
+        return {row["employee_id"]: row["total"] for row in r.json()["employees"]}
+
+    everywhere = totals()
+    assert everywhere[ids[1]] == 900
+    assert everywhere[ids[2]] == 900
+
+    branch = totals(branch_id=2)
+    assert branch[ids[2]] == 900
+    assert ids[1] not in branch
+
+
+def test_shard_employees_hold_no_plaintext_pin(router, ids):
+    shard = router.shard_for(2)
+
+    with router.session_factory(shard)() as db:
+        copies = db.execute(select(Employee.id, Employee.pin, Employee.pin_hash)).all()
+
+    assert {ids["admin"], ids[1], ids[2]} <= {employee_id for employee_id, _, _ in copies}
+    assert not {pin for _, pin, _ in copies} & set(PINS.values())
+    assert all(pin == pin_hash for _, pin, pin_hash in copies if pin_hash)
+
+
+def test_login_through_hash(router, client, ids):
+    # Вход проверяется по pin_hash — и в основной базе, и в копии шарда
+    r = client.post("/auth/pin", json={"pin": PINS[2]})
+    assert r.status_code == 200, r.text
+    assert r.json()["employee_id"] == ids[2]
+
+    for shard in router.shards():
+        invalidate_pin_cache()
+        with router.session_factory(shard)() as db:
+            assert authenticate(db, PINS[2])["employee_id"] == ids[2]
@@ -0,0 +1,102 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, text
+import services.sync
+from database import SessionLocal
+from migrations import upgrade
+from models import Order
+
+
+@pytest.fixture(scope="module")
+def client():
+    upgrade()
+
+    import main
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="module")
+def ids(client):
+    def post(path, json):
+        r = client.post(path, json=json)
+        assert r.status_code == 200, r.text
+        return r.json()["id"]
+
+    employee_id = post("/employees", {"name": "Offline", "branch_id": 1, "pin": "5001"})
+    assert client.post("/auth/pin", json={"pin": "5001"}).status_code == 200
+
+    return {
+        "employee": employee_id,
+        "service": post("/services", {"name": "Офлайн", "price": 250}),
+    }
+
+
+def _start(op_id, client_id, service_id):
+    return {
+        "op_id": op_id,
+        "type": "start",
+        "client_id": client_id,
+        "service_ids": [service_id],
+        "client_name": "Клиент",
+        "client_phone": "+77000000000",
+    }
+
+
+def _sync(client, employee_id, operations):
+    r = client.post("/sync", json={"employee_id": employee_id, "operations": operations})
+    assert r.status_code == 200, r.text
+    return r.json()["results"]
+
+
+def _orders(client_ids):
+    with SessionLocal() as db:
+        return db.execute(
+            select(func.count()).select_from(Order).where(Order.client_id.in_(client_ids))
+        ).scalar_one()
+
+
+def test_replayed_batch_is_idempotent(client, ids):
+    batch = [
+        _start("replay-1", "replay-order-1", ids["service"]),
+        {"op_id": "replay-2", "type": "complete", "order_client_id": "replay-order-1", "payment_type": "CASH"},
+        _start("replay-3", "replay-order-2", ids["service"]),
+        {"op_id": "replay-4", "type": "not_provided", "order_client_id": "replay-order-2", "reason": "нет"},
+    ]
+
+    first = _sync(client, ids["employee"], batch)
+    second = _sync(client, ids["employee"], batch)
+
+    assert not any("error" in r for r in first)
+    assert second == [{**r, "duplicate": True} for r in first]
+    assert _orders(["replay-order-1", "replay-order-2"]) == 2
+
+
+def test_failed_operation_does_not_fail_batch(client, ids, monkeypatch):
+    def broken(db, *args):
+        db.execute(text("SELECT * FROM no_such_table"))
+
+    monkeypatch.setattr(services.sync, "apply_complete", broken)
+
+    results = _sync(client, ids["employee"], [
+        _start("savepoint-1", "savepoint-order-1", ids["service"]),
+        {"op_id": "savepoint-2", "type": "complete", "order_client_id": "savepoint-order-1", "payment_type": "CASH"},
+        _start("savepoint-3", "savepoint-order-2", ids["service"]),
+    ])
+
+    assert "order_id" in results[0]
+    assert results[1] == {"op_id": "savepoint-2", "error": "Operation failed"}
+    assert "order_id" in results[2]
+    assert _orders(["savepoint-order-1", "savepoint-order-2"]) == 2
+
+
+@pytest.mark.parametrize("field, value", [
+    ("op_id", "x" * 65),
+    ("client_id", "x" * 37),
+    ("order_client_id", "x" * 37),
+])
+def test_rejects_oversized_ids(client, ids, field, value):
+    op = {**_start("oversized", "oversized-order", ids["service"]), field: value}
+
+    r = client.post("/sync", json={"employee_id": ids["employee"], "operations": [op]})
+    assert r.status_code == 422